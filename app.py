@@ -1,100 +1,59 @@
 import datetime
-import pandas as pd
-import streamlit as st
-import qrcode
-import numpy as np
-import cv2
 import os
-from io import BytesIO
-from PIL import Image
-from pyzbar.pyzbar import decode
-from dotenv import load_dotenv
-from supabase import create_client, Client
-
-# Load environment variables
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+import threading
 
-from database import (
-    register_attendee,
-    get_all_attendees,
-    log_scan,
-    get_scan_log,
-)
-
-def switch_page(page_name: str):
-    st.session_state.page = page_name
-    st.experimental_rerun()
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Conference session definitions with titles and exact times
-conference_sessions = [
-    {"title": "Prevention of C.M.", "start": "2025-05-02 08:30", "end": "2025-05-02 10:00"},
-    {"title": "The TDCJ SO Treatment Program", "start": "2025-05-02 10:30", "end": "2025-05-02 12:00"},
-    {"title": "Taking the High Road - Ethical Challenges (Part 1)", "start": "2025-05-02 13:30", "end": "2025-05-02 15:00"},
-    {"title": "Taking the High Road - Ethical Challenges (Part 2)", "start": "2025-05-02 15:30", "end": "2025-05-02 17:00"},
-    {"title": "Use of Polygraph Exams in Treatment", "start": "2025-05-03 08:30", "end": "2025-05-03 10:00"},
-    {"title": "Challenges, Lessons Learned...", "start": "2025-05-03 10:30", "end": "2025-05-03 12:00"},
-    {"title": "Treating Clients with Mild Autism", "start": "2025-05-03 13:30", "end": "2025-05-03 15:00"},
-    {"title": "Unpacking the Offense Cycle", "start": "2025-05-03 15:30", "end": "2025-05-03 17:00"},
-    {"title": "Risk Assessment Reports", "start": "2025-05-04 08:30", "end": "2025-05-04 10:00"},
-    {"title": "Chaperon Training", "start": "2025-05-04 10:30", "end": "2025-05-04 12:00"},
-    {"title": "Legal and Strategy Aspects of Deregistration", "start": "2025-05-04 13:30", "end": "2025-05-04 15:00"},
-    {"title": "RNR Approach to Adolescent Assessment", "start": "2025-05-04 15:30", "end": "2025-05-04 17:00"},
-]
-import os
-import datetime
-import pandas as pd
 import streamlit as st
-import qrcode
-import numpy as np
-import cv2
-from io import BytesIO
-from PIL import Image
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
-# ─── Load .env & initialize Supabase client ───────────────────────────────
+# Heavy libraries (pandas, OpenCV, qrcode, supabase) are imported where a
+# page first needs them, so each page only pays for what it renders.
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# ─── Import your database helper wrappers ──────────────────────────────────
 from database import (
     register_attendee,
     get_all_attendees,
+    get_roster,
+    import_attendees,
     log_scan,
-    get_scan_log,
+    log_scans,
+    check_in_or_queue,
+    load_admin_data,
+    poll_admin_data,
+    export_csv,
+    journal_status,
+    service_counts,
+    warm_up as warm_up_backend,
+    DEVICE_ID,
+    CHECKIN_SERVICE_URL,
 )
+from metrics import registry as metrics, span, timed
+
 
 # ─── Page‑swap helper ───────────────────────────────────────────────────────
 def switch_page(page_name: str):
+    if page_name != "home":
+        stop_continuous_scanner()
     st.session_state.page = page_name
+    st.rerun()
+
 
-# ─── Conference sessions ───────────────────────────────────────────────────
-conference_sessions = [
-    {"title": "Prevention of C.M.", "start": "2025-05-02 08:30", "end": "2025-05-02 10:00"},
-    {"title": "The TDCJ SO Treatment Program", "start": "2025-05-02 10:30", "end": "2025-05-02 12:00"},
-    # …and the rest of your sessions…
-]
+RAW_LOG_PREVIEW = 1000   # newest scans shown in the admin raw-log table
+CAMERA_DEVICE = int(os.getenv("CAMERA_DEVICE", "0"))   # kiosk camera for continuous mode
+SCANNER_IDLE_TIMEOUT = 15.0   # seconds without a feed poll before continuous mode stops itself
+ADMIN_LIVE_REFRESH = float(os.getenv("ADMIN_LIVE_REFRESH", "5"))   # seconds between live polls
 
 # ─── Init page state ────────────────────────────────────────────────────────
 if 'page' not in st.session_state:
     st.session_state.page = 'home'
 
+metrics.begin_capture()   # per-rerun breakdown for the Performance panel
+
 
 # ─── Utility functions ─────────────────────────────────────────────────────
 def generate_qr_code(badge_id: int) -> bytes:
-    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=5, border=2)
-    qr.add_data(str(badge_id))
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    return buf.getvalue()
+    """Badge QR as PNG bytes, from the on-disk cache built by qrcodegenerator."""
+    from qrcodegenerator import get_qr_png
+    return get_qr_png(badge_id)
 
 
 def run_qr_scanner():
@@ -103,96 +62,165 @@ def run_qr_scanner():
     if not img_file:
         return
 
-    img = Image.open(img_file).convert("RGB")
-    gray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
-    data, _, _ = cv2.QRCodeDetector().detectAndDecode(gray)
+    from qr_decoder import decode_qr
+
+    with span("app.decode_qr"):
+        data = decode_qr(img_file.getvalue())
     if not data:
         st.warning("⚠ QR Code not recognized.")
         return
 
     badge_id = data.strip()
-    log_scan(badge_id)
-
-    people = get_all_attendees()
-    person = next((p for p in people if p["badge_id"] == int(badge_id)), None)
-    name = person["name"] if person else badge_id
-    st.success(f"✅ Scanned and checked in: {name}")
-
+    if not badge_id.isdigit():
+        st.warning(f"⚠ Not a badge QR code: {badge_id[:40]}")
+        return
+    try:
+        result, queued = check_in_or_queue(badge_id)
+    except Exception as e:
+        st.error(f"❌ Check-in failed for badge {badge_id}: {e}")
+        return
+    if queued:
+        st.info(f"📥 Offline – badge {badge_id} queued for sync")
+        return
 
-def generate_ce_report() -> pd.DataFrame:
-    logs = get_scan_log()
-    attendees = get_all_attendees()
-    attendee_map = {a["badge_id"]: {"Name": a["name"], "Email": a["email"]} for a in attendees}
-    report = {}
+    name = result["name"] or badge_id
+    st.success(f"✅ Scanned and checked in: {name} (scan {result['scan_count']})")
+
+
+def stop_continuous_scanner():
+    """Stop this session's camera thread (if any) and release the camera."""
+    scanner = st.session_state.get("scanner")
+    if scanner is not None:
+        scanner.stop(timeout=2)
+        st.session_state.scanner = None
+
+
+def run_continuous_scanner():
+    st.subheader("🎥 Continuous Scanning")
+    enabled = st.toggle("Scan continuously from the kiosk camera", key="continuous")
+    scanner = st.session_state.get("scanner")
+
+    if enabled and (scanner is None or not scanner.running):
+        from video_scanner import CameraSource, ContinuousScanner
+        # the feed below polls every second; a closed tab stops polling, and
+        # the scanner then shuts itself down instead of holding the camera
+        scanner = ContinuousScanner(CameraSource(CAMERA_DEVICE), log_scan,
+                                    idle_timeout=SCANNER_IDLE_TIMEOUT).start()
+        st.session_state.scanner = scanner
+        st.session_state.scan_feed = []
+    elif not enabled:
+        stop_continuous_scanner()
+        return
 
-    for sess in conference_sessions:
-        start = datetime.datetime.strptime(sess["start"], "%Y-%m-%d %H:%M")
-        end   = datetime.datetime.strptime(sess["end"],   "%Y-%m-%d %H:%M")
-        title = sess["title"]
+    @st.fragment(run_every=1)
+    def scan_feed():
+        # only drains the event queue – never waits on the decoder
+        feed = st.session_state.scan_feed
+        roster = get_roster()
+        for ev in scanner.events():
+            name = roster.name_for(ev.badge_id, ev.badge_id)
+            feed.insert(0, f"⚠ {name}: {ev.error}" if ev.error
+                        else f"✅ {name} ({(ev.confirmed_at - ev.captured_at) * 1000:.0f} ms)")
+        del feed[10:]
+        stats = scanner.stats()
+        st.caption(f"{stats['fps']:.1f} fps · {stats['confirmed']} checked in")
+        for line in feed:
+            st.write(line)
+
+    scan_feed()
+
+
+@st.cache_resource
+def get_schedule():
+    """The programme (schedule.yaml: rooms, tracks, sessions, kiosk rooms), compiled once."""
+    from schedule import load_schedule
+    return load_schedule()
+
+
+@st.cache_resource
+def get_snapshot():
+    """One attendance snapshot per process, shared by all sessions."""
+    from snapshot import AttendanceSnapshot
+    return AttendanceSnapshot(get_schedule().sessions)
+
+
+@st.cache_resource
+def warm_up():
+    """
+    Once per process, right after the first render: import the QR decoder
+    (OpenCV) and create the backend client + roster on a background thread,
+    so the first scan after a kiosk restart doesn't pay for them.
+    """
+    def run():
+        import qr_decoder  # noqa: F401
+        warm_up_backend()
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+@timed("app.load_snapshot")
+def load_snapshot(force: bool = False):
+    """Refresh the shared snapshot with new scans (if any) and return it."""
+    snap = get_snapshot()
+    snap.sync(load_admin_data, force=force)
+    return snap
+
+
+@timed("app.poll_snapshot")
+def poll_snapshot():
+    """
+    load_snapshot() for live mode: new scans and an attendee count, no roster
+    download. Forced, because the fragment's run_every already paces it –
+    left to SNAPSHOT_MAX_AGE, every other tick would be skipped.
+    """
+    snap = get_snapshot()
+    snap.sync(poll_admin_data, force=True)
+    return snap
+
+
+@timed("app.generate_ce_report")
+def generate_ce_report():
+    return load_snapshot().ce_report()
+
+
+@timed("app.generate_flattened_log")
+def generate_flattened_log():
+    return load_snapshot().flattened_log()
 
-        for log in logs:
-            bid = log["badge_id"]
-            ts  = log["timestamp"]
-            if bid not in attendee_map or not (start <= ts <= end):
-                continue
-            report.setdefault(bid, {
-                "Name":  attendee_map[bid]["Name"],
-                "Email": attendee_map[bid]["Email"]
-            })[title] = "✅"
 
-    # fill in blanks
-    for badge_data in report.values():
-        for sess in conference_sessions:
-            badge_data.setdefault(sess["title"], "")
+def export_report(snap, report: str, fmt: str) -> bytes:
+    """A report file; full CSVs come straight from Postgres when DATABASE_URL is set."""
+    if fmt == "csv" and report in ("raw", "attendees"):
+        data = export_csv(report)
+        if data is not None:
+            return data
+    return snap.export(report, fmt)
 
-    return pd.DataFrame(report.values())
 
-import datetime  # make sure this is imported at the top
+def export_buttons(snap, report: str, label: str, file_stem: str):
+    """
+    CSV / Parquet / XLSX downloads for one snapshot report. The files are
+    only built when clicked (then cached per data version), so reruns
+    don't serialize anything.
+    """
+    from exports import FORMATS
+    for col, fmt in zip(st.columns(3), ("csv", "parquet", "xlsx")):
+        col.download_button(f"📥 {label} ({fmt.upper()})",
+                            lambda fmt=fmt: export_report(snap, report, fmt),
+                            file_name=f"{file_stem}.{fmt}", mime=FORMATS[fmt],
+                            key=f"export_{report}_{fmt}", on_click="ignore")
 
-import datetime
-import pandas as pd
 
-def generate_flattened_log():
-    # 1) Fetch registered attendees
-    attendees = get_all_attendees()   # list of dicts: { badge_id, name, email, … }
-    attendee_map = { int(a["badge_id"]): a for a in attendees }
-
-    # 2) Fetch raw scans
-    raw_scans = get_scan_log()        # list of { badge_id, name, email, timestamp }
-
-    # 3) Group scans by badge_id (earliest → latest)
-    scans_by = {}
-    for entry in sorted(raw_scans, key=lambda x: x["timestamp"]):
-        bid = int(entry["badge_id"])
-        scans_by.setdefault(bid, []).append(entry["timestamp"])
-
-    # 4) Build a row for every scanned badge
-    rows = []
-    for bid, times in scans_by.items():
-        # look up registration info if it exists
-        info = attendee_map.get(bid, {})
-        row = {
-            "Badge ID": bid,
-            "Name":      info.get("name", f"<unregistered {bid}>"),
-            "Email":     info.get("email", ""),
-        }
-        # fill Scan 1…Scan 10
-        for i in range(1, 11):
-            if i <= len(times):
-                row[f"Scan {i}"] = times[i-1].strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                row[f"Scan {i}"] = ""
-        rows.append(row)
-
-    # 5) Sort numerically by badge and return
-    rows = sorted(rows, key=lambda r: r["Badge ID"])
-    return pd.DataFrame(rows)
 # ─── Page layouts ────────────────────────────────────────────────────────────
 if st.session_state.page == 'home':
     st.title("📋 Conference Check‑In System")
+    if DEVICE_ID:
+        st.caption(f"Kiosk {DEVICE_ID} · {get_schedule().room_of(DEVICE_ID) or 'no room assigned'}")
 
     # QR scanner
     run_qr_scanner()
+    run_continuous_scanner()
 
     # Manual badge ID
     st.subheader("🔢 Manual Check‑In by Badge ID")
@@ -206,14 +234,44 @@ if st.session_state.page == 'home':
 
     # Manual name lookup
     st.subheader("👤 Manual Check‑In by Name")
-    people = get_all_attendees()
-    names  = [f"{p['name']} ({p['badge_id']})" for p in people]
-    selection = st.selectbox("Select Attendee", names, index=0)
+    roster = get_roster()
+    query = st.text_input("Search name or email", key="name_query")
+    matches = roster.search.search(query) if query else []
+    if query and not matches:
+        st.caption("No matching attendees.")
+    selection = st.selectbox(
+        "Select Attendee", matches, index=0 if matches else None,
+        format_func=lambda m: f"{m.name} · {m.email} ({m.badge_id})",
+    )
     if st.button("Check In Selected", key="checkin_select"):
-        bid = int(selection.split("(")[-1].rstrip(")"))
-        log_scan(bid)
-        name = next(p["name"] for p in people if p["badge_id"] == bid)
-        st.success(f"✅ Checked in: {name} ({bid})")
+        if selection:
+            log_scan(selection.badge_id)
+            st.success(f"✅ Checked in: {selection.name} ({selection.badge_id})")
+        else:
+            st.warning("Search for an attendee first.")
+
+    # Sync status of the local scan journal
+    sync = journal_status()
+    st.caption(f"🔄 Pending sync: {sync['pending']} · Synced: {sync['flushed']}")
+    if sync["pending"] and sync["last_error"]:
+        st.caption(f"⚠ Last sync error: {sync['last_error']}")
+    if sync["failed"]:
+        st.caption(f"❌ {sync['failed']} scan(s) rejected by the server and set aside "
+                   "(see scan_journal.failed()).")
+
+    # Live counts from the shared check-in service, when kiosks use one
+    if CHECKIN_SERVICE_URL:
+        @st.fragment(run_every=2)
+        def live_counts():
+            try:
+                counts = service_counts()
+            except Exception as e:
+                st.caption(f"⚠ Check-in service unreachable: {e}")
+                return
+            st.caption(f"📡 {counts['checked_in']} checked in · {counts['scans']} scans · "
+                       f"{counts['kiosks']} live kiosks")
+
+        live_counts()
 
     # Go to Admin
     if st.button("🔐 Admin Area"):
@@ -223,41 +281,110 @@ if st.session_state.page == 'home':
 elif st.session_state.page == 'admin':
     st.title("🔐 Admin – Attendance Dashboard")
 
-    df_all = generate_flattened_log()
-
-    st.subheader("👥 All Registered Attendees")
-    st.write(f"Showing {len(df_all)} attendees in numeric order")
-    st.dataframe(df_all)
-    st.download_button(
-    "📥 Download Full Attendee List",
-    df_all.to_csv(index=False).encode("utf-8"),
-    file_name="all_attendees.csv"
-)
+    if st.button("🔄 Refresh data"):
+        load_snapshot(force=True)
+    live_mode = st.toggle(f"📡 Live – check for new scans every {ADMIN_LIVE_REFRESH:g} s",
+                          key="admin_live")
+
+    # live mode reruns only this fragment, against the same shared snapshot
+    @st.fragment(run_every=ADMIN_LIVE_REFRESH if live_mode else None)
+    def admin_reports():
+        snap = poll_snapshot() if live_mode else load_snapshot()
+        st.caption(f"{len(snap)} scans · data version {snap.version} · "
+                   f"updated {datetime.datetime.fromtimestamp(snap.refreshed_at):%H:%M:%S}")
+
+        with span("app.flattened_log"):
+            df_all = snap.flattened_log()
+
+        st.subheader("👥 All Registered Attendees")
+        st.write(f"Showing {len(df_all)} attendees in numeric order")
+        st.dataframe(df_all)
+        export_buttons(snap, "attendees", "Full Attendee List", "all_attendees")
+
+        st.markdown("---")
+
+        # CE Credit report
+        st.subheader("📜 CE Credit Attendance Report")
+        with span("app.ce_report"):
+            df_ce = snap.ce_report()
+        st.dataframe(df_ce)
+        export_buttons(snap, "ce", "CE Credit Report", "ce_credits")
+
+        st.markdown("---")
+
+        # Occupancy & arrivals
+        st.subheader("🏟 Room Occupancy & Arrivals")
+        with span("app.occupancy"):
+            df_heads = snap.headcounts()
+            df_arrivals = snap.arrivals()
+            df_peaks = snap.peak_windows()
+            df_dwell = snap.dwell()
+        live = df_heads[df_heads["In progress"]]
+        for col, (_, row) in zip(st.columns(max(len(live), 1)), live.iterrows()):
+            col.metric(row["Session"], f"{row['Arrived']} arrived")
+        st.dataframe(df_heads)
+        st.write(f"Arrivals per {snap.occupancy.bucket_min} minutes")
+        st.bar_chart(df_arrivals)
+        st.write("Peak check-in windows")
+        st.dataframe(df_peaks)
+        st.write("Time in sessions per attendee")
+        st.dataframe(df_dwell)
+        export_buttons(snap, "dwell", "Dwell Report", "dwell")
+
+        st.markdown("---")
+
+
+        st.subheader("📊 Raw Attendance Log")
+        with span("app.raw_log"):
+            df_raw = snap.raw_log(limit=RAW_LOG_PREVIEW)
+        st.caption(f"Latest {len(df_raw)} scans – the download contains the full log")
+        st.dataframe(df_raw)
+        export_buttons(snap, "raw", "Raw Attendance Log", "raw_attendance")
+
+        st.download_button("🗜 Download All Reports (ZIP)",
+                           lambda: snap.export("all", "zip"),
+                           file_name="conference_reports.zip", mime="application/zip",
+                           on_click="ignore")
+
+    admin_reports()
 
     st.markdown("---")
-
-    # CE Credit report
-    st.subheader("📜 CE Credit Attendance Report")
-    df_ce = generate_ce_report()
-    st.dataframe(df_ce)
-    st.download_button("📥 Download CE Credit Report",
-                       df_ce.to_csv(index=False).encode("utf-8"),
-                       file_name="ce_credits.csv")
-
-    st.markdown("---")
-
-    
-    st.subheader("📊 Raw Attendance Log")
-    raw = get_scan_log()
-    df_raw = pd.DataFrame(raw)
-    st.dataframe(df_raw)
-    st.download_button(
-    "📥 Download Raw Attendance Log",
-    df_raw.to_csv(index=False).encode("utf-8"),
-    file_name="raw_attendance.csv"
-)
-
-
+    st.subheader("📥 Upload Handheld Scanner Dumps")
+    dumps = st.file_uploader("Scanner exports (badge, timestamp[, device, uuid])",
+                             type=["csv", "txt"], accept_multiple_files=True)
+    if dumps and st.button("Upload Scans"):
+        from scan_import import read_scan_dump
+        for dump in dumps:
+            device = dump.name.rsplit(".", 1)[0]
+            records, rejected = read_scan_dump(dump.getvalue(), device_id=device)
+            stats = log_scans(records)
+            st.write(f"{dump.name}: {stats['inserted']} new scans, "
+                     f"{stats['duplicates']} already logged, {len(rejected)} unreadable lines")
+        load_snapshot(force=True)
+
+    # hidden unless the page is opened with ?perf=1
+    if st.query_params.get("perf") == "1":
+        import pandas as pd
+
+        st.markdown("---")
+        st.subheader("⏱ Performance")
+        st.caption("Timings, backend round trips, rows and bytes per function. "
+                   "Latency percentiles are histogram bucket bounds.")
+        columns = ["calls", "errors", "total_ms", "mean_ms", "p50_ms", "p95_ms",
+                   "round_trips", "rows", "bytes"]
+        st.write("This rerun")
+        st.dataframe(pd.DataFrame.from_dict(metrics.captured(), orient="index",
+                                            columns=columns))
+        st.write(f"Since {datetime.datetime.fromtimestamp(metrics.started_at):%Y-%m-%d %H:%M:%S}")
+        st.dataframe(pd.DataFrame.from_dict(metrics.snapshot(), orient="index",
+                                            columns=columns))
+        c1, c2, c3 = st.columns(3)
+        c1.download_button("📥 Prometheus", metrics.to_prometheus(),
+                           file_name="metrics.prom", mime="text/plain")
+        c2.download_button("📥 JSON", metrics.to_json(),
+                           file_name="metrics.json", mime="application/json")
+        if c3.button("Reset counters"):
+            metrics.reset()
 
     # Navigation
     st.markdown("---")
@@ -286,5 +413,36 @@ elif st.session_state.page == 'register':
         else:
             st.warning("Please fill in all fields.")
 
+    st.markdown("---")
+    st.subheader("📤 Bulk Import")
+    upload = st.file_uploader("Registration export (CSV or XLSX) with name, email "
+                              "and an optional badge_id column", type=["csv", "xlsx"])
+    if upload is not None:
+        from attendee_import import IMPORT_CHUNK, prepare, read_table, to_records
+        try:
+            rows, rejected = prepare(read_table(upload.getvalue(), upload.name), get_roster())
+        except ValueError as e:
+            st.error(f"Could not read {upload.name}: {e}")
+        else:
+            st.write(f"{len(rows)} rows ready to import, {len(rejected)} rejected. "
+                     f"Blank badge IDs get the lowest free numbers.")
+            if len(rejected):
+                st.dataframe(rejected)
+                st.download_button("📥 Download Rejected Rows",
+                                   rejected.to_csv(index=False).encode("utf-8"),
+                                   file_name="rejected_attendees.csv")
+            if len(rows) and st.button(f"Import {len(rows)} Attendees"):
+                bar = st.progress(0.0)
+                stats = import_attendees(
+                    to_records(rows), chunk_size=IMPORT_CHUNK,
+                    on_progress=lambda done, total: bar.progress(
+                        done / total, text=f"{done}/{total} rows written"),
+                )
+                st.success(f"🎉 Imported {stats['inserted']} attendees in "
+                           f"{stats['requests']} requests ({stats['skipped']} already existed)")
+
     if st.button("⬅ Back to Admin"):
         switch_page('admin')
+
+
+warm_up()
@@ -0,0 +1,206 @@
+# async_database.py
+#
+# asyncio side of the data layer. One supabase AsyncClient lives on a private
+# event-loop thread, so its HTTP connections are reused across calls;
+# independent reads are gathered and large tables are fetched as key-range
+# stripes with several requests in flight. database.py keeps the
+# synchronous API and calls in here through run().
+
+import asyncio
+import contextvars
+import math
+import os
+import threading
+
+from metrics import record_bytes, record_request
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "1000"))
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "4"))   # concurrent requests per fetch
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_client = None
+
+
+# ─── Event loop ──────────────────────────────────────────────────────────────
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """The data layer's event loop, running on its own daemon thread."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever,
+                                            name="db-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+class _Traffic:
+    """Requests made on behalf of one run() call, credited to its caller's spans."""
+
+    __slots__ = ("thread", "rows", "nbytes")
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.rows = []
+        self.nbytes = 0
+
+    def replay(self):
+        for rows in self.rows:
+            record_request(rows=rows)
+        if self.nbytes:
+            record_bytes(self.nbytes)
+
+
+_traffic = contextvars.ContextVar("traffic", default=None)
+
+
+def caller_thread() -> int:
+    """Thread that started the request now running (for per-thread accounting)."""
+    traffic = _traffic.get()
+    return traffic.thread if traffic else threading.get_ident()
+
+
+async def _tracked(coro, traffic: _Traffic):
+    _traffic.set(traffic)
+    return await coro
+
+
+def run(coro, timeout: float = None):
+    """
+    Run `coro` on the data-layer loop and wait for its result – the bridge
+    for synchronous callers such as the Streamlit pages. After `timeout`
+    seconds the coroutine is cancelled and TimeoutError raised.
+    """
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run() called from the data-layer loop; await the coroutine instead")
+    traffic = _Traffic()
+    future = asyncio.run_coroutine_threadsafe(_tracked(coro, traffic), loop)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"no answer from the database within {timeout} s") from None
+    finally:
+        traffic.replay()
+
+
+# ─── Client ──────────────────────────────────────────────────────────────────
+async def _count_bytes(response):
+    await response.aread()
+    traffic = _traffic.get()
+    if traffic is not None:
+        traffic.nbytes += len(response.content)
+
+
+def _add_bytes(nbytes: int):
+    traffic = _traffic.get()
+    if traffic is not None:
+        traffic.nbytes += nbytes
+
+
+def _instrument(client):
+    """Report response sizes (httpx hook, or the fake's hook list)."""
+    postgrest = getattr(client, "postgrest", None)
+    if postgrest is not None:
+        postgrest.session.event_hooks["response"].append(_count_bytes)
+    elif hasattr(client, "response_hooks"):
+        client.response_hooks.append(_add_bytes)
+    return client
+
+
+async def get_client():
+    """The process-wide supabase AsyncClient, created on first use."""
+    global _client
+    if _client is None:
+        from supabase import acreate_client
+        # read at first use: database.py loads .env after importing this module
+        client = await acreate_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        if _client is None:
+            _client = _instrument(client)
+    return _client
+
+
+def set_client(client):
+    """Use `client` (an async client, or None to build one from the env) from now on."""
+    global _client
+    _client = _instrument(client) if client is not None else None
+
+
+async def execute(query):
+    """Await one PostgREST request, counting it (and its rows) for metrics."""
+    resp = await query.execute()
+    traffic = _traffic.get()
+    if traffic is not None:
+        traffic.rows.append(len(resp.data) if isinstance(resp.data, list) else 1)
+    return resp
+
+
+# ─── Readers ─────────────────────────────────────────────────────────────────
+async def _fetch_range(table: str, columns: str, key: str, lo: int, hi: int,
+                       page_size: int, gate: asyncio.Semaphore):
+    """Pages of rows with lo < key <= hi, keyset-paginated within the range."""
+    client = await get_client()
+    pages, last = [], lo
+    while True:
+        q = client.table(table) \
+                  .select(columns) \
+                  .order(key, desc=False) \
+                  .gt(key, last) \
+                  .lte(key, hi) \
+                  .limit(page_size)
+        async with gate:
+            rows = (await execute(q)).data
+        if not rows:
+            return pages
+        pages.append(rows)
+        last = rows[-1][key]
+        if last >= hi:
+            return pages
+
+
+async def fetch_table(table: str, columns: str, key: str, after: int = None,
+                      page_size: int = PAGE_SIZE, in_flight: int = MAX_IN_FLIGHT):
+    """
+    Every row with an integer `key` > `after` (all rows if None), as pages
+    in key order.
+
+    The first page is read together with the last key and the row count;
+    whatever lies beyond the first page is then cut into key-range stripes
+    of about `page_size` rows each, fetched concurrently with at most
+    `in_flight` requests at a time. Each stripe is keyset-paginated on its
+    own, so gaps, skewed keys or a server row cap smaller than `page_size`
+    only add requests, never drop rows.
+    """
+    client = await get_client()
+    first_q = client.table(table).select(columns).order(key, desc=False).limit(page_size)
+    last_q = client.table(table).select(key, count="exact").order(key, desc=True).limit(1)
+    if after is not None:
+        first_q = first_q.gt(key, after)
+        last_q = last_q.gt(key, after)
+    first, last = await asyncio.gather(execute(first_q), execute(last_q))
+    if not first.data:
+        return []
+
+    lo, hi = first.data[-1][key], last.data[0][key] if last.data else None
+    if hi is None or lo >= hi:
+        return [first.data]
+    rest = (last.count or hi - lo) - len(first.data)
+    stripes = max(1, math.ceil(rest / page_size))
+    width = math.ceil((hi - lo) / stripes)
+    bounds = [(start, min(start + width, hi)) for start in range(lo, hi, width)]
+    gate = asyncio.Semaphore(in_flight)
+    parts = await asyncio.gather(*(
+        _fetch_range(table, columns, key, a, b, page_size, gate) for a, b in bounds
+    ))
+    return [first.data] + [page for part in parts for page in part]
+
+
+async def gather(*reads):
+    """Await independent reads concurrently; None entries pass through as None."""
+    async def skip():
+        return None
+    return await asyncio.gather(*(r if r is not None else skip() for r in reads))
@@ -0,0 +1,147 @@
+# attendee_import.py
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "1000"))   # rows per upsert request
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+# header spellings seen in registration exports → our column names
+COLUMN_ALIASES = {
+    "badge_id": "badge_id", "badge": "badge_id", "badge id": "badge_id",
+    "badge #": "badge_id", "badge number": "badge_id",
+    "name": "name", "full name": "name", "attendee": "name",
+    "email": "email", "e-mail": "email", "email address": "email",
+}
+
+
+# ─── Reading ─────────────────────────────────────────────────────────────────
+def read_table(source, filename: str = None) -> pd.DataFrame:
+    """
+    Load a registration export (CSV or XLSX) from a path, bytes or file
+    object, with headers normalized to badge_id / name / email.
+    """
+    name = filename or (source if isinstance(source, str) else getattr(source, "name", ""))
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if str(name).lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str, skipinitialspace=True)
+
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), c))
+    missing = {"name", "email"} - set(df.columns)
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(sorted(missing))}")
+    if "badge_id" not in df.columns:
+        df["badge_id"] = None
+    return df[["badge_id", "name", "email"]]
+
+
+# ─── Validation ─────────────────────────────────────────────────────────────
+def validate(df: pd.DataFrame, roster):
+    """
+    Check every row at once against the file itself and the cached roster.
+
+    Returns (valid, rejected): `valid` has clean name/email and a nullable
+    integer badge_id (blank = assign one); `rejected` keeps the original
+    row number (1-based, as in a spreadsheet) and an `error` column.
+    """
+    name = df["name"].fillna("").astype(str).str.strip()
+    email = df["email"].fillna("").astype(str).str.strip()
+    email_key = email.str.lower()
+    raw_badge = df["badge_id"].fillna("").astype(str).str.strip()
+    badge = pd.to_numeric(raw_badge.where(raw_badge != ""), errors="coerce")
+
+    errors = pd.Series("", index=df.index, dtype=object)
+
+    def flag(mask, message):
+        errors[mask & (errors == "")] = message
+
+    flag(name == "", "missing name")
+    flag(email == "", "missing email")
+    flag(~email.str.match(EMAIL_PATTERN), "invalid email")
+    flag((raw_badge != "") & (badge.isna() | (badge % 1 != 0) | (badge < 1)),
+         "invalid badge_id")
+    flag(email_key.isin(list(roster.by_email)), "email already registered")
+    flag(badge.isin(list(roster.by_badge)), "badge_id already taken")
+    flag(email_key.duplicated(keep="first"), "duplicate email in file")
+    flag(badge.notna() & badge.duplicated(keep="first"), "duplicate badge_id in file")
+
+    ok = errors == ""
+    valid = pd.DataFrame({
+        "badge_id": badge[ok].astype("Int64"),
+        "name": name[ok],
+        "email": email[ok],
+    })
+    rejected = df[~ok].copy()
+    rejected.insert(0, "row", df.index[~ok] + 2)     # + header row, 1-based
+    rejected["error"] = errors[~ok]
+    return valid.reset_index(drop=True), rejected.reset_index(drop=True)
+
+
+def assign_badges(valid: pd.DataFrame, roster) -> pd.DataFrame:
+    """Give rows without a badge_id the lowest IDs not used in the roster or file."""
+    blank = valid["badge_id"].isna().to_numpy()
+    n = int(blank.sum())
+    if n == 0:
+        return valid.astype({"badge_id": "int64"})
+
+    taken = np.fromiter(roster.by_badge, np.int64, len(roster.by_badge))
+    taken = np.concatenate([taken, valid["badge_id"].dropna().to_numpy(np.int64)])
+    candidates = np.arange(1, len(taken) + n + 1, dtype=np.int64)
+    free = candidates[~np.isin(candidates, taken)][:n]
+
+    out = valid.copy()
+    ids = out["badge_id"].to_numpy(np.float64, na_value=np.nan)
+    ids[blank] = free
+    out["badge_id"] = ids.astype(np.int64)
+    return out
+
+
+def prepare(df: pd.DataFrame, roster):
+    """validate + assign_badges: (rows ready to insert, rejected rows)."""
+    valid, rejected = validate(df, roster)
+    return assign_badges(valid, roster), rejected
+
+
+def to_records(df: pd.DataFrame):
+    return [{"badge_id": int(b), "name": n, "email": e}
+            for b, n, e in zip(df["badge_id"], df["name"], df["email"])]
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import attendees from a CSV/XLSX export.")
+    parser.add_argument("file", help="registration export (.csv or .xlsx)")
+    parser.add_argument("--chunk", type=int, default=IMPORT_CHUNK, help="rows per request")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    parser.add_argument("--rejects", help="write rejected rows (with reasons) to this CSV")
+    args = parser.parse_args()
+
+    from database import get_roster, import_attendees
+
+    t0 = time.perf_counter()
+    rows, rejected = prepare(read_table(args.file), get_roster())
+    print(f"{len(rows)} valid, {len(rejected)} rejected")
+    if args.rejects and len(rejected):
+        rejected.to_csv(args.rejects, index=False)
+    if args.dry_run or rows.empty:
+        return
+
+    def progress(done, total):
+        print(f"  {done}/{total} rows written")
+
+    stats = import_attendees(to_records(rows), chunk_size=args.chunk, on_progress=progress)
+    print(f"✅ Imported {stats['inserted']} attendees in {stats['requests']} requests "
+          f"({time.perf_counter() - t0:.2f}s).")
+
+
+if __name__ == "__main__":
+    main()
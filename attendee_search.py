@@ -0,0 +1,190 @@
+# attendee_search.py
+
+import bisect
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "8"))
+FUZZY_MIN_SIMILARITY = 0.3    # trigram Jaccard below this is not a match
+
+Match = namedtuple("Match", "badge_id name email tier")
+
+# match tiers, best first
+EXACT_BADGE, NAME_PREFIX, WORD_PREFIX, FUZZY = range(4)
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_JOINERS = re.compile(r"[-'\u2019\u2010\u2011]")     # apostrophes and hyphens inside names
+
+
+def normalize(text: str) -> str:
+    """Casefolded, accent-free text: 'José Núñez' → 'jose nunez'."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold().strip()
+
+
+def _name_words(text: str) -> set:
+    """
+    Words of normalized text, with names joined across apostrophes and
+    hyphens as well as split at them: "o'brien" → {"obrien", "o", "brien"}.
+    """
+    return set(_WORDS.findall(_JOINERS.sub("", text))) | set(_WORDS.findall(text))
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ─── Index ──────────────────────────────────────────────────────────────────
+class SearchIndex:
+    """
+    Type-ahead index over attendee names and emails.
+
+    Tokens (name words, the email and its local-part words, the badge id)
+    are kept in one sorted list next to their badge ids – a flattened
+    prefix trie: every token under a prefix is one contiguous `bisect`
+    range. Multi-word queries intersect the ranges of each word. Full
+    names are kept sorted as well, so the best tier (name starts with the
+    query) is read off in order without ranking the whole range. When
+    prefixes find fewer than k people, a trigram index over the name words
+    supplies fuzzy matches for typos, each query word scored against the
+    person's closest name word. `add()` patches the index in place, so a
+    registration doesn't rebuild it.
+    """
+
+    def __init__(self, attendees=()):
+        self._lock = threading.Lock()
+        self._grams = {}           # trigram → {name words}
+        self._words = {}           # name word → (trigram count, {badge ids})
+        self._people = {}          # badge id → (name, email, normalized name, tokens, name words)
+        rows = sorted((t, bid) for a in attendees for bid, t in self._index_row(a))
+        self._names = sorted((p[2], bid) for bid, p in self._people.items())
+        self._keys = [t for t, _ in rows]          # sorted tokens
+        self._owners = [bid for _, bid in rows]    # badge id of each token
+
+    def __len__(self):
+        return len(self._people)
+
+    def _index_row(self, attendee):
+        """Register one attendee's entry; return its (badge id, token) pairs."""
+        bid = int(attendee["badge_id"])
+        name, email = attendee.get("name") or "", attendee.get("email") or ""
+        norm_name, norm_email = normalize(name), normalize(email)
+        words = _name_words(norm_name)
+        tokens = set(words)
+        if norm_email:
+            tokens.add(norm_email)
+            tokens.update(_WORDS.findall(norm_email.split("@")[0]))
+        tokens.add(str(bid))
+        for w in words:
+            if w not in self._words:
+                grams = _trigrams(w)
+                for g in grams:
+                    self._grams.setdefault(g, set()).add(w)
+                self._words[w] = (len(grams), set())
+            self._words[w][1].add(bid)
+        self._people[bid] = (name, email, norm_name, tokens, words)
+        return [(bid, t) for t in tokens]
+
+    def add(self, *attendees):
+        """Insert or replace attendees (e.g. after a registration)."""
+        with self._lock:
+            for a in attendees:
+                self._remove(int(a["badge_id"]))
+                for bid, token in self._index_row(a):
+                    pos = bisect.bisect_left(self._keys, token)
+                    self._keys.insert(pos, token)
+                    self._owners.insert(pos, bid)
+                bid = int(a["badge_id"])
+                bisect.insort(self._names, (self._people[bid][2], bid))
+
+    def _remove(self, bid: int):
+        entry = self._people.pop(bid, None)
+        if entry is None:
+            return
+        for token in entry[3]:
+            lo = bisect.bisect_left(self._keys, token)
+            hi = bisect.bisect_right(self._keys, token)
+            for i in range(lo, hi):
+                if self._owners[i] == bid:
+                    del self._keys[i], self._owners[i]
+                    break
+        for w in entry[4]:
+            owners = self._words[w][1]
+            owners.discard(bid)
+            if not owners:
+                del self._words[w]
+                for g in _trigrams(w):
+                    self._grams[g].discard(w)
+        del self._names[bisect.bisect_left(self._names, (entry[2], bid))]
+
+    # ── queries ────────────────────────────────────────────────────────────
+    def _prefixed(self, word: str) -> set:
+        lo = bisect.bisect_left(self._keys, word)
+        hi = bisect.bisect_left(self._keys, word + "\uffff")
+        return set(self._owners[lo:hi])
+
+    def search(self, query: str, k: int = SEARCH_TOP_K):
+        """Best `k` matches for `query`, as Match(badge_id, name, email, tier)."""
+        q = normalize(query)
+        words = _WORDS.findall(_JOINERS.sub("", q)) if "@" not in q else [q]
+        if not words:
+            return []
+        with self._lock:
+            people = self._people
+            ranked = []
+            if q.isdigit() and int(q) in people:
+                ranked.append((EXACT_BADGE, int(q)))
+            lo = bisect.bisect_left(self._names, (q,))
+            hi = bisect.bisect_left(self._names, (q + "\uffff",))
+            ranked += [(NAME_PREFIX, b) for _, b in self._names[lo:min(hi, lo + k)]
+                       if not ranked or b != ranked[0][1]]
+            seen = {b for _, b in ranked}
+
+            if len(seen) < k:
+                hits = self._prefixed(words[0])
+                for w in words[1:]:
+                    if not hits:
+                        break
+                    hits &= self._prefixed(w)
+                ranked += [(WORD_PREFIX, b) for _, b in heapq.nsmallest(
+                    k - len(seen), ((people[b][2], b) for b in hits - seen))]
+                seen |= hits
+
+            out = [Match(b, people[b][0], people[b][1], t) for t, b in ranked[:k]]
+            if len(out) < k and len(q) >= 3:
+                out += self._fuzzy(q, k - len(out), exclude=seen)
+        return out
+
+    def _fuzzy(self, q: str, k: int, exclude):
+        """
+        Trigram Jaccard of each query word against each name word; a person
+        scores the mean over query words of their closest name word.
+        """
+        words = _WORDS.findall(_JOINERS.sub("", q))
+        best = {}                  # badge id → best similarity per query word
+        for qi, word in enumerate(words):
+            grams = _trigrams(word)
+            shared = Counter(w for g in grams for w in self._grams.get(g, ()))
+            # scored once per distinct name word, then handed to its owners
+            for w, n in shared.items():
+                size, owners = self._words[w]
+                similarity = n / (len(grams) + size - n)
+                for bid in owners:
+                    scores = best.get(bid)
+                    if scores is None:
+                        scores = best[bid] = [0.0] * len(words)
+                    if similarity > scores[qi]:
+                        scores[qi] = similarity
+        scored = []
+        for bid, scores in best.items():
+            similarity = sum(scores) / len(words)
+            if similarity >= FUZZY_MIN_SIMILARITY and bid not in exclude:
+                scored.append((-similarity, self._people[bid][2], bid))
+        return [Match(b, self._people[b][0], self._people[b][1], FUZZY)
+                for _, _, b in heapq.nsmallest(k, scored)]
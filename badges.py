@@ -0,0 +1,134 @@
+# badges.py
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from qrcodegenerator import QR_DIR, generate_bulk, load_manifest, qr_modules
+
+# ─── Badge layout ────────────────────────────────────────────────────────────
+BADGES_PER_ROW = 3
+BADGE_WIDTH_INCH = 2.3
+BADGE_HEIGHT_INCH = 3.4
+QR_SIZE_INCH = 0.8
+PAGE_WIDTH, PAGE_HEIGHT = letter
+
+X_MARGIN = 0.5 * inch
+Y_MARGIN = 0.5 * inch
+X_SPACING = (PAGE_WIDTH - 2 * X_MARGIN - BADGES_PER_ROW * BADGE_WIDTH_INCH * inch) / (BADGES_PER_ROW - 1)
+Y_SPACING = 0.3 * inch
+
+X_POSITIONS = [X_MARGIN + i * (BADGE_WIDTH_INCH * inch + X_SPACING) for i in range(BADGES_PER_ROW)]
+Y_START = PAGE_HEIGHT - Y_MARGIN - BADGE_HEIGHT_INCH * inch
+ROWS_PER_PAGE = 1 + int((Y_START - Y_MARGIN) // (BADGE_HEIGHT_INCH * inch + Y_SPACING))
+BADGES_PER_PAGE = BADGES_PER_ROW * ROWS_PER_PAGE
+
+SHARD_PAGES = 100        # pages rendered per worker process
+
+# write compressed page streams as binary instead of ASCII85 (~20% smaller)
+rl_config.useA85 = 0
+
+
+# ─── Drawing ─────────────────────────────────────────────────────────────────
+def draw_qr(c, modules, x, y, size):
+    """
+    Draw a QR module matrix as one vector path (one rectangle per run of
+    dark modules in a row), with a one-module quiet zone inside `size`.
+    Coordinates are scaled to module units so the path stays tiny.
+    """
+    n = len(modules)
+    cell = size / (n + 2)
+    c.saveState()
+    c.translate(x + cell, y + size - cell)
+    c.scale(cell, -cell)
+    path = c.beginPath()
+    for r, row in enumerate(modules):
+        col = 0
+        while col < n:
+            if row[col]:
+                start = col
+                while col < n and row[col]:
+                    col += 1
+                path.rect(start, r, col - start, 1)
+            else:
+                col += 1
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
+
+def draw_badge(c, attendee, modules, x, y):
+    # Badge border
+    c.rect(x, y, BADGE_WIDTH_INCH * inch, BADGE_HEIGHT_INCH * inch)
+
+    # Attendee info
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x + 0.1*inch, y + BADGE_HEIGHT_INCH*inch - 0.4*inch, attendee['name'])
+
+    c.setFont("Helvetica", 10)
+    c.drawString(x + 0.1*inch, y + BADGE_HEIGHT_INCH*inch - 0.7*inch, attendee['email'])
+    c.drawString(x + 0.1*inch, y + BADGE_HEIGHT_INCH*inch - 0.9*inch, f"Badge #: {attendee['badge_id']}")
+
+    # QR code
+    qr_x = x + BADGE_WIDTH_INCH * inch / 2 - QR_SIZE_INCH / 2 * inch
+    qr_y = y + 0.2 * inch
+    draw_qr(c, modules, qr_x, qr_y, QR_SIZE_INCH * inch)
+
+
+def render_badges(attendees, path: str, qr_dir: str = QR_DIR):
+    """Write `attendees` as badge pages straight to the PDF file at `path`."""
+    manifest = load_manifest(qr_dir)
+    c = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+    for idx, attendee in enumerate(attendees):
+        slot = idx % BADGES_PER_PAGE
+        if slot == 0 and idx != 0:
+            c.showPage()
+        row, col = divmod(slot, BADGES_PER_ROW)
+        y = Y_START - row * (BADGE_HEIGHT_INCH * inch + Y_SPACING)
+        modules = qr_modules(attendee['badge_id'], qr_dir, manifest=manifest)
+        draw_badge(c, attendee, modules, X_POSITIONS[col], y)
+    c.save()
+    return path
+
+
+def _render_shard(job):
+    attendees, path, qr_dir = job
+    return render_badges(attendees, path, qr_dir)
+
+
+# ─── Sharded build ───────────────────────────────────────────────────────────
+def build_badge_pdf(attendees, out_path: str, workers: int = None,
+                    shard_pages: int = SHARD_PAGES, qr_dir: str = QR_DIR) -> str:
+    """
+    Build the badge PDF for `attendees` at `out_path`.
+
+    QR codes come from the qrcodegenerator cache (filled in parallel first).
+    Large rosters are split into page-aligned shards rendered by a process
+    pool to temporary files, then merged into one PDF.
+    """
+    attendees = list(attendees)
+    generate_bulk([a['badge_id'] for a in attendees], qr_dir, workers)
+
+    shard_size = shard_pages * BADGES_PER_PAGE
+    if len(attendees) <= shard_size or workers == 1:
+        return render_badges(attendees, out_path, qr_dir)
+
+    from pypdf import PdfWriter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = [(attendees[i:i + shard_size],
+                 os.path.join(tmp, f"shard_{i // shard_size:05d}.pdf"), qr_dir)
+                for i in range(0, len(attendees), shard_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_render_shard, jobs))
+
+        writer = PdfWriter()
+        for shard in shards:
+            writer.append(shard)
+        with open(out_path, "wb") as f:
+            writer.write(f)
+    return out_path
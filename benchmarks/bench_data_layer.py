@@ -0,0 +1,291 @@
+# benchmarks/bench_data_layer.py
+#
+# Wall time, round trips and peak memory of the data-layer hot paths and
+# the admin report builders, against benchmarks/fake_supabase.py filled
+# with synthetic scans at several scales. Baselines live in
+# benchmarks/baselines/data_layer.json; --check exits non-zero when a case
+# needs more round trips, or clearly more time or memory, than its baseline.
+#
+#   python -m benchmarks.bench_data_layer [--scales 100 10k 1m] [--latency 0.005]
+#   python -m benchmarks.bench_data_layer --scales 100 10k --check     # CI
+#   python -m benchmarks.bench_data_layer --save                       # new baseline
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+
+import numpy as np
+
+# keep the benchmark's scan journal out of the working directory
+os.environ.setdefault("SCAN_JOURNAL_PATH",
+                      os.path.join(tempfile.mkdtemp(prefix="bench-journal-"), "journal.db"))
+
+import database                                          # noqa: E402
+from benchmarks.fake_supabase import FakeSupabase        # noqa: E402
+from snapshot import AttendanceSnapshot                  # noqa: E402
+
+SCALES = {"100": 100, "10k": 10_000, "1m": 1_000_000}
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "data_layer.json")
+
+Case = namedtuple("Case", "name setup run")
+
+
+# ─── Synthetic data ──────────────────────────────────────────────────────────
+def make_sessions(days: int = 3, start=datetime.date(2025, 5, 2)):
+    """Four 90-minute sessions a day, shaped like the real programme."""
+    slots = [("08:30", "10:00"), ("10:30", "12:00"), ("13:30", "15:00"), ("15:30", "17:00")]
+    out = []
+    for d in range(days):
+        day = (start + datetime.timedelta(days=d)).isoformat()
+        for i, (s, e) in enumerate(slots):
+            out.append({"id": len(out) + 1, "title": f"Day {d + 1} session {i + 1}",
+                        "room": "Main Hall", "start": f"{day} {s}", "end": f"{day} {e}"})
+    return out
+
+
+def make_attendees(n: int):
+    return [{"badge_id": i, "name": f"Attendee {i}", "email": f"attendee{i}@example.org"}
+            for i in range(1, n + 1)]
+
+
+def make_scans(n: int, n_attendees: int, sessions, seed: int = 0, first_id: int = 1):
+    """
+    `n` scanlog rows: each picks a badge (a few unregistered) and a session
+    and lands between 20 minutes before it and 10 minutes after its end;
+    scans inside the session are tagged with its id, as the ingest trigger
+    would. Rows come back in insertion (id) order, mostly but not strictly
+    by time.
+    """
+    rng = np.random.default_rng(seed)
+    starts = np.array([s["start"] for s in sessions], "datetime64[s]")
+    ends = np.array([s["end"] for s in sessions], "datetime64[s]")
+    pick = rng.integers(0, len(sessions), n)
+    span = (ends[pick] - starts[pick]).astype(np.int64) + 30 * 60
+    offset = (rng.random(n) * span).astype(np.int64) - 20 * 60
+    ts = starts[pick] + offset.astype("timedelta64[s]")
+    inside = (ts >= starts[pick]) & (ts <= ends[pick])
+    session_ids = np.array([s.get("id", -1) for s in sessions])
+    tags = np.where(inside, session_ids[pick], -1)
+    order = np.argsort(ts + rng.integers(0, 300, n).astype("timedelta64[s]"), kind="stable")
+    ts, tags = ts[order], tags[order]
+    badges = rng.integers(1, int(n_attendees * 1.02) + 2, n)
+    stamps = np.datetime_as_string(ts, unit="s").tolist()
+    return [{"id": first_id + i, "badge_id": int(b), "timestamp": t, "scan_uuid": None,
+             "session_id": sid if sid >= 0 else None}
+            for i, (b, t, sid) in enumerate(zip(badges.tolist(), stamps, tags.tolist()))]
+
+
+def attendees_for(n_scans: int) -> int:
+    return int(min(max(n_scans // 20, 20), 5000))
+
+
+# ─── Cases ───────────────────────────────────────────────────────────────────
+def build_cases(ctx):
+    sessions = ctx["sessions"]
+
+    def loaded_snapshot():
+        snap = AttendanceSnapshot(sessions)
+        snap.refresh(database.get_roster(), database.iter_scanlog_since, force=True)
+        return snap
+
+    def fresh_memo():
+        if "snap" not in ctx:
+            ctx["snap"] = loaded_snapshot()
+        snap = ctx["snap"]
+        snap._derived = {}
+        return snap
+
+    def with_new_scans():
+        snap = loaded_snapshot()
+        fake = ctx["fake"]
+        new = make_scans(100, ctx["attendees"], sessions, seed=ctx["round"],
+                         first_id=fake.tables["scanlog"].next_id)
+        ctx["round"] += 1
+        fake.load("scanlog", new)
+        return snap
+
+    def live_snapshot(new_scans: int):
+        def setup():
+            snap = fresh_memo()
+            snap.sync(database.poll_admin_data, force=True)     # catch up first
+            snap.flattened_log(), snap.raw_log(limit=1000), snap.ce_report()
+            if new_scans:
+                fake = ctx["fake"]
+                fake.load("scanlog", make_scans(new_scans, ctx["attendees"], sessions,
+                                                seed=ctx["round"],
+                                                first_id=fake.tables["scanlog"].next_id))
+                ctx["round"] += 1
+            return snap
+        return setup
+
+    def live_poll(snap):
+        snap.sync(database.poll_admin_data, force=True)
+        snap.flattened_log(), snap.raw_log(limit=1000), snap.ce_report()
+
+    def log_scan_x100(_):
+        for i in range(100):
+            database.log_scan(1 + i % ctx["attendees"])
+
+    return [
+        Case("get_all_attendees (cold cache)", database.invalidate_roster,
+             lambda _: database.get_all_attendees()),
+        Case("get_scan_log(limit=1000)", database.get_roster,
+             lambda _: database.get_scan_log(limit=1000)),
+        Case("get_scan_log() full", database.get_roster,
+             lambda _: database.get_scan_log()),
+        Case("get_scan_columns() full", database.get_roster,
+             lambda _: database.get_scan_columns()),
+        Case("check_in ×20", None,
+             lambda _: [database.check_in(1 + i, scan_uuid=str(uuid.uuid4())) for i in range(20)]),
+        Case("snapshot refresh (cold)", database.get_roster,
+             lambda _: loaded_snapshot()),
+        Case("load_admin_data (cold)", database.invalidate_roster,
+             lambda _: AttendanceSnapshot(sessions).sync(database.load_admin_data)),
+        Case("generate_ce_report", fresh_memo, lambda snap: snap.ce_report()),
+        Case("generate_flattened_log", fresh_memo, lambda snap: snap.flattened_log()),
+        Case("snapshot refresh (+100 scans)", with_new_scans,
+             lambda snap: snap.refresh(snap.roster, database.iter_scanlog_since, force=True)),
+        Case("live poll (idle)", live_snapshot(0), live_poll),
+        Case("live poll (+100 scans)", live_snapshot(100), live_poll),
+        # last: the journal flusher writes to the fake in the background
+        Case("log_scan ×100", None, log_scan_x100),
+    ]
+
+
+def measure(case, fake, memory: bool = True) -> dict:
+    """Time one run of `case`, counting this thread's round trips; then, optionally, peak memory."""
+    me = threading.get_ident()
+    state = case.setup() if case.setup else None
+    gc.collect()
+    trips = fake.requests_by_thread[me]
+    rows = fake.rows_by_thread[me]
+    t0 = time.perf_counter()
+    case.run(state)
+    wall = time.perf_counter() - t0
+    result = {"wall_s": round(wall, 4),
+              "round_trips": fake.requests_by_thread[me] - trips,
+              "rows": fake.rows_by_thread[me] - rows}
+
+    if memory:
+        state = case.setup() if case.setup else None
+        gc.collect()
+        tracemalloc.start()
+        case.run(state)
+        result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def run_scale(label: str, n_scans: int, args) -> dict:
+    fake = FakeSupabase(latency=args.latency, max_rows=args.max_rows)
+    n_att = attendees_for(n_scans)
+    sessions = make_sessions()
+    fake.load("attendees", make_attendees(n_att))
+    fake.load("scanlog", make_scans(n_scans, n_att, sessions))
+    fake.index("scanlog", "id")
+    fake.index("scanlog", "timestamp", "id")
+    database.set_client(fake)
+
+    ctx = {"fake": fake, "sessions": sessions, "attendees": n_att, "round": 1}
+    results = {}
+    print(f"\n── {label}: {n_scans:,} scans, {n_att:,} attendees "
+          f"(latency {args.latency * 1000:.0f} ms, max rows {args.max_rows}) ──")
+    print(f"{'case':<34} {'wall ms':>10} {'trips':>7} {'rows':>9} {'peak MB':>9}")
+    for case in build_cases(ctx):
+        r = measure(case, fake, memory=not args.no_memory)
+        results[case.name] = r
+        peak = f"{r['peak_mb']:.1f}" if "peak_mb" in r else "-"
+        print(f"{case.name:<34} {r['wall_s'] * 1000:>10.1f} {r['round_trips']:>7} "
+              f"{r['rows']:>9} {peak:>9}")
+
+    # let the journal flusher catch up before the next scale swaps clients
+    deadline = time.time() + 10
+    while database.journal_status()["pending"] and time.time() < deadline:
+        time.sleep(0.05)
+    return results
+
+
+# ─── Baselines ───────────────────────────────────────────────────────────────
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions against the baseline. Round trips must not grow at all;
+    wall time and peak memory may grow by `tolerance` (a ratio) plus a small
+    absolute allowance for noise on fast cases.
+    """
+    problems = []
+    for scale, cases in results.items():
+        for name, r in cases.items():
+            b = baseline.get("scales", {}).get(scale, {}).get(name)
+            if not b:
+                continue
+            if r["round_trips"] > b["round_trips"]:
+                problems.append(f"{scale} / {name}: {r['round_trips']} round trips "
+                                f"(baseline {b['round_trips']})")
+            if r["wall_s"] > b["wall_s"] * tolerance + 0.01:
+                problems.append(f"{scale} / {name}: {r['wall_s'] * 1000:.1f} ms "
+                                f"(baseline {b['wall_s'] * 1000:.1f} ms)")
+            if "peak_mb" in r and "peak_mb" in b and r["peak_mb"] > b["peak_mb"] * tolerance + 1:
+                problems.append(f"{scale} / {name}: {r['peak_mb']:.1f} MB peak "
+                                f"(baseline {b['peak_mb']:.1f} MB)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="simulated seconds per request (default 0.005)")
+    parser.add_argument("--max-rows", type=int, default=1000,
+                        help="simulated PostgREST row cap (default 1000)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regressions vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="allowed time/memory ratio vs baseline (default 1.5)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    results = {label: run_scale(label, SCALES[label], args) for label in args.scales}
+
+    if args.save:
+        baseline = load_baseline(args.baseline)
+        baseline["settings"] = {"latency": args.latency, "max_rows": args.max_rows}
+        baseline.setdefault("scales", {}).update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"\nbaseline written to {args.baseline}")
+
+    if args.check:
+        baseline = load_baseline(args.baseline)
+        if baseline.get("settings") != {"latency": args.latency, "max_rows": args.max_rows}:
+            print("\nbaseline was recorded with different --latency/--max-rows; not comparing")
+            sys.exit(2)
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:")
+            for p in problems:
+                print(f"  {p}")
+            sys.exit(1)
+        print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
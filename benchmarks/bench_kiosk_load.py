@@ -0,0 +1,422 @@
+# benchmarks/bench_kiosk_load.py
+#
+# Load test for the door: N kiosks scan badges concurrently through the real
+# data layer while attendees arrive in a burst around a session start. The
+# simulated morning (25 minutes before the start to 10 minutes after) is
+# compressed into --duration seconds of wall time; each attendee arrives
+# once at a random kiosk, and --double-tap of them scan a second time at
+# another kiosk a moment later.
+#
+# Kiosk paths (--modes):
+#   journal   log_scan: append to the kiosk's own journal, flusher pushes batches
+#   check_in  check_in: one synchronous round trip per scan, retried on error
+# Backends (--backends):
+#   supabase  benchmarks/fake_supabase.py with --latency per request
+#   service   checkin_service.py in-process (SQLite stand-in, --latency per write)
+#
+# Latency is end to end, from the scan's scheduled arrival until the backend
+# has confirmed it, so a kiosk falling behind shows up as latency rather
+# than as fewer scans. Scans a journal dead-lettered (see ScanFlusher) are
+# counted as dead – an outage must never produce any. After each run the
+# backend tables are audited for
+# lost scans, duplicate rows and duplicate-slot races (an attendee whose
+# scanN slots disagree with the scans logged for the badge). The fake
+# Supabase locks only what Postgres would – the scanlog insert and the
+# attendee row whose slots are filled – so concurrent check-ins interleave
+# and races measures that row locking (the service backend's SQLite locks
+# the whole database per write).
+#
+#   python -m benchmarks.bench_kiosk_load [--kiosks 8 32] [--latency 0.02]
+#   python -m benchmarks.bench_kiosk_load --backends service --fail-rate 0.02 --json load.json
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# keep the benchmark's scan journals out of the working directory
+JOURNAL_DIR = tempfile.mkdtemp(prefix="bench-kiosk-")
+os.environ.setdefault("SCAN_JOURNAL_PATH", os.path.join(JOURNAL_DIR, "journal.db"))
+
+import database                                                    # noqa: E402
+from benchmarks.bench_data_layer import make_attendees, make_sessions  # noqa: E402
+from benchmarks.fake_supabase import SCAN_SLOTS, FakeSupabase      # noqa: E402
+from scan_journal import ScanFlusher, ScanJournal                  # noqa: E402
+from schedule import TIME_FORMAT, Schedule                         # noqa: E402
+
+BEFORE, AFTER = 25 * 60, 10 * 60    # simulated seconds around the session start
+CHECK_IN_ATTEMPTS = 3
+DRAIN_TIMEOUT = 60.0
+
+
+# ─── Arrivals ────────────────────────────────────────────────────────────────
+def make_arrivals(n_attendees: int, kiosks: int, duration: float, double_tap: float,
+                  start: datetime.datetime, seed: int = 0):
+    """
+    Scans as (wall offset s, kiosk, badge_id, timestamp) sorted by offset.
+
+    Most attendees arrive around five minutes before the start (normal,
+    sd 4 min); a fifth trickle in uniformly over the whole window.
+    """
+    rng = np.random.default_rng(seed)
+    late = rng.random(n_attendees) < 0.2
+    sim = np.where(late, rng.uniform(-BEFORE, AFTER, n_attendees),
+                   rng.normal(-5 * 60, 4 * 60, n_attendees))
+    sim = np.clip(sim, -BEFORE, AFTER)
+    badges = rng.permutation(np.arange(1, n_attendees + 1))
+    doors = rng.integers(0, kiosks, n_attendees)
+
+    taps = np.flatnonzero(rng.random(n_attendees) < double_tap)
+    sim = np.concatenate([sim, sim[taps] + rng.uniform(0.5, 3, len(taps))])
+    badges = np.concatenate([badges, badges[taps]])
+    other = (doors[taps] + rng.integers(1, max(kiosks, 2), len(taps))) % kiosks
+    doors = np.concatenate([doors, other])
+
+    order = np.argsort(sim, kind="stable")
+    scale = duration / (BEFORE + AFTER)
+    return [((s + BEFORE) * scale, int(k), int(b),
+             (start + datetime.timedelta(seconds=float(s))).isoformat())
+            for s, k, b in zip(sim[order], doors[order], badges[order])]
+
+
+def peak_rate(offsets, duration: float, bins: int = 35) -> float:
+    """Busiest simulated minute, in scans per wall second."""
+    counts, _ = np.histogram(offsets, bins=bins, range=(0, duration))
+    return float(counts.max()) / (duration / bins)
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+def device(kiosk: int) -> str:
+    return f"door-{kiosk + 1}"
+
+
+def make_schedule(sessions, kiosks: int) -> Schedule:
+    return Schedule(sessions, {device(k): "Main Hall" for k in range(kiosks)})
+
+
+class SupabaseBackend:
+    """The fake Supabase behind database.py, as a kiosk talks to it today."""
+
+    name = "supabase"
+
+    def __init__(self, args, attendees, schedule):
+        self.fake = FakeSupabase(latency=args.latency, fail_rate=args.fail_rate, seed=args.seed)
+        self.fake.load("attendees", attendees)
+        self.fake.load("sessions", schedule.session_rows())
+        self.fake.load("devices", schedule.device_rows())
+        database.set_service(None)
+        database.set_client(self.fake)
+
+    def requests(self) -> int:
+        return self.fake.requests
+
+    def tables(self):
+        return (list(self.fake.tables["attendees"].rows.values()),
+                list(self.fake.tables["scanlog"].rows.values()))
+
+    def close(self):
+        pass
+
+
+class _LatentStore:
+    """SqlStore with a database round trip's latency and dropped responses."""
+
+    def __init__(self, store, latency: float, fail_rate: float, seed: int):
+        self._store = store
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.writes = 0
+        self._rng = np.random.default_rng(seed)
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def write(self, batch):
+        time.sleep(self.latency)
+        results = self._store.write(batch)
+        self.writes += 1
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            raise ConnectionError("simulated dropped response")
+        return results
+
+
+class ServiceBackend:
+    """checkin_service.py on a local port, kiosks routed to it by database.py."""
+
+    name = "service"
+
+    def __init__(self, args, attendees, schedule):
+        import uvicorn
+
+        import checkin_service
+        from schema import attendees as attendees_table, metadata
+        from sql_backend import make_engine, sync_schedule
+
+        self.engine = make_engine(f"sqlite:///{tempfile.mkdtemp(dir=JOURNAL_DIR)}/service.db")
+        metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(attendees_table.insert(), attendees)
+        sync_schedule(self.engine, schedule)
+        self.store = _LatentStore(checkin_service.SqlStore(self.engine, schedule),
+                                  args.latency, args.fail_rate, args.seed)
+        service = checkin_service.CheckInService(self.store)
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        config = uvicorn.Config(checkin_service.create_app(service), host="127.0.0.1",
+                                port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, name="service", daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        self.client = checkin_service.ServiceClient(f"http://127.0.0.1:{port}")
+        database.set_service(self.client)
+
+    def requests(self) -> int:
+        return self.store.writes
+
+    def tables(self):
+        from sqlalchemy import select
+
+        from schema import attendees, scanlog
+        with self.engine.connect() as conn:
+            return ([dict(r._mapping) for r in conn.execute(select(attendees))],
+                    [dict(r._mapping) for r in conn.execute(select(scanlog))])
+
+    def close(self):
+        database.set_service(None)
+        self.client.close()
+        self.server.should_exit = True
+        self.thread.join(10)
+
+
+BACKENDS = {"supabase": SupabaseBackend, "service": ServiceBackend}
+
+
+# ─── Kiosks ──────────────────────────────────────────────────────────────────
+class Recorder:
+    """Scheduled arrival and confirmation time of every scan, by scan_uuid."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.due = {}
+        self.done = {}
+        self.attempts = Counter()
+        self.errors = Counter()     # repr of each failed attempt
+        self.failed = set()         # scans a kiosk gave up on
+
+    def expect(self, scan_uuid: str, due: float):
+        with self._lock:
+            self.due[scan_uuid] = due
+
+    def confirm(self, scan_uuids):
+        now = time.perf_counter()
+        with self._lock:
+            for u in scan_uuids:
+                self.done.setdefault(u, now)
+
+    def attempt(self, error: Exception = None):
+        with self._lock:
+            self.attempts["total"] += 1
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+
+
+def _pace(t0: float, offset: float):
+    delay = t0 + offset - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_journal_kiosk(kiosk: int, scans, t0: float, rec: Recorder, flushers: list):
+    """log_scan, as one kiosk process does it: own journal, own flusher."""
+    journal = ScanJournal(os.path.join(JOURNAL_DIR, f"{uuid.uuid4()}.db"))
+
+    def sink(batch):
+        try:
+            database.push_scans(batch)
+        except Exception as e:
+            rec.attempt(e)
+            raise
+        rec.attempt()
+        rec.confirm([sc["scan_uuid"] for sc in batch])
+
+    # a short poll interval stands in for the backoff a real outage would need
+    flusher = ScanFlusher(journal, sink, interval=0.2, max_backoff=1.0)
+    flusher.start()
+    flushers.append(flusher)
+    for offset, _, badge, ts in scans:
+        scan_uuid = str(uuid.uuid4())
+        rec.expect(scan_uuid, t0 + offset)
+        _pace(t0, offset)
+        journal.append(badge, ts, scan_uuid, device(kiosk))
+        flusher.wake()
+
+
+def run_check_in_kiosk(kiosk: int, scans, t0: float, rec: Recorder, flushers: list):
+    """check_in, waiting for each confirmation; retries reuse the scan_uuid."""
+    for offset, _, badge, ts in scans:
+        scan_uuid = str(uuid.uuid4())
+        rec.expect(scan_uuid, t0 + offset)
+        _pace(t0, offset)
+        for _ in range(CHECK_IN_ATTEMPTS):
+            try:
+                database.check_in(badge, ts, scan_uuid, device(kiosk))
+            except Exception as e:
+                rec.attempt(e)
+                continue
+            rec.attempt()
+            rec.confirm([scan_uuid])
+            break
+        else:
+            rec.failed.add(scan_uuid)
+
+
+MODES = {"journal": run_journal_kiosk, "check_in": run_check_in_kiosk}
+
+
+# ─── Audit ───────────────────────────────────────────────────────────────────
+def _norm(ts) -> str:
+    return datetime.datetime.fromisoformat(str(ts)).isoformat()
+
+
+def audit(rows, scans, sent) -> dict:
+    """
+    Compare the backend tables with what the kiosks sent: scans that never
+    landed, scan_uuids logged twice, and attendees whose filled slots are
+    not exactly their first min(10, n) logged scans.
+    """
+    logged = Counter(str(s["scan_uuid"]) for s in scans)
+    by_badge = defaultdict(list)
+    for s in scans:
+        by_badge[int(s["badge_id"])].append(_norm(s["timestamp"]))
+    races = 0
+    for a in rows:
+        slots = [_norm(a[s]) for s in SCAN_SLOTS if a[s] is not None]
+        times = by_badge.get(int(a["badge_id"]), [])
+        want = min(len(times), len(SCAN_SLOTS))
+        if len(slots) != want or Counter(slots) - Counter(times):
+            races += 1
+    return {"missing": sum(1 for u in sent if u not in logged),
+            "duplicate_rows": sum(n - 1 for n in logged.values() if n > 1),
+            "slot_races": races}
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+def run_once(mode: str, backend_name: str, kiosks: int, args) -> dict:
+    sessions = make_sessions(days=1)
+    start = datetime.datetime.strptime(sessions[0]["start"], TIME_FORMAT)
+    schedule = make_schedule(sessions, kiosks)
+    arrivals = make_arrivals(args.attendees, kiosks, args.duration, args.double_tap,
+                             start, args.seed)
+    backend = BACKENDS[backend_name](args, make_attendees(args.attendees), schedule)
+    rec = Recorder()
+    flushers = []
+
+    per_kiosk = defaultdict(list)
+    for scan in arrivals:
+        per_kiosk[scan[1]].append(scan)
+    t0 = time.perf_counter() + 0.2
+    threads = [threading.Thread(target=MODES[mode], args=(k, per_kiosk[k], t0, rec, flushers),
+                                name=f"kiosk-{k}", daemon=True) for k in range(kiosks)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    def dead_lettered():
+        return sum(f.journal.counts()["failed"] for f in flushers)
+
+    deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while len(rec.done) + len(rec.failed) + dead_lettered() < len(rec.due) \
+            and time.perf_counter() < deadline:
+        time.sleep(0.02)
+    wall = time.perf_counter() - t0
+    dead = dead_lettered()
+    for f in flushers:
+        f.stop(2)
+        f.journal.close()
+
+    latencies = np.array([rec.done[u] - rec.due[u] for u in rec.done]) * 1000
+    rows, scans = backend.tables()
+    checks = audit(rows, scans, rec.due)
+    requests = backend.requests()
+    backend.close()
+    pct = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [float("nan")] * 3
+    return {
+        "mode": mode, "backend": backend_name, "kiosks": kiosks,
+        "scans": len(arrivals), "confirmed": len(rec.done),
+        "unconfirmed": len(rec.due) - len(rec.done),
+        "dead_lettered": dead,
+        "wall_s": round(wall, 2),
+        "offered_peak_per_s": round(peak_rate([a[0] for a in arrivals], args.duration), 1),
+        "throughput_per_s": round(len(rec.done) / wall, 1),
+        "p50_ms": round(float(pct[0]), 1), "p95_ms": round(float(pct[1]), 1),
+        "p99_ms": round(float(pct[2]), 1),
+        "max_ms": round(float(latencies.max()), 1) if len(latencies) else None,
+        "requests": requests, "attempts": rec.attempts["total"],
+        "errors": dict(rec.errors), "error_rate": round(
+            sum(rec.errors.values()) / max(rec.attempts["total"], 1), 4),
+        **checks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kiosks", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--attendees", type=int, default=1500)
+    parser.add_argument("--duration", type=float, default=15.0,
+                        help="wall seconds the simulated 35 minutes are compressed into")
+    parser.add_argument("--double-tap", type=float, default=0.05,
+                        help="share of attendees who scan again at another kiosk")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="simulated seconds per backend request (default 0.02)")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="share of responses that fail (gateway 503 / dropped connection) "
+                             "after the write landed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    print(f"{args.attendees:,} attendees (+{args.double_tap:.0%} double taps) over "
+          f"{args.duration:.0f} s · latency {args.latency * 1000:.0f} ms · "
+          f"fail rate {args.fail_rate:.1%} · seed {args.seed}")
+    print(f"{'mode':<9} {'backend':<9} {'kiosks':>6} {'scans':>6} {'peak/s':>7} {'tput/s':>7} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'reqs':>6} {'err %':>6} "
+          f"{'dead':>5} {'lost':>5} {'dups':>5} {'races':>5}")
+    results = []
+    for backend in args.backends:
+        for mode in args.modes:
+            for kiosks in args.kiosks:
+                r = run_once(mode, backend, kiosks, args)
+                results.append(r)
+                print(f"{mode:<9} {backend:<9} {kiosks:>6} {r['scans']:>6} "
+                      f"{r['offered_peak_per_s']:>7.1f} {r['throughput_per_s']:>7.1f} "
+                      f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['p99_ms']:>7.1f} "
+                      f"{r['requests']:>6} {r['error_rate'] * 100:>6.2f} "
+                      f"{r['dead_lettered']:>5} {r['missing']:>5} {r['duplicate_rows']:>5} "
+                      f"{r['slot_races']:>5}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=1)
+        print(f"\nreport written to {args.json}")
+    if any(r["dead_lettered"] or r["missing"] or r["duplicate_rows"] or r["slot_races"]
+           for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_qr_decode.py
+#
+# Decode rate and latency of the QR pipeline over the badge images in
+# qr_codes/, rendered as camera-like JPEG frames with synthetic damage.
+#
+#   python -m benchmarks.bench_qr_decode [--limit N]
+
+import argparse
+import glob
+import io
+import os
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from qr_decoder import decode_bytes
+
+QR_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "qr_codes")
+FRAME_SIZE = (1280, 720)
+
+
+# ─── Synthetic frames ────────────────────────────────────────────────────────
+def _frame(qr: np.ndarray, rng, side: int = 360) -> np.ndarray:
+    """Place the badge QR on a textured background, like a webcam shot."""
+    w, h = FRAME_SIZE
+    bg = rng.normal(140, 25, (h, w)).clip(0, 255).astype(np.uint8)
+    bg = cv2.GaussianBlur(bg, (7, 7), 0)
+    tile = cv2.resize(qr, (side, side), interpolation=cv2.INTER_NEAREST)
+    y = int(rng.integers(0, h - side))
+    x = int(rng.integers(0, w - side))
+    bg[y:y + side, x:x + side] = tile
+    return bg
+
+
+def _rotate(img: np.ndarray, angle: float) -> np.ndarray:
+    h, w = img.shape
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(img, m, (w, h), borderValue=140)
+
+
+VARIANTS = {
+    "clean":     lambda f, rng: f,
+    "blur":      lambda f, rng: cv2.GaussianBlur(f, (9, 9), 0),
+    "rot20":     lambda f, rng: _rotate(f, 20),
+    "rot45":     lambda f, rng: _rotate(f, 45),
+    "lowlight":  lambda f, rng: (f * 0.25 + rng.normal(0, 6, f.shape)).clip(0, 255).astype(np.uint8),
+    "small":     None,   # QR only ~120 px wide in the frame
+}
+
+
+def _jpeg(gray: np.ndarray) -> bytes:
+    rgb = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+    buf = io.BytesIO()
+    Image.fromarray(rgb).save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+def build_frames(limit: int = None, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    paths = sorted(glob.glob(os.path.join(QR_DIR, "qr_*.png")))[:limit]
+    frames = {name: [] for name in VARIANTS}
+    for path in paths:
+        expected = str(int(os.path.basename(path)[3:-4]))
+        qr = np.asarray(Image.open(path).convert("L"))
+        for name, fn in VARIANTS.items():
+            if fn is None:
+                img = _frame(qr, rng, side=120)
+            else:
+                img = fn(_frame(qr, rng), rng)
+            frames[name].append((expected, _jpeg(img)))
+    return frames
+
+
+# ─── Pipelines ───────────────────────────────────────────────────────────────
+def legacy_decode(data: bytes):
+    """The original run_qr_scanner path: PIL RGB → NumPy → gray → new detector."""
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    gray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
+    text, _, _ = cv2.QRCodeDetector().detectAndDecode(gray)
+    return text.strip() or None, "legacy"
+
+
+def pipeline_decode(data: bytes):
+    result = decode_bytes(data)
+    return result.text, result.stage
+
+
+def _matches(text, expected) -> bool:
+    try:
+        return text is not None and int(text) == int(expected)
+    except ValueError:
+        return False
+
+
+def run(frames, decode):
+    rows = {}
+    stages = Counter()
+    for name, items in frames.items():
+        ok = 0
+        t0 = time.perf_counter()
+        for expected, data in items:
+            text, stage = decode(data)
+            if _matches(text, expected):
+                ok += 1
+                stages[stage] += 1
+        elapsed = time.perf_counter() - t0
+        rows[name] = (ok / len(items), elapsed / len(items) * 1000)
+    return rows, stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only use the first N badge images")
+    args = parser.parse_args()
+
+    frames = build_frames(args.limit)
+    n = len(next(iter(frames.values())))
+    print(f"{n} badges × {len(frames)} variants, {FRAME_SIZE[0]}x{FRAME_SIZE[1]} JPEG frames\n")
+    print(f"{'variant':<10} {'legacy rate':>12} {'legacy ms':>10} {'new rate':>10} {'new ms':>8}")
+
+    legacy, _ = run(frames, legacy_decode)
+    new, stages = run(frames, pipeline_decode)
+    for name in frames:
+        lr, lms = legacy[name]
+        nr, nms = new[name]
+        print(f"{name:<10} {lr:>11.0%} {lms:>10.1f} {nr:>9.0%} {nms:>8.1f}")
+
+    total = sum(stages.values())
+    print("\nnew pipeline – successful decodes by stage:")
+    for stage, count in stages.most_common():
+        print(f"  {stage:<14} {count:>5} ({count / total:.0%})")
+
+
+if __name__ == "__main__":
+    main()
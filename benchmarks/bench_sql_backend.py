@@ -0,0 +1,175 @@
+# benchmarks/bench_sql_backend.py
+#
+# The direct SQL read path (sql_backend) against a real database: seeds
+# synthetic attendees and scans, then times the server-side-cursor read
+# into ScanColumns, a cold admin snapshot built from it, and the full CSV
+# exports (COPY ... TO STDOUT on Postgres). --check compares both exports
+# with the snapshot's pandas ones, row for row.
+#
+#   python -m benchmarks.bench_sql_backend --url postgresql+psycopg2://postgres@localhost/conference_test \
+#          --scans 1m --reset --check
+#   python -m benchmarks.bench_sql_backend --scans 100k --check          # SQLite temp file
+#
+# The target database must be a scratch one: --reset drops and recreates
+# the app's tables.
+
+import argparse
+import datetime
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.bench_data_layer import attendees_for, make_attendees, make_scans, make_sessions
+from schedule import Schedule
+from schema import attendees, metadata, scanlog
+import sql_backend
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "5m": 5_000_000}
+SEED_CHUNK = 100_000
+
+
+# ─── Seeding ─────────────────────────────────────────────────────────────────
+def _copy_rows(engine, table, columns, rows):
+    """Bulk load on Postgres with COPY FROM STDIN."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join("\\N" if row[c] is None else str(row[c]) for c in columns) + "\n")
+    buf.seek(0)
+    names = ", ".join(f'"{c}"' for c in columns)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.copy_expert(f"COPY {table} ({names}) FROM STDIN", buf)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def seed(engine, n_scans: int, reset: bool):
+    if reset:
+        metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(scanlog)).scalar() \
+            + conn.execute(select(func.count()).select_from(attendees)).scalar()
+    if existing:
+        sys.exit("target database already has attendees/scans; use a scratch database with --reset")
+
+    sessions = make_sessions()
+    schedule = Schedule(sessions)
+    sql_backend.sync_schedule(engine, schedule)
+    n_att = attendees_for(n_scans)
+    people = make_attendees(n_att)
+    with engine.begin() as conn:
+        conn.execute(insert(attendees), people)
+
+    t0 = time.perf_counter()
+    for start in range(0, n_scans, SEED_CHUNK):
+        rows = make_scans(min(SEED_CHUNK, n_scans - start), n_att, sessions,
+                          seed=start, first_id=start + 1)
+        for r in rows:
+            r.pop("scan_uuid")
+        if engine.dialect.name == "postgresql":
+            _copy_rows(engine, "scanlog", ["id", "badge_id", "timestamp", "session_id"], rows)
+        else:
+            with engine.begin() as conn:
+                conn.execute(insert(scanlog), [
+                    {**r, "timestamp": datetime.datetime.fromisoformat(r["timestamp"])}
+                    for r in rows
+                ])
+    print(f"seeded {n_scans:,} scans, {n_att:,} attendees in {time.perf_counter() - t0:.1f} s")
+    return sessions
+
+
+# ─── Measurements ────────────────────────────────────────────────────────────
+def timed(label: str, fn, memory: bool):
+    t0 = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - t0
+    peak = "-"
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:.1f}"
+        tracemalloc.stop()
+    print(f"{label:<34} {wall * 1000:>10.1f} {peak:>9}")
+    return result
+
+
+def export_bytes(engine, report: str) -> bytes:
+    buf = io.BytesIO()
+    sql_backend.export_csv(engine, report, buf)
+    return buf.getvalue()
+
+
+def check(snap, exports: dict) -> list:
+    """Differences between the SQL exports and the snapshot's pandas CSVs."""
+    import pandas as pd
+
+    problems = []
+    for report, data in exports.items():
+        ours = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+        theirs = pd.read_csv(io.BytesIO(snap.export(report, "csv")), dtype=str,
+                             keep_default_na=False)
+        if list(ours.columns) != list(theirs.columns):
+            problems.append(f"{report}: columns {list(ours.columns)} != {list(theirs.columns)}")
+        elif not ours.equals(theirs):
+            diff = (ours != theirs).any(axis=1)
+            problems.append(f"{report}: {int(diff.sum())} of {len(ours)} rows differ, "
+                            f"first at row {int(diff.idxmax())}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=os.getenv("TEST_DATABASE_URL"),
+                        help="SQLAlchemy URL of a scratch database (default: a SQLite temp file)")
+    parser.add_argument("--scans", choices=list(SCALES), default="100k")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the tables first")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the SQL exports with the snapshot's")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-sql-'), 'bench.db')}"
+    engine = sql_backend.make_engine(url)
+    sessions = seed(engine, SCALES[args.scans], args.reset or not args.url)
+
+    from roster import Roster
+    from snapshot import AttendanceSnapshot
+
+    memory = not args.no_memory
+    print(f"\n── {engine.dialect.name}: {args.scans} scans ──")
+    print(f"{'case':<34} {'wall ms':>10} {'peak MB':>9}")
+    timed("fetch_attendees", lambda: sql_backend.fetch_attendees(engine), memory)
+    cols = timed("scan_columns (server-side cursor)",
+                 lambda: sql_backend.scan_columns(engine), memory)
+    roster = Roster(sql_backend.fetch_attendees(engine), 1)
+
+    def cold_snapshot():
+        snap = AttendanceSnapshot(sessions)
+        snap.sync(lambda last_id: (roster, sql_backend.scan_columns(engine, last_id)))
+        snap.ce_report()
+        return snap
+    snap = timed("snapshot + CE report (cold)", cold_snapshot, memory)
+    exports = {report: timed(f"export_csv({report!r})", lambda r=report: export_bytes(engine, r),
+                             memory)
+               for report in sql_backend.CSV_REPORTS}
+    print(f"{len(cols):,} scans read · raw CSV {len(exports['raw']) / 2**20:.1f} MB")
+
+    if args.check:
+        problems = check(snap, exports)
+        for p in problems:
+            print(f"  MISMATCH {p}")
+        if problems:
+            sys.exit(1)
+        print("exports match the snapshot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_startup.py
+#
+# Cold-start cost of each page: a fresh interpreter per page runs app.py
+# once through Streamlit's AppTest (against benchmarks/fake_supabase.py) and
+# reports time to first render, time until the background warm-up (decoder
+# + backend client) has finished, a warm rerun, and which heavy libraries
+# the page pulled in.
+#
+#   python -m benchmarks.bench_startup [--pages home register admin] [--latency 0.02]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PAGES = ("home", "register", "admin")
+HEAVY = ("pandas", "cv2", "qrcode", "supabase", "reportlab")
+
+
+def _seed(fake, n_attendees: int = 500, n_scans: int = 5000):
+    import random
+    rng = random.Random(0)
+    fake.load("attendees", [{"badge_id": i, "name": f"Attendee {i}",
+                             "email": f"attendee{i}@example.org"}
+                            for i in range(1, n_attendees + 1)])
+    fake.load("scanlog", [{"badge_id": rng.randint(1, n_attendees),
+                           "timestamp": f"2025-05-0{rng.randint(2, 4)}T"
+                                        f"{rng.randint(8, 16):02d}:{rng.randint(0, 59):02d}:00"}
+                          for _ in range(n_scans)])
+
+
+def child(page: str, latency: float):
+    """Runs in a fresh interpreter: time one cold render of `page`."""
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    harness_s = time.perf_counter() - t0
+    preloaded = {m for m in HEAVY if m in sys.modules}
+
+    import database
+    from benchmarks.fake_supabase import FakeSupabase
+    fake = FakeSupabase(latency=latency)
+    _seed(fake)
+    database.set_client(fake)
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state.page = page
+    t0 = time.perf_counter()
+    at.run()
+    first_render = time.perf_counter() - t0
+
+    for thread in threading.enumerate():
+        if thread.name == "warm-up":
+            thread.join()
+    ready = time.perf_counter() - t0
+    loaded = sorted(m for m in HEAVY if m in sys.modules and m not in preloaded)
+
+    t1 = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - t1
+    print(json.dumps({"page": page, "harness_s": harness_s, "first_render_s": first_render,
+                      "ready_s": ready, "rerun_s": rerun, "loaded": loaded,
+                      "round_trips": fake.requests,
+                      "error": str(at.exception[0].value) if at.exception else None}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=list(PAGES))
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="simulated seconds per backend request (default 0.02)")
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per page")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.latency)
+
+    root = os.path.dirname(APP)
+    print(f"{'page':<10} {'first render ms':>16} {'ready ms':>9} {'rerun ms':>9} "
+          f"{'trips':>6}  heavy imports (incl. warm-up)")
+    for page in args.pages:
+        runs = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, SCAN_JOURNAL_PATH=os.path.join(tmp, "journal.db"))
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_startup", "--child", page,
+                     "--latency", str(args.latency)],
+                    cwd=root, env=env, capture_output=True, text=True, check=True)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r["first_render_s"])
+        if best["error"]:
+            print(f"{page:<10} error: {best['error']}")
+            continue
+        print(f"{page:<10} {best['first_render_s'] * 1000:>16.0f} {best['ready_s'] * 1000:>9.0f} "
+              f"{best['rerun_s'] * 1000:>9.0f} {best['round_trips']:>6}  "
+              f"{', '.join(best['loaded']) or '-'}")
+    print(f"\n(best of {args.repeat}; Streamlit test harness import excluded; the fake "
+          f"backend never imports supabase-py, which adds ~0.5 s on a real kiosk)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_video_scan.py
+#
+# Sustained frame rate and scan-to-confirmation latency of continuous
+# scanning, replaying the badge images in qr_codes/ as a recorded sequence
+# in which every badge stays in front of the camera for several frames.
+# Confirmations go to a throw-away local scan journal, as log_scan would.
+#
+#   python -m benchmarks.bench_video_scan [--hold 15] [--fps 30]
+
+import argparse
+import os
+import tempfile
+
+from scan_journal import ScanJournal
+from video_scanner import ContinuousScanner, DirectorySource
+
+QR_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "qr_codes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hold", type=int, default=15,
+                        help="consecutive frames each badge is visible")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="pace the source (default: as fast as possible)")
+    parser.add_argument("--dir", default=QR_DIR, help="directory of frames")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = ScanJournal(os.path.join(tmp, "journal.db"))
+        source = DirectorySource(args.dir, repeat=args.hold, fps=args.fps)
+        expected = len(source.frames) // args.hold
+
+        scanner = ContinuousScanner(source, journal.append).start()
+        scanner.join()
+        stats = scanner.stats()
+        logged = journal.counts()["pending"]
+        journal.close()
+
+    print(f"frames:           {stats['frames']}")
+    print(f"sustained fps:    {stats['fps']:.1f}")
+    print(f"decoded frames:   {stats['decoded']}")
+    print(f"non-badge codes:  {stats['ignored']}")
+    print(f"badges logged:    {logged} (expected {expected}, "
+          f"{'OK' if logged == expected else 'MISMATCH'})")
+    if stats["latency_p50_ms"] is not None:
+        print(f"scan→confirm p50: {stats['latency_p50_ms']:.1f} ms")
+        print(f"scan→confirm p95: {stats['latency_p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+# benchmarks/fake_supabase.py
+#
+# In-process stand-in for the supabase-py client, covering the subset of the
+# PostgREST query builder and the RPCs that database.py uses. Every
+# execute() counts as one round trip, sleeps for the configured latency and
+# caps results at `max_rows`, like PostgREST's db-max-rows setting.
+#
+#   fake = FakeSupabase(latency=0.005, max_rows=1000)
+#   fake.load("attendees", rows); fake.load("scanlog", scans)
+#   database.set_client(fake)        # fake.aio() serves async_database
+
+import asyncio
+import bisect
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+
+SCAN_SLOTS = [f"scan{i}" for i in range(1, 11)]
+PRIMARY_KEYS = {"attendees": "badge_id", "scanlog": "id", "sessions": "id", "devices": "device_id"}
+
+# RPCs that serialise only what Postgres locks: the scanlog insert (its
+# unique index) and the attendee row whose slots they fill
+ROW_LOCKED_RPCS = {"check_in", "check_in_batch", "check_in_scans", "log_scans"}
+
+Response = namedtuple("Response", "data count")
+
+_KEYSET = re.compile(r'^(\w+)\.gt\."([^"]*)",and\(\1\.eq\."\2",(\w+)\.gt\.([^)]+)\)$')
+
+
+def _ts(value) -> str:
+    """Timestamps as PostgREST returns `timestamp` columns."""
+    if value is None:
+        return datetime.datetime.utcnow().isoformat()
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return datetime.datetime.fromisoformat(str(value)).isoformat()
+
+
+# ─── Storage ─────────────────────────────────────────────────────────────────
+class _Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.pk = PRIMARY_KEYS.get(name)
+        self.rows = {}            # pk → row
+        self.next_id = 1
+        self.uuids = set()        # scanlog.scan_uuid unique index
+        self._views = {}          # sort columns → (ascending keys, rows)
+        self._pending = []        # rows inserted since the views were built
+
+    def insert(self, row: dict) -> bool:
+        if self.name == "scanlog":
+            if row.get("scan_uuid") in self.uuids:
+                return False
+            row.setdefault("id", self.next_id)
+            row["timestamp"] = _ts(row.get("timestamp"))
+            if row.get("scan_uuid"):
+                self.uuids.add(row["scan_uuid"])
+        key = row[self.pk]
+        if key in self.rows:
+            return False
+        if self.name == "attendees":
+            for slot in SCAN_SLOTS:
+                row.setdefault(slot, None)
+        self.rows[key] = row
+        if isinstance(key, int):
+            self.next_id = max(self.next_id, key + 1)
+        if self._views:
+            self._pending.append(row)
+        return True
+
+    def view(self, cols):
+        """
+        (keys, rows) sorted ascending by `cols`. Built once per column set,
+        then kept up to date by inserting new rows in place.
+        """
+        cols = tuple(cols) or (self.pk,)
+        if self._pending:
+            for vcols, (keys, rows) in self._views.items():
+                for row in self._pending:
+                    k = tuple(row[c] for c in vcols)
+                    i = bisect.bisect_right(keys, k)
+                    keys.insert(i, k)
+                    rows.insert(i, row)
+            self._pending = []
+        if cols not in self._views:
+            rows = sorted(self.rows.values(), key=lambda r: tuple(r[c] for c in cols))
+            keys = [tuple(r[c] for c in cols) for r in rows]
+            self._views[cols] = (keys, rows)
+        return self._views[cols]
+
+
+# ─── Query builder ───────────────────────────────────────────────────────────
+class _Query:
+    def __init__(self, client, table: str):
+        self._client = client
+        self._table = table
+        self._columns = None
+        self._order = []
+        self._limit = None
+        self._filters = []
+        self._lower = None        # exclusive lower bound on the sort key
+        self._upper = None        # inclusive upper bound on the sort key
+        self._count = None
+        self._write = None
+
+    # reads
+    def select(self, columns: str = "*", count=None):
+        self._columns = None if columns.strip() == "*" else \
+            [c.strip() for c in columns.split(",")]
+        self._count = count
+        return self
+
+    def order(self, column: str, desc: bool = False, **_):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, n: int, **_):
+        self._limit = n
+        return self
+
+    def _filter(self, column, op, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda a, b: a == b, value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda a, b: a != b, value)
+
+    def gt(self, column, value):
+        if len(self._order) == 1 and self._order[0][0] == column:
+            self._lower = (value,)
+            return self
+        return self._filter(column, lambda a, b: a is not None and a > b, value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a >= b, value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a < b, value)
+
+    def lte(self, column, value):
+        if len(self._order) == 1 and self._order[0][0] == column:
+            self._upper = (value,)
+            return self
+        return self._filter(column, lambda a, b: a is not None and a <= b, value)
+
+    def in_(self, column, values):
+        return self._filter(column, lambda a, b: a in b, set(values))
+
+    def or_(self, expr: str, **_):
+        # only the (col1, col2) keyset form that iter_scanlog_pages sends
+        m = _KEYSET.match(expr)
+        cols = [c for c, _ in self._order]
+        if not m or cols != [m.group(1), m.group(3)]:
+            raise NotImplementedError(f"fake or_() filter: {expr}")
+        second = m.group(4)
+        self._lower = (m.group(2), int(second) if second.lstrip("-").isdigit() else second)
+        return self
+
+    # writes
+    def insert(self, data, **_):
+        self._write = ("insert", data if isinstance(data, list) else [data], None)
+        return self
+
+    def upsert(self, data, on_conflict: str = "", ignore_duplicates: bool = False, **_):
+        self._write = ("upsert", data if isinstance(data, list) else [data], ignore_duplicates)
+        return self
+
+    def execute(self) -> Response:
+        return self._client._execute(self)
+
+
+class _Call:
+    def __init__(self, client, name: str, params: dict):
+        self._client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self) -> Response:
+        return self._client._execute(self)
+
+
+class _AsyncQuery(_Query):
+    async def execute(self) -> Response:
+        return await self._client._aexecute(self)
+
+
+class _AsyncCall(_Call):
+    async def execute(self) -> Response:
+        return await self._client._aexecute(self)
+
+
+def _gateway_error(status: int) -> Exception:
+    """What postgrest raises for a non-JSON error page (see generate_default_error_message)."""
+    from postgrest.exceptions import APIError
+    return APIError({"message": "JSON could not be generated", "code": status,
+                     "hint": "Refer to full message for details",
+                     "details": f"b'{status} simulated gateway error'"})
+
+
+# ─── Client ──────────────────────────────────────────────────────────────────
+class FakeSupabase:
+    """
+    Thread-safe fake of `supabase.Client` with round-trip accounting.
+    Queries run one at a time; the check-in RPCs hold the table lock only
+    for their scanlog insert and a per-attendee lock while filling slots,
+    as Postgres would, so concurrent kiosks can interleave inside them.
+
+    `requests` / `rows_out` / `bytes_out` accumulate over the client's life;
+    the per-thread counters let a caller ignore background work (e.g. the
+    scan journal flusher). With `serialize=True` every payload takes a JSON
+    round trip, so decoding cost and response size are realistic.
+    `fail_rate` fails that share of responses after the request has been
+    applied – the gateway answers 503, as Supabase does when the upstream
+    response is lost – so callers see postgrest's APIError for a write
+    that did land.
+    """
+
+    def __init__(self, latency: float = 0.0, max_rows: int = 1000,
+                 serialize: bool = True, fail_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_rows = max_rows
+        self.serialize = serialize
+        self.tables = {name: _Table(name) for name in PRIMARY_KEYS}
+        self.requests = 0
+        self.rows_out = 0
+        self.bytes_out = 0
+        self.requests_by_thread = Counter()
+        self.rows_by_thread = Counter()
+        self.calls = Counter()
+        self.dropped = 0
+        self.response_hooks = []  # called with each response's size in bytes
+        self._lock = threading.Lock()
+        self._row_locks = {}      # attendees.badge_id → lock held while filling its slots
+        self._schedule = None     # compiled sessions/devices for the scanlog trigger
+        self._rng = random.Random(seed)
+        self._aio = None
+
+    # ── seeding (not counted as traffic) ───────────────────────────────────
+    def load(self, table: str, rows):
+        t = self.tables[table]
+        with self._lock:
+            for row in rows:
+                t.insert(dict(row))
+            if table in ("sessions", "devices"):
+                self._schedule = None
+
+    def index(self, table: str, *columns):
+        """Build a sorted view up front, as a database index would already exist."""
+        with self._lock:
+            self.tables[table].view(columns)
+
+    # ── supabase.Client surface ────────────────────────────────────────────
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict = None) -> _Call:
+        return _Call(self, name, params)
+
+    def aio(self) -> "AsyncFakeSupabase":
+        """The `supabase.AsyncClient` face of this fake (same tables and counters)."""
+        if self._aio is None:
+            self._aio = AsyncFakeSupabase(self)
+        return self._aio
+
+    # ── execution ──────────────────────────────────────────────────────────
+    def _execute(self, op, sleep: bool = True, thread: int = None, hooks=None) -> Response:
+        if self.latency and sleep:
+            time.sleep(self.latency)
+        thread = thread or threading.get_ident()
+        count = None
+        if isinstance(op, _Call) and op.name in ROW_LOCKED_RPCS:
+            # takes the table and row locks itself, like the real function
+            data = getattr(self, f"_rpc_{op.name}")(**op.params)
+        else:
+            with self._lock:
+                if isinstance(op, _Call):
+                    data = getattr(self, f"_rpc_{op.name}")(**op.params)
+                elif op._write:
+                    data = self._write(op)
+                else:
+                    data, count = self._select(op)
+        with self._lock:
+            if isinstance(op, _Call):
+                self.calls[f"rpc:{op.name}"] += 1
+            else:
+                self.calls[f"{op._write[0] if op._write else 'select'}:{op._table}"] += 1
+            self.requests += 1
+            self.requests_by_thread[thread] += 1
+            rows = len(data) if isinstance(data, list) else 1    # scalar-returning functions
+            self.rows_by_thread[thread] += rows
+            self.rows_out += rows
+            if self.serialize:
+                body = json.dumps(data)
+                self.bytes_out += len(body)
+                data = json.loads(body)
+                for hook in self.response_hooks if hooks is None else hooks:
+                    hook(len(body))
+            if self.fail_rate and self._rng.random() < self.fail_rate:
+                self.dropped += 1
+                raise _gateway_error(503)
+        return Response(data, count)
+
+    def _select(self, q: _Query):
+        table = self.tables[q._table]
+        keys, rows = table.view([c for c, _ in q._order])
+        limit = min(q._limit or self.max_rows, self.max_rows)
+        start = bisect.bisect_right(keys, q._lower) if q._lower is not None else 0
+        stop = bisect.bisect_right(keys, q._upper) if q._upper is not None else len(rows)
+        if q._order and q._order[0][1]:
+            # descending: walk the ascending view backwards
+            indices = range(stop - 1, start - 1, -1)
+        else:
+            indices = range(start, stop)
+        match = lambda row: all(op(row.get(col), value)  # noqa: E731
+                                for col, op, value in q._filters)
+        out = []
+        for i in indices:
+            row = rows[i]
+            if match(row):
+                out.append(row if q._columns is None else {c: row.get(c) for c in q._columns})
+                if len(out) >= limit:
+                    break
+        count = None
+        if q._count:
+            count = len(indices) if not q._filters else sum(map(match, map(rows.__getitem__, indices)))
+        return [dict(r) for r in out], count
+
+    def _write(self, q: _Query):
+        kind, data, ignore_duplicates = q._write
+        table = self.tables[q._table]
+        if q._table in ("sessions", "devices"):
+            self._schedule = None
+        out = []
+        for row in data:
+            row = dict(row)
+            if table.insert(row):
+                out.append(dict(row))
+            elif kind == "upsert" and not ignore_duplicates:
+                table.rows[row[table.pk]].update(row)
+                out.append(dict(table.rows[row[table.pk]]))
+            elif kind == "insert":
+                raise ValueError(f"duplicate key in {q._table}: {row.get(table.pk)}")
+        return out
+
+    # ── RPCs (Python versions of sql/*.sql) ────────────────────────────────
+    def _session_for(self, device_id, ts: str):
+        """The scanlog_tag_session trigger (session_for in sql/006_early_arrival.sql)."""
+        if self._schedule is None:
+            if not self.tables["sessions"].rows:
+                return None
+            from schedule import TIME_FORMAT, Schedule
+            fmt = lambda v: datetime.datetime.fromisoformat(v).strftime(TIME_FORMAT)  # noqa: E731
+            self._schedule = Schedule(
+                [{**s, "start": fmt(s["starts_at"]), "end": fmt(s["ends_at"])}
+                 for s in self.tables["sessions"].rows.values()],
+                {d["device_id"]: d["room"] for d in self.tables["devices"].rows.values()})
+        return self._schedule.tag_one(ts, device_id)
+
+    def _row_lock(self, badge_id: int) -> threading.Lock:
+        with self._lock:
+            return self._row_locks.setdefault(badge_id, threading.Lock())
+
+    def _insert_scan(self, row: dict) -> bool:
+        """The scanlog insert (tagged by the trigger); False for a known scan_uuid."""
+        with self._lock:
+            row["session_id"] = self._session_for(row["device_id"], row["timestamp"])
+            return self.tables["scanlog"].insert(row)
+
+    def _claim_slot(self, badge_id: int, ts: str):
+        a = self.tables["attendees"].rows.get(badge_id)
+        if a is None:
+            return
+        for slot in SCAN_SLOTS:
+            if a[slot] is None:
+                a[slot] = ts
+                break
+
+    def _state(self, badge_id: int):
+        a = self.tables["attendees"].rows.get(badge_id)
+        if a is None:
+            return {"badge_id": badge_id, "name": None, "scan_count": 0}
+        return {"badge_id": badge_id, "name": a["name"],
+                "scan_count": sum(a[s] is not None for s in SCAN_SLOTS)}
+
+    def _rpc_check_in(self, p_badge_id, p_timestamp=None, p_scan_uuid=None, p_device_id=None):
+        ts = _ts(p_timestamp)
+        row = {"badge_id": int(p_badge_id), "timestamp": ts,
+               "scan_uuid": p_scan_uuid or str(uuid.uuid4()), "device_id": p_device_id}
+        inserted = self._insert_scan(row)
+        with self._row_lock(int(p_badge_id)):
+            if inserted:
+                self._claim_slot(int(p_badge_id), ts)
+            return [self._state(int(p_badge_id))]
+
+    def _rpc_check_in_batch(self, p_scans):
+        out = []
+        for sc in sorted(p_scans, key=lambda s: _ts(s["timestamp"])):
+            out.extend(self._rpc_check_in(sc["badge_id"], sc["timestamp"], sc["scan_uuid"],
+                                          sc.get("device_id")))
+        return out
+
+    def _rpc_check_in_scans(self, p_scans):
+        out = []
+        for sc in sorted(p_scans, key=lambda s: _ts(s["timestamp"])):
+            with self._lock:
+                duplicate = sc["scan_uuid"] in self.tables["scanlog"].uuids
+            state = self._rpc_check_in(sc["badge_id"], sc["timestamp"], sc["scan_uuid"],
+                                       sc.get("device_id"))[0]
+            with self._lock:
+                session_id = self._session_for(sc.get("device_id"), _ts(sc["timestamp"]))
+            out.append({"scan_uuid": sc["scan_uuid"], **state,
+                        "session_id": session_id, "duplicate": duplicate})
+        return out
+
+    def _rpc_prune_schedule(self, p_session_ids, p_device_ids):
+        self._schedule = None
+        devices = self.tables["devices"]
+        for d in set(devices.rows) - set(p_device_ids):
+            del devices.rows[d]
+        referenced = {r["session_id"] for r in self.tables["scanlog"].rows.values()}
+        sessions = self.tables["sessions"]
+        gone = set(sessions.rows) - set(p_session_ids) - referenced
+        for sid in gone:
+            del sessions.rows[sid]
+        devices._views.clear()
+        sessions._views.clear()
+        return len(gone)
+
+    def _rpc_tag_untagged_scans(self):
+        tagged = 0
+        for row in self.tables["scanlog"].rows.values():
+            if row.get("session_id") is None:
+                row["session_id"] = self._session_for(row.get("device_id"), row["timestamp"])
+                tagged += row["session_id"] is not None
+        return tagged
+
+    def _rpc_log_scans(self, p_scans):
+        inserted = 0
+        for sc in sorted(p_scans, key=lambda s: _ts(s["scanned_at"])):
+            ts = _ts(sc["scanned_at"])
+            row = {"badge_id": int(sc["badge_id"]), "timestamp": ts,
+                   "device_id": sc.get("device_id"), "scan_uuid": sc["scan_uuid"]}
+            if self._insert_scan(row):
+                inserted += 1
+                with self._row_lock(int(sc["badge_id"])):
+                    self._claim_slot(int(sc["badge_id"]), ts)
+        return [{"received": len(p_scans), "inserted": inserted}]
+
+
+class AsyncFakeSupabase:
+    """
+    asyncio face of a FakeSupabase, like `supabase.AsyncClient`: requests
+    await their latency instead of sleeping, so concurrent requests overlap
+    as they would on the network. Round trips are credited to the thread
+    that issued the async_database.run() call.
+    """
+
+    def __init__(self, fake: FakeSupabase):
+        self._fake = fake
+        self.response_hooks = []
+
+    def table(self, name: str) -> _AsyncQuery:
+        return _AsyncQuery(self, name)
+
+    def rpc(self, name: str, params: dict = None) -> _AsyncCall:
+        return _AsyncCall(self, name, params)
+
+    async def _aexecute(self, op) -> Response:
+        from async_database import caller_thread
+        if self._fake.latency:
+            await asyncio.sleep(self._fake.latency)
+        return self._fake._execute(op, sleep=False, thread=caller_thread(),
+                                   hooks=self.response_hooks)
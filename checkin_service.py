@@ -0,0 +1,482 @@
+# checkin_service.py
+#
+# Headless check-in service shared by many kiosks. It holds the roster in
+# memory, accepts scans over HTTP and WebSocket, coalesces them into batched
+# writes, and pushes confirmations and live counts back to the kiosks.
+# Kiosks point at it with CHECKIN_SERVICE_URL (database.py then routes
+# check-ins, journal flushes, the roster and registrations through it).
+#
+#   python checkin_service.py                          # SQLite stand-in: checkin_service.db
+#   python checkin_service.py --db postgresql+psycopg2://…   # direct Postgres
+#   python checkin_service.py --supabase               # front Supabase (SUPABASE_URL/KEY)
+
+import argparse
+import asyncio
+import datetime
+import os
+import uuid
+from collections import Counter, defaultdict
+
+from roster import RosterCache
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+SERVICE_HOST = os.getenv("CHECKIN_SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("CHECKIN_SERVICE_PORT", "8765"))
+SERVICE_DB_URL = os.getenv("CHECKIN_DB_URL", "sqlite:///checkin_service.db")
+BATCH_MAX = int(os.getenv("CHECKIN_BATCH_MAX", "500"))   # scans per write
+# seconds a batch waits for more scans after the first; 0 takes whatever
+# queued up while the previous write was in flight (lowest latency under load)
+BATCH_WINDOW = float(os.getenv("CHECKIN_BATCH_WINDOW", "0"))
+CLIENT_TIMEOUT = 10.0    # kiosk → service request timeout (seconds)
+SUBSCRIBER_BUFFER = 100  # queued pushes per WebSocket before old counts are dropped
+
+
+# ─── Stores ──────────────────────────────────────────────────────────────────
+class SqlStore:
+    """Writes through a SQLAlchemy engine (SQLite stand-in or Postgres)."""
+
+    def __init__(self, engine, schedule=None):
+        self.engine = engine
+        self.schedule = schedule
+
+    def attendees(self):
+        import sql_backend
+        return sql_backend.fetch_attendees(self.engine)
+
+    def register(self, rows):
+        from schema import attendees
+        with self.engine.begin() as conn:
+            conn.execute(attendees.insert(), rows)
+        return rows
+
+    def write(self, batch):
+        import sql_backend
+        return sql_backend.check_in_batch(self.engine, batch, self.schedule)
+
+    def presence(self):
+        import sql_backend
+        return sql_backend.scan_presence(self.engine)
+
+
+class SupabaseStore:
+    """
+    Writes through the Supabase RPCs (check_in_scans, sql/005). PostgREST
+    has no cheap distinct-pairs read, so live counts start from zero.
+    """
+
+    def attendees(self):
+        import async_database
+        import database
+        # straight to PostgREST: database._fetch_attendees() would route back here
+        pages = async_database.run(database._fetch_attendees_async())
+        return [row for page in pages for row in page]
+
+    def register(self, rows):
+        import database
+        resp = database._execute(database.get_client().table("attendees").insert(rows))
+        return [{k: r[k] for k in ("badge_id", "name", "email")} for r in resp.data]
+
+    def write(self, batch):
+        import database
+        resp = database._execute(database.get_client().rpc("check_in_scans", {
+            "p_scans": [{k: sc[k] for k in ("badge_id", "timestamp", "scan_uuid", "device_id")}
+                        for sc in batch],
+        }))
+        # answers come in timestamp order; a uuid repeated in the batch gets
+        # one row per occurrence, first the original, then the duplicate
+        by_uuid = defaultdict(list)
+        for r in resp.data or []:
+            by_uuid[str(r["scan_uuid"])].append(r)
+        out = []
+        for sc in batch:
+            r = by_uuid[sc["scan_uuid"]].pop(0)
+            out.append({k: r[k] for k in ("badge_id", "name", "scan_count", "session_id",
+                                          "duplicate")})
+        return out
+
+    def presence(self):
+        return 0, []
+
+
+def normalize_scan(scan) -> dict:
+    """
+    A kiosk scan in the shape every store expects, or ValueError: int
+    badge_id, naive UTC ISO timestamp (now when missing), canonical
+    scan_uuid (a new one when missing) and device_id as text or None.
+    """
+    if not isinstance(scan, dict):
+        raise ValueError(f"scan must be an object, not {type(scan).__name__}")
+    try:
+        badge_id = int(scan["badge_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"bad badge_id: {scan.get('badge_id')!r}") from None
+    ts = scan.get("timestamp")
+    if ts:
+        try:
+            ts = datetime.datetime.fromisoformat(str(ts))
+        except ValueError:
+            raise ValueError(f"bad timestamp: {ts!r}") from None
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    else:
+        ts = datetime.datetime.utcnow()
+    try:
+        scan_uuid = str(uuid.UUID(str(scan["scan_uuid"]))) if scan.get("scan_uuid") \
+            else str(uuid.uuid4())
+    except ValueError:
+        raise ValueError(f"bad scan_uuid: {scan['scan_uuid']!r}") from None
+    device_id = scan.get("device_id")
+    return {"badge_id": badge_id, "timestamp": ts.isoformat(), "scan_uuid": scan_uuid,
+            "device_id": None if device_id is None else str(device_id)}
+
+
+# ─── Service ─────────────────────────────────────────────────────────────────
+class CheckInService:
+    """
+    The shared state behind every kiosk.
+
+    `submit()` queues scans and waits for their batch: one writer task takes
+    everything queued (plus whatever arrives within BATCH_WINDOW of the
+    first scan, up to BATCH_MAX) and writes it with a single `store.write()`
+    on a worker thread. Scans that arrive during a write ride in the next
+    one, so N busy kiosks cost one transaction per write time instead of N.
+    After each batch the live counts are pushed to every subscriber.
+
+    Scans are validated before they are queued, so a malformed one is
+    rejected on its own. If a batch write still fails, its scans are
+    retried one at a time and only the ones that fail again report an error.
+    """
+
+    def __init__(self, store, batch_max: int = BATCH_MAX, batch_window: float = BATCH_WINDOW):
+        self.store = store
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self.roster = RosterCache(store.attendees)
+        self.totals = Counter()             # scans, duplicates, batches, errors
+        self.checked_in = set()             # badges with at least one scan
+        self.by_session = defaultdict(set)  # session_id → badges
+        self._queue = None
+        self._writer = None
+        self._subscribers = set()
+
+    # ── lifecycle ──────────────────────────────────────────────────────────
+    async def start(self):
+        self._queue = asyncio.Queue()
+        total, pairs = await asyncio.to_thread(self.store.presence)
+        self.totals["scans"] = total
+        for badge, session_id in pairs:
+            self.checked_in.add(badge)
+            if session_id is not None:
+                self.by_session[session_id].add(badge)
+        await asyncio.to_thread(self.roster.get)
+        self._writer = asyncio.create_task(self._write_loop(), name="checkin-writer")
+
+    async def stop(self):
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+
+    # ── roster ─────────────────────────────────────────────────────────────
+    async def get_roster(self):
+        if self.roster.expired:
+            return await asyncio.to_thread(self.roster.get)
+        return self.roster.get()
+
+    async def register(self, rows):
+        rows = await asyncio.to_thread(self.store.register, rows)
+        self.roster.apply(*rows)
+        return rows
+
+    # ── scans ──────────────────────────────────────────────────────────────
+    async def submit(self, scans) -> list:
+        """
+        Queue scans for the next batch; returns one result per scan. Raises
+        ValueError, before anything is queued, if any scan is malformed.
+        """
+        scans = [normalize_scan(sc) for sc in scans]
+        loop = asyncio.get_running_loop()
+        futures = []
+        for sc in scans:
+            fut = loop.create_future()
+            await self._queue.put((sc, fut))
+            futures.append(fut)
+        return list(await asyncio.gather(*futures))
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_window
+        while len(batch) < self.batch_max:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_loop(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                try:
+                    results = await asyncio.to_thread(self.store.write, [sc for sc, _ in batch])
+                    self._resolve(batch, results)
+                except Exception as e:
+                    if len(batch) == 1:
+                        self._fail(batch, e)
+                    else:
+                        await self._write_one_by_one(batch)
+                self.publish({"type": "counts", **self.counts()})
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_one_by_one(self, batch):
+        """Retry a failed batch scan by scan, so one bad scan fails alone."""
+        for item in batch:
+            try:
+                results = await asyncio.to_thread(self.store.write, [item[0]])
+            except Exception as e:
+                self._fail([item], e)
+            else:
+                self._resolve([item], results)
+
+    def _resolve(self, batch, results):
+        self._count(results)
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def _fail(self, batch, error):
+        self.totals["errors"] += len(batch)
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(error)
+
+    def _count(self, results):
+        self.totals["batches"] += 1
+        for r in results:
+            if r.get("duplicate"):
+                self.totals["duplicates"] += 1
+                continue
+            self.totals["scans"] += 1
+            self.checked_in.add(r["badge_id"])
+            if r.get("session_id") is not None:
+                self.by_session[r["session_id"]].add(r["badge_id"])
+
+    # ── live counts ────────────────────────────────────────────────────────
+    def counts(self) -> dict:
+        return {"scans": self.totals["scans"], "checked_in": len(self.checked_in),
+                "duplicates": self.totals["duplicates"], "batches": self.totals["batches"],
+                "by_session": {str(sid): len(b) for sid, b in sorted(self.by_session.items())},
+                "kiosks": len(self._subscribers)}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(SUBSCRIBER_BUFFER)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, message: dict):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()      # a slow kiosk only misses stale counts
+            queue.put_nowait(message)
+
+
+# ─── HTTP / WebSocket ───────────────────────────────────────────────────────
+def create_app(service: CheckInService):
+    """
+    Starlette app:
+
+      POST /scans       {badge_id, timestamp?, scan_uuid?, device_id?} or a list → {results}
+      GET  /attendees   roster rows           POST /attendees  register one or more
+      GET  /search?q=   type-ahead matches    GET  /counts     live counts
+      WS   /ws          send {"type": "scan", …} or {"type": "scans", "scans": […]};
+                        receive {"type": "ack", "results": […]} and pushed
+                        {"type": "counts", …} after every batch
+    """
+    from contextlib import asynccontextmanager
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+
+    def as_list(body):
+        return body if isinstance(body, list) else [body]
+
+    async def post_scans(request):
+        try:
+            results = await service.submit(as_list(await request.json()))
+        except ValueError as e:         # malformed JSON or scan: the kiosk must not retry
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except Exception as e:
+            return JSONResponse({"error": repr(e)}, status_code=503)
+        return JSONResponse({"results": results})
+
+    async def get_attendees(request):
+        roster = await service.get_roster()
+        return JSONResponse({"version": roster.version, "attendees": [
+            {k: a[k] for k in ("badge_id", "name", "email")} for a in roster.attendees]})
+
+    async def post_attendees(request):
+        try:
+            rows = await service.register(as_list(await request.json()))
+        except Exception as e:
+            return JSONResponse({"error": repr(e)}, status_code=409)
+        return JSONResponse({"attendees": rows})
+
+    async def search(request):
+        roster = await service.get_roster()
+        k = int(request.query_params.get("k", 8))
+        return JSONResponse({"matches": [m._asdict() for m in
+                                         roster.search.search(request.query_params.get("q", ""), k)]})
+
+    async def counts(request):
+        return JSONResponse(service.counts())
+
+    async def health(request):
+        roster = await service.get_roster()
+        return JSONResponse({"ok": True, "roster": len(roster), "queued": service._queue.qsize()})
+
+    async def ws(websocket):
+        await websocket.accept()
+        pushes = service.subscribe()
+
+        async def pump():
+            while True:
+                await websocket.send_json(await pushes.get())
+
+        async def handle(message):
+            scans = message.get("scans") or [message]
+            try:
+                results = await service.submit(scans)
+                await websocket.send_json({"type": "ack", "id": message.get("id"),
+                                           "results": results})
+            except Exception as e:
+                await websocket.send_json({"type": "error", "id": message.get("id"),
+                                           "error": repr(e)})
+
+        sender = asyncio.create_task(pump())
+        pending = set()
+        try:
+            await websocket.send_json({"type": "counts", **service.counts()})
+            while True:
+                message = await websocket.receive_json()
+                if message.get("type") in ("scan", "scans"):
+                    # acks go out as their batches commit, not in arrival order
+                    task = asyncio.create_task(handle(message))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            service.unsubscribe(pushes)
+            sender.cancel()
+            for task in pending:
+                task.cancel()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+
+    return Starlette(
+        routes=[Route("/scans", post_scans, methods=["POST"]),
+                Route("/attendees", get_attendees, methods=["GET"]),
+                Route("/attendees", post_attendees, methods=["POST"]),
+                Route("/search", search), Route("/counts", counts), Route("/health", health),
+                WebSocketRoute("/ws", ws)],
+        lifespan=lifespan,
+    )
+
+
+# ─── Kiosk client ───────────────────────────────────────────────────────────
+class ServiceClient:
+    """
+    Synchronous client the Streamlit kiosks use (see database.py). One
+    pooled HTTP connection per kiosk process; errors raise, so callers can
+    fall back to the scan journal.
+    """
+
+    def __init__(self, base_url: str, timeout: float = CLIENT_TIMEOUT):
+        import httpx
+        self.base_url = base_url.rstrip("/")
+        self._http = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def _call(self, method: str, path: str, **kwargs):
+        resp = self._http.request(method, path, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def check_in(self, badge_id, timestamp: str = None, scan_uuid: str = None,
+                 device_id: str = None, timeout: float = None) -> dict:
+        scan = {"badge_id": int(badge_id), "timestamp": timestamp,
+                "scan_uuid": scan_uuid, "device_id": device_id}
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        return self._call("POST", "/scans", json=scan, **kwargs)["results"][0]
+
+    def push(self, batch) -> list:
+        return self._call("POST", "/scans", json=list(batch))["results"]
+
+    def attendees(self) -> list:
+        return self._call("GET", "/attendees")["attendees"]
+
+    def register(self, rows) -> list:
+        return self._call("POST", "/attendees", json=list(rows))["attendees"]
+
+    def counts(self) -> dict:
+        return self._call("GET", "/counts")
+
+    def close(self):
+        self._http.close()
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def build_store(db_url: str = SERVICE_DB_URL, supabase: bool = False):
+    from schedule import load_schedule
+
+    if supabase:
+        return SupabaseStore()
+    from schema import metadata
+    from sql_backend import make_engine
+
+    engine = make_engine(db_url)
+    if engine.dialect.name == "sqlite":
+        metadata.create_all(engine)     # local stand-in: create the tables on first run
+    # Postgres tags sessions in its trigger; tagging here too is harmless
+    return SqlStore(engine, load_schedule())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared kiosk check-in service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--db", default=SERVICE_DB_URL,
+                        help="SQLAlchemy URL (default: SQLite stand-in checkin_service.db)")
+    parser.add_argument("--supabase", action="store_true",
+                        help="write through the Supabase RPCs instead of --db")
+    args = parser.parse_args()
+
+    import uvicorn
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    service = CheckInService(build_store(args.db, args.supabase))
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
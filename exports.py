@@ -0,0 +1,131 @@
+# exports.py
+
+import glob
+import io
+import os
+import tempfile
+import threading
+import zipfile
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+EXPORT_DIR = os.getenv("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "conference-exports")
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "100000"))   # rows per streamed slice
+XLSX_MAX_ROWS = 1_048_575                                 # Excel's sheet limit, minus header
+
+FORMATS = {
+    "csv":     "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx":    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip":     "application/zip",
+}
+
+
+# ─── Streaming writers ───────────────────────────────────────────────────────
+# Each takes an iterable of DataFrames with the same columns and writes them
+# one slice at a time, so only one slice is ever serialized in memory.
+def write_csv(frames, fh):
+    text = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+    for i, frame in enumerate(frames):
+        frame.to_csv(text, index=False, header=i == 0)
+    text.flush()
+    text.detach()
+
+
+def write_parquet(frames, fh):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(fh, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_xlsx(frames, fh, sheet: str = "Sheet1"):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws, rows, part = None, XLSX_MAX_ROWS, 0
+    for frame in frames:
+        header = [str(c) for c in frame.columns]
+        for record in frame.astype(object).itertuples(index=False, name=None):
+            if rows == XLSX_MAX_ROWS:       # start (another) sheet
+                part += 1
+                ws = wb.create_sheet(sheet if part == 1 else f"{sheet} ({part})")
+                ws.append(header)
+                rows = 0
+            ws.append(["" if v is None or v != v else v for v in record])
+            rows += 1
+    if ws is None:
+        wb.create_sheet(sheet)
+    wb.save(fh)
+
+
+def write_zip(reports: dict, fh):
+    """One CSV per report, each streamed into the archive slice by slice."""
+    with zipfile.ZipFile(fh, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, frames in reports.items():
+            with zf.open(f"{name}.csv", "w", force_zip64=True) as member:
+                write_csv(frames, member)
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "xlsx": write_xlsx, "zip": write_zip}
+
+
+# ─── Version-keyed export cache ─────────────────────────────────────────────
+class ExportCache:
+    """
+    Export files on disk, keyed by (report, format, data version).
+
+    `get()` builds a file only the first time it is asked for at a given
+    version – i.e. when someone actually clicks download – streaming the
+    report's frames straight to disk, then serves that file until the data
+    changes. Files from older versions are removed when a newer one is built.
+    """
+
+    def __init__(self, base_dir: str = EXPORT_DIR):
+        # a private directory per cache: versions restart with every process
+        os.makedirs(base_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="exports-", dir=base_dir)
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, fmt: str, version: int) -> str:
+        return os.path.join(self.directory, f"{name}.v{version}.{fmt}")
+
+    def get(self, name: str, fmt: str, version: int, frames) -> str:
+        """
+        Path of `name` exported as `fmt` at `version`; `frames()` is called
+        (only on a miss) for an iterable of DataFrames, or for a
+        {name: frames()} dict when fmt is "zip".
+        """
+        path = self._path(name, fmt, version)
+        with self._lock:
+            if os.path.exists(path):
+                return path
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as fh:
+                    WRITERS[fmt](frames(), fh)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            for old in glob.glob(os.path.join(self.directory, f"{name}.v*.{fmt}")):
+                if old != path:
+                    try:
+                        os.remove(old)
+                    except OSError:
+                        pass
+            return path
+
+    def read(self, name: str, fmt: str, version: int, frames) -> bytes:
+        with open(self.get(name, fmt, version, frames), "rb") as fh:
+            return fh.read()
+
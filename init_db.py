@@ -1,6 +1,7 @@
-from database import Base, engine
+from main import engine
+from schema import metadata
 
 # Create all tables
-Base.metadata.create_all(engine)
+metadata.create_all(engine)
 
 print("✅ Tables created!")
@@ -0,0 +1,247 @@
+# metrics.py
+
+import functools
+import inspect
+import json
+import threading
+import time
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROM_PREFIX = "conference"
+
+
+# ─── Per-function stats ─────────────────────────────────────────────────────
+class Stat:
+    """Counters and a latency histogram for one instrumented function."""
+
+    __slots__ = ("calls", "errors", "seconds", "round_trips", "rows", "bytes", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)   # last one is +Inf
+
+    def add(self, seconds: float, error: bool, round_trips: int, rows: int, nbytes: int):
+        self.calls += 1
+        self.errors += int(error)
+        self.seconds += seconds
+        self.round_trips += round_trips
+        self.rows += rows
+        self.bytes += nbytes
+        ms = seconds * 1000
+        for i, le in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= le:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q: float):
+        """Approximate latency percentile (ms) from the histogram upper bounds."""
+        if not self.calls:
+            return None
+        rank, seen = q * self.calls, 0
+        for le, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return le
+        return float("inf")
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls, "errors": self.errors,
+            "total_ms": round(self.seconds * 1000, 3),
+            "mean_ms": round(self.seconds * 1000 / self.calls, 3) if self.calls else None,
+            "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95),
+            "round_trips": self.round_trips, "rows": self.rows, "bytes": self.bytes,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS_MS), "+Inf"], self.buckets)),
+        }
+
+
+class _Span:
+    """One call in progress; network traffic is added to every open span."""
+
+    __slots__ = ("name", "seconds", "round_trips", "rows", "bytes")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.rows = 0
+        self.bytes = 0
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────
+class Registry:
+    """
+    Process-wide metrics, keyed by function name.
+
+    `span(name)` / `@timed(name)` measure a call; the data layer reports
+    traffic with `record_request()` / `record_bytes()`, which is credited to
+    every span open on the calling thread. `begin_capture()` starts a
+    per-thread breakdown (one Streamlit rerun) readable with `captured()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._local = threading.local()
+        self.started_at = time.time()
+
+    def _open(self):
+        spans = getattr(self._local, "spans", None)
+        if spans is None:
+            spans = self._local.spans = []
+        return spans
+
+    def _finish(self, span: _Span, error: bool):
+        args = (span.seconds, error, span.round_trips, span.rows, span.bytes)
+        with self._lock:
+            stat = self._stats.get(span.name)
+            if stat is None:
+                stat = self._stats[span.name] = Stat()
+            stat.add(*args)
+        capture = getattr(self._local, "capture", None)
+        if capture is not None:
+            capture.setdefault(span.name, Stat()).add(*args)
+
+    # ── measuring ──────────────────────────────────────────────────────────
+    def span(self, name: str):
+        return _SpanContext(self, name)
+
+    def timed(self, name: str = None):
+        """Decorator form of span(); generators are timed across all their steps."""
+        def wrap(fn):
+            label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+            if inspect.isgeneratorfunction(fn):
+                @functools.wraps(fn)
+                def gen_wrapper(*args, **kwargs):
+                    span, error = _Span(label), False
+                    gen = fn(*args, **kwargs)
+                    try:
+                        while True:
+                            with _Step(self, span):
+                                try:
+                                    item = next(gen)
+                                except StopIteration:
+                                    return
+                            yield item
+                    except GeneratorExit:
+                        gen.close()
+                        raise
+                    except BaseException:
+                        error = True
+                        raise
+                    finally:
+                        self._finish(span, error)
+                return gen_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return wrap
+
+    def record_request(self, rows: int = 0, nbytes: int = 0):
+        for span in self._open():
+            span.round_trips += 1
+            span.rows += rows
+            span.bytes += nbytes
+
+    def record_bytes(self, nbytes: int):
+        for span in self._open():
+            span.bytes += nbytes
+
+    # ── per-rerun capture ──────────────────────────────────────────────────
+    def begin_capture(self):
+        self._local.capture = {}
+
+    def captured(self) -> dict:
+        capture = getattr(self._local, "capture", None) or {}
+        return {name: stat.as_dict() for name, stat in sorted(capture.items())}
+
+    # ── export ─────────────────────────────────────────────────────────────
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: stat.as_dict() for name, stat in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.started_at = time.time()
+
+    def to_json(self) -> str:
+        return json.dumps({"since": self.started_at, "functions": self.snapshot()}, indent=1)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        p = PROM_PREFIX
+        with self._lock:
+            stats = sorted(self._stats.items())
+        out = []
+        counters = [("calls_total", "calls", "Instrumented calls."),
+                    ("errors_total", "errors", "Calls that raised."),
+                    ("round_trips_total", "round_trips", "Backend requests made."),
+                    ("rows_total", "rows", "Rows received from the backend."),
+                    ("bytes_total", "bytes", "Response bytes received from the backend.")]
+        for metric, attr, help_text in counters:
+            out.append(f"# HELP {p}_{metric} {help_text}")
+            out.append(f"# TYPE {p}_{metric} counter")
+            for name, stat in stats:
+                out.append(f'{p}_{metric}{{fn="{name}"}} {getattr(stat, attr)}')
+
+        out.append(f"# HELP {p}_call_duration_seconds Call latency.")
+        out.append(f"# TYPE {p}_call_duration_seconds histogram")
+        for name, stat in stats:
+            cumulative = 0
+            for le, n in zip(LATENCY_BUCKETS_MS, stat.buckets):
+                cumulative += n
+                out.append(f'{p}_call_duration_seconds_bucket{{fn="{name}",le="{le / 1000:g}"}} '
+                           f'{cumulative}')
+            out.append(f'{p}_call_duration_seconds_bucket{{fn="{name}",le="+Inf"}} {stat.calls}')
+            out.append(f'{p}_call_duration_seconds_sum{{fn="{name}"}} {stat.seconds:.6f}')
+            out.append(f'{p}_call_duration_seconds_count{{fn="{name}"}} {stat.calls}')
+        return "\n".join(out) + "\n"
+
+
+class _Step:
+    """Push `span` while a block runs and add its wall time."""
+
+    __slots__ = ("registry", "span", "t0")
+
+    def __init__(self, registry: Registry, span: _Span):
+        self.registry = registry
+        self.span = span
+
+    def __enter__(self):
+        self.registry._open().append(self.span)
+        self.t0 = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.seconds += time.perf_counter() - self.t0
+        self.registry._open().pop()
+        return False
+
+
+class _SpanContext(_Step):
+    def __init__(self, registry: Registry, name: str):
+        super().__init__(registry, _Span(name))
+
+    def __exit__(self, exc_type, *exc):
+        super().__exit__(exc_type, *exc)
+        self.registry._finish(self.span, exc_type is not None)
+        return False
+
+
+registry = Registry()
+span = registry.span
+timed = registry.timed
+record_request = registry.record_request
+record_bytes = registry.record_bytes
@@ -0,0 +1,180 @@
+# occupancy.py
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from reports import CompiledSessions
+from scan_columns import ScanColumns
+from schedule import EARLY_ARRIVAL_MIN, MINUTE_US
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+ARRIVAL_BUCKET_MIN = int(os.getenv("ARRIVAL_BUCKET_MIN", "5"))
+PEAK_WINDOW_MIN = int(os.getenv("PEAK_WINDOW_MIN", "15"))
+
+DAY_US = 24 * 60 * MINUTE_US
+NEVER = np.iinfo(np.int64).max    # matrix cell for "not seen in session"
+
+
+# ─── Occupancy engine ───────────────────────────────────────────────────────
+class OccupancyEngine:
+    """
+    Room occupancy and arrival-rate analytics over the scan log.
+
+    Two aggregates are kept and folded into incrementally, like the CE
+    engine: a histogram of scans per ARRIVAL_BUCKET_MIN bucket (bincount
+    from midnight of the first conference day to midnight after the last;
+    scans outside those days are left out) and a badge × session
+    matrix of first-arrival times (epoch µs, NEVER if absent), filled with
+    `np.minimum.at`. Scans tagged with a session at ingest are grouped by
+    it (ingest already tags a kiosk scan up to EARLY_ARRIVAL_MIN before a
+    session in its room with that session); for untagged ones a single
+    searchsorted assigns the session, with the same early window. Headcounts, peaks and dwell are cheap reductions of
+    those two arrays, so views never rescan the log.
+    """
+
+    def __init__(self, sessions, bucket_min: int = ARRIVAL_BUCKET_MIN,
+                 early_min: int = EARLY_ARRIVAL_MIN):
+        self.sessions = CompiledSessions(sessions, early_us=early_min * MINUTE_US)
+        self.scheduled = self.sessions.starts + early_min * MINUTE_US
+        self.bucket_min = bucket_min
+        self.bucket_us = bucket_min * MINUTE_US
+        self.origin = int(self.scheduled.min() // DAY_US * DAY_US) if len(sessions) else 0
+        end = int(-(-self.sessions.ends.max() // DAY_US) * DAY_US) if len(sessions) else 0
+        self._lock = threading.Lock()
+        # one bucket per ARRIVAL_BUCKET_MIN over the conference days – a scan
+        # with a stray timestamp (kiosk clock, test check-in) can't stretch it
+        self._arrivals = np.zeros((end - self.origin) // self.bucket_us, np.int64)
+        self._badges = np.empty(0, np.int64)            # sorted; matrix row -> badge_id
+        self._first = np.full((0, len(self.sessions)), NEVER, np.int64)
+        self.last_id = None                             # highest scanlog.id ingested
+        self.latest_ts = None                           # newest scan time seen (epoch µs)
+        self.scan_count = 0
+
+    # ── ingestion ──────────────────────────────────────────────────────────
+    def add_columns(self, cols: ScanColumns):
+        """Fold in a ScanColumns batch and advance `last_id` past it."""
+        if not len(cols):
+            return
+        ts = cols.ts
+        bucket = (ts - self.origin) // self.bucket_us
+        horizon = len(self._arrivals)
+        counts = np.bincount(bucket[(bucket >= 0) & (bucket < horizon)], minlength=horizon)
+        scan_idx, sess_idx = self.sessions.assign_columns(cols)
+        badges = cols.badges[scan_idx].astype(np.int64)
+
+        with self._lock:
+            self.scan_count += len(cols)
+            self.latest_ts = int(ts.max()) if self.latest_ts is None \
+                else max(self.latest_ts, int(ts.max()))
+            batch_max = int(cols.ids.max())
+            if self.last_id is None or batch_max > self.last_id:
+                self.last_id = batch_max
+
+            self._arrivals += counts
+
+            if len(scan_idx) == 0:
+                return
+            new = np.setdiff1d(badges, self._badges)
+            if len(new):
+                merged = np.union1d(self._badges, new)
+                grown = np.full((len(merged), len(self.sessions)), NEVER, np.int64)
+                grown[np.searchsorted(merged, self._badges)] = self._first
+                self._badges, self._first = merged, grown
+            rows = np.searchsorted(self._badges, badges)
+            np.minimum.at(self._first, (rows, sess_idx), ts[scan_idx])
+
+    def ingest_pages(self, pages):
+        """Fold in raw scanlog pages ({id, badge_id, timestamp} dicts)."""
+        for page in pages:
+            if page:
+                self.add_columns(ScanColumns.from_rows(page))
+
+    def _state(self):
+        with self._lock:
+            return self._arrivals.copy(), self._badges.copy(), self._first.copy()
+
+    # ── views ──────────────────────────────────────────────────────────────
+    def headcounts(self, now: int = None) -> pd.DataFrame:
+        """
+        Distinct badges that arrived for each session so far (cumulative –
+        scans record arrivals, not departures). `In progress` marks sessions
+        running at `now` (epoch µs; defaults to the newest scan) by their
+        scheduled times, without the early-arrival allowance.
+        """
+        _, _, first = self._state()
+        now = self.latest_ts if now is None else now
+        running = (self.scheduled <= now) & (now <= self.sessions.ends) \
+            if now is not None else np.zeros(len(self.sessions), bool)
+        return pd.DataFrame({
+            "Session":     self.sessions.titles,
+            "Start":       self.scheduled.view("datetime64[us]"),
+            "End":         self.sessions.ends.view("datetime64[us]"),
+            "Arrived":     (first != NEVER).sum(axis=0),
+            "In progress": running,
+        })
+
+    def arrivals(self) -> pd.DataFrame:
+        """Scans per bucket, indexed by bucket start, from the first to the last busy bucket."""
+        counts, _, _ = self._state()
+        busy = np.flatnonzero(counts)
+        if len(busy) == 0:
+            return pd.DataFrame({"Arrivals": np.empty(0, np.int64)},
+                                index=pd.DatetimeIndex([], name="Time"))
+        counts = counts[busy[0]:busy[-1] + 1]
+        starts = self.origin + (busy[0] + np.arange(len(counts))) * self.bucket_us
+        return pd.DataFrame({"Arrivals": counts},
+                            index=pd.DatetimeIndex(starts.view("datetime64[us]"), name="Time"))
+
+    def peak_windows(self, top: int = 5, window_min: int = PEAK_WINDOW_MIN) -> pd.DataFrame:
+        """The `top` busiest non-overlapping `window_min` windows (rolling sum of buckets)."""
+        counts, _, _ = self._state()
+        width = max(1, window_min * MINUTE_US // self.bucket_us)
+        cum = np.r_[0, np.cumsum(counts)]
+        rolling = cum[width:] - cum[:-width] if len(counts) >= width else cum[-1:]
+        picked = []
+        for i in np.argsort(rolling, kind="stable")[::-1]:
+            if len(picked) == top or rolling[i] == 0:
+                break
+            if all(abs(int(i) - j) >= width for j in picked):
+                picked.append(int(i))
+        starts = self.origin + np.array(picked, np.int64) * self.bucket_us
+        return pd.DataFrame({
+            "From":       starts.view("datetime64[us]"),
+            "To":         (starts + width * self.bucket_us).view("datetime64[us]"),
+            "Arrivals":   rolling[picked].astype(np.int64),
+            "Per minute": np.round(rolling[picked] / (width * self.bucket_us / MINUTE_US), 1),
+        })
+
+    def dwell(self, attendee_map) -> pd.DataFrame:
+        """
+        Minutes each badge spent in sessions, per conference day: from its
+        first arrival (or the scheduled start, if earlier) to the session end.
+        """
+        _, badges, first = self._state()
+        hit = first != NEVER
+        keep = np.flatnonzero(hit.any(axis=1))
+        if len(keep) == 0:
+            return pd.DataFrame([])
+        badges, first, hit = badges[keep], first[keep], hit[keep]
+
+        arrived = np.maximum(first, self.scheduled)
+        minutes = np.where(hit, (self.sessions.ends - arrived) / MINUTE_US, 0.0)
+        days, day_of = np.unique(self.scheduled // DAY_US, return_inverse=True)
+        one_hot = np.zeros((len(self.sessions), len(days)))
+        one_hot[np.arange(len(self.sessions)), day_of] = 1.0
+        per_day = np.round(minutes @ one_hot).astype(np.int64)
+
+        people = [attendee_map.get(int(b)) for b in badges]
+        data = {"Badge ID": badges,
+                "Name":  [p["name"] if p else f"<unregistered {int(b)}>"
+                          for p, b in zip(people, badges)],
+                "Email": [p["email"] if p else "" for p in people]}
+        labels = np.datetime_as_string((days * DAY_US).view("datetime64[us]"), unit="D")
+        for label, col in zip(labels, per_day.T):
+            data[f"{label} (min)"] = col
+        data["Total (min)"] = per_day.sum(axis=1)
+        data["Sessions"] = hit.sum(axis=1)
+        return pd.DataFrame(data)
@@ -0,0 +1,163 @@
+# qr_decoder.py
+
+import io
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from metrics import timed
+
+try:                                   # optional second decoder (needs libzbar)
+    from pyzbar.pyzbar import decode as zbar_decode, ZBarSymbol
+except ImportError:                    # pragma: no cover - depends on system lib
+    zbar_decode = None
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+LOAD_SIDE = 1280          # JPEGs larger than this are downscaled while decoding
+FAST_SIDE = 640           # longest side fed to the detector on the first try
+PYRAMID_SCALES = (0.5,)
+ROI_FRACTION = 0.6        # size of the centre / quadrant crops, per side
+
+DecodeResult = namedtuple("DecodeResult", "text stage")
+NOT_FOUND = DecodeResult(None, None)
+
+_local = threading.local()
+
+
+# ─── Warm detectors ──────────────────────────────────────────────────────────
+def _detector(kind: str = "standard"):
+    """
+    One detector per thread and kind (they are not thread-safe), created on
+    first use and reused for every later frame.
+    """
+    det = getattr(_local, kind, None)
+    if det is None:
+        if kind == "aruco":
+            det = cv2.QRCodeDetectorAruco()
+        else:
+            det = cv2.QRCodeDetector()
+        setattr(_local, kind, det)
+    return det
+
+
+def _opencv(gray: np.ndarray, kind: str = "standard"):
+    try:
+        data, _, _ = _detector(kind).detectAndDecode(gray)
+    except cv2.error:
+        return None
+    return data.strip() or None
+
+
+def _zbar(gray: np.ndarray):
+    if zbar_decode is None:
+        return None
+    found = zbar_decode(gray, symbols=[ZBarSymbol.QRCODE])
+    return found[0].data.decode("utf-8").strip() if found else None
+
+
+# ─── Image loading ───────────────────────────────────────────────────────────
+def load_gray(data: bytes, max_side: int = LOAD_SIDE):
+    """
+    Decode image bytes straight to grayscale.
+
+    For JPEGs, PIL's draft mode lets libjpeg do the colour conversion and a
+    power-of-two downscale inside the decoder, so no full-size RGB frame is
+    ever materialized. Returns (gray ndarray, reduced?).
+    """
+    im = Image.open(io.BytesIO(data))
+    full_size = im.size
+    if max_side and max(full_size) > max_side:
+        scale = max_side / max(full_size)
+        im.draft("L", (int(full_size[0] * scale), int(full_size[1] * scale)))
+    if im.mode != "L":
+        im = im.convert("L")
+    return np.asarray(im), im.size != full_size
+
+
+def _fit(gray: np.ndarray, max_side: int = FAST_SIDE) -> np.ndarray:
+    longest = max(gray.shape)
+    if longest <= max_side:
+        return gray
+    scale = max_side / longest
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def _crops(gray: np.ndarray):
+    h, w = gray.shape
+    ch, cw = int(h * ROI_FRACTION), int(w * ROI_FRACTION)
+    yield "roi:centre", gray[(h - ch) // 2:(h + ch) // 2, (w - cw) // 2:(w + cw) // 2]
+    for name, (y, x) in (("roi:tl", (0, 0)), ("roi:tr", (0, w - cw)),
+                         ("roi:bl", (h - ch, 0)), ("roi:br", (h - ch, w - cw))):
+        yield name, gray[y:y + ch, x:x + cw]
+
+
+# ─── Decode chain ────────────────────────────────────────────────────────────
+@timed()
+def decode_gray(gray: np.ndarray, thorough: bool = True) -> DecodeResult:
+    """
+    Try progressively more expensive strategies until one decodes:
+    reduced frame → full frame → ROI crops → downscale pyramid →
+    contrast-equalized → ArUco-based detector → pyzbar (if installed).
+
+    With thorough=False only the first two steps run, which suits
+    continuous video where most frames contain no badge at all.
+    """
+    fitted = _fit(gray)
+    text = _opencv(fitted)
+    if text:
+        return DecodeResult(text, "fast")
+
+    if fitted is not gray:
+        text = _opencv(gray)
+        if text:
+            return DecodeResult(text, "full")
+    if not thorough:
+        return NOT_FOUND
+
+    for stage, crop in _crops(gray):
+        text = _opencv(crop)
+        if text:
+            return DecodeResult(text, stage)
+
+    for scale in PYRAMID_SCALES:
+        small = cv2.resize(fitted, None, fx=scale, fy=scale,
+                           interpolation=cv2.INTER_AREA)
+        if min(small.shape) < 64:
+            break
+        text = _opencv(small)
+        if text:
+            return DecodeResult(text, f"pyramid:{scale}")
+
+    equalized = cv2.equalizeHist(fitted)
+    text = _opencv(equalized)
+    if text:
+        return DecodeResult(text, "equalized")
+
+    text = _opencv(gray, "aruco")
+    if text:
+        return DecodeResult(text, "aruco")
+
+    text = _zbar(gray)
+    if text:
+        return DecodeResult(text, "zbar")
+    return NOT_FOUND
+
+
+def decode_bytes(data: bytes, thorough: bool = True) -> DecodeResult:
+    """Decode a camera frame (JPEG/PNG bytes); see decode_gray."""
+    gray, reduced = load_gray(data)
+    result = decode_gray(gray, thorough)
+    if result.text is None and reduced and thorough:
+        full, _ = load_gray(data, max_side=None)
+        result = decode_gray(full)
+        if result.text:
+            result = DecodeResult(result.text, "full:" + result.stage)
+    return result
+
+
+def decode_qr(data: bytes):
+    """Return the QR payload in a camera frame, or None."""
+    return decode_bytes(data).text
@@ -1,15 +1,209 @@
-import qrcode
+import argparse
+import hashlib
+import json
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import qrcode
+from PIL import Image
+from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
+
+# Output folder and render settings shared by every QR image in the app
+QR_DIR = os.getenv("QR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "qr_codes"))
+MANIFEST = "manifest.json"
+RENDER_PARAMS = {"version": None, "error_correction": "M", "box_size": 10, "border": 4,
+                 "mask_pattern": None}
+
+_ECC = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+
+_manifests = {}                    # manifest path → (mtime_ns, manifest)
+_manifest_lock = threading.RLock()
+
+
+# ─── Cache keys ──────────────────────────────────────────────────────────────
+def payload_for(badge_id) -> str:
+    """What the QR encodes: the plain badge number, as log_scan expects."""
+    return str(int(badge_id))
+
+
+def file_name(badge_id) -> str:
+    return f"qr_{int(badge_id):02d}.png"
+
+
+def qr_path(badge_id, out_dir: str = QR_DIR) -> str:
+    return os.path.join(out_dir, file_name(badge_id))
+
+
+def content_hash(payload: str, params: dict = RENDER_PARAMS) -> str:
+    key = json.dumps({"payload": payload, "params": params}, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: str, write, mode: str = "w"):
+    """Write `path` through a private temp file in the same folder, then rename it."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                               prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.chmod(tmp, 0o644)        # mkstemp creates it owner-only
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_manifest(out_dir: str = QR_DIR) -> dict:
+    """
+    The folder's manifest, kept in memory and re-read only when the file
+    changes on disk (e.g. the CLI ran). The dict is shared – don't modify it.
+    """
+    path = os.path.abspath(os.path.join(out_dir, MANIFEST))
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _manifest_lock:
+        cached = _manifests.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {"params": RENDER_PARAMS, "badges": {}}
+        _manifests[path] = (mtime, manifest)
+        return manifest
+
+
+def save_manifest(manifest: dict, out_dir: str = QR_DIR):
+    path = os.path.abspath(os.path.join(out_dir, MANIFEST))
+    with _manifest_lock:
+        _write_atomic(path, lambda f: json.dump(manifest, f, indent=1, sort_keys=True))
+        _manifests[path] = (os.stat(path).st_mtime_ns, manifest)
+
+
+# ─── Rendering ───────────────────────────────────────────────────────────────
+def render_png(payload: str, path: str, params: dict = RENDER_PARAMS):
+    """Render one QR code to `path` (written atomically)."""
+    qr = qrcode.QRCode(version=params["version"],
+                       error_correction=_ECC[params["error_correction"]],
+                       box_size=params["box_size"],
+                       border=params["border"],
+                       mask_pattern=params.get("mask_pattern"))
+    qr.add_data(payload)
+    qr.make(fit=True)
+    # scale the module matrix with NumPy instead of drawing box by box
+    modules = np.array(qr.get_matrix(), dtype=bool)
+    box = params["box_size"]
+    pixels = np.where(modules, 0, 255).astype(np.uint8).repeat(box, 0).repeat(box, 1)
+    image = Image.fromarray(pixels).convert("1")
+    _write_atomic(path, lambda f: image.save(f, format="PNG"), "wb")
+
+
+def _render_job(job):
+    payload, path, params = job
+    render_png(payload, path, params)
+    return path
+
+
+def is_fresh(badge_id, manifest: dict, out_dir: str = QR_DIR,
+             params: dict = RENDER_PARAMS) -> bool:
+    entry = manifest["badges"].get(payload_for(badge_id))
+    return bool(entry) \
+        and entry["hash"] == content_hash(payload_for(badge_id), params) \
+        and os.path.exists(os.path.join(out_dir, entry["file"]))
+
+
+def generate_bulk(badge_ids, out_dir: str = QR_DIR, workers: int = None,
+                  force: bool = False, params: dict = RENDER_PARAMS) -> dict:
+    """
+    Render QR PNGs for `badge_ids` in a process pool, skipping files whose
+    payload + render parameters hash matches the manifest. Returns counts.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+
+    jobs, entries = [], {}
+    for bid in sorted({int(b) for b in badge_ids}):
+        payload = payload_for(bid)
+        entries[payload] = {"file": file_name(bid), "payload": payload,
+                            "hash": content_hash(payload, params)}
+        if force or not is_fresh(bid, manifest, out_dir, params):
+            jobs.append((payload, qr_path(bid, out_dir), params))
+
+    if len(jobs) > 32 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_job, jobs, chunksize=64))
+    else:
+        for job in jobs:
+            _render_job(job)
+
+    with _manifest_lock:
+        # re-read: another thread may have saved entries while we rendered
+        current = load_manifest(out_dir)
+        save_manifest({**current, "params": params,
+                       "badges": {**current["badges"], **entries}}, out_dir)
+    return {"requested": len(entries), "rendered": len(jobs),
+            "skipped": len(entries) - len(jobs)}
+
+
+def get_qr_png(badge_id, out_dir: str = QR_DIR) -> bytes:
+    """PNG bytes for one badge, served from the on-disk cache (rendered on a miss)."""
+    path = qr_path(badge_id, out_dir)
+    if not is_fresh(badge_id, load_manifest(out_dir), out_dir):
+        generate_bulk([badge_id], out_dir, workers=1)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def qr_modules(badge_id, out_dir: str = QR_DIR, params: dict = RENDER_PARAMS,
+               manifest: dict = None) -> np.ndarray:
+    """
+    Dark-module matrix (quiet zone stripped) of a badge QR, sampled from the
+    cached PNG so callers can draw it as vectors without re-encoding.
+    """
+    manifest = manifest if manifest is not None else load_manifest(out_dir)
+    if not is_fresh(badge_id, manifest, out_dir, params):
+        generate_bulk([badge_id], out_dir, workers=1, params=params)
+    img = np.asarray(Image.open(qr_path(badge_id, out_dir)).convert("L"))
+    box, border = params["box_size"], params["border"]
+    n = img.shape[0] // box - 2 * border
+    centres = (np.arange(n) + border) * box + box // 2
+    return img[np.ix_(centres, centres)] < 128
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Render badge QR codes into the on-disk cache.")
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--roster", action="store_true",
+                     help="take badge IDs from the attendee roster (needs Supabase)")
+    src.add_argument("--range", nargs=2, type=int, metavar=("FIRST", "LAST"),
+                     default=(1, 88), help="inclusive badge ID range (default 1 88)")
+    parser.add_argument("--out", default=QR_DIR, help="output folder")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--force", action="store_true", help="re-render everything")
+    args = parser.parse_args()
+
+    if args.roster:
+        from database import get_all_attendees
+        badge_ids = [a["badge_id"] for a in get_all_attendees()]
+    else:
+        badge_ids = range(args.range[0], args.range[1] + 1)
 
-# Create output folder if it doesn't exist
-output_folder = "qr_codes"
-os.makedirs(output_folder, exist_ok=True)
+    t0 = time.perf_counter()
+    stats = generate_bulk(badge_ids, args.out, args.workers, args.force)
+    print(f"✅ Done in {time.perf_counter() - t0:.2f}s: {stats['rendered']} rendered, "
+          f"{stats['skipped']} unchanged, {stats['requested']} total in '{args.out}'.")
 
-# Generate QR codes for badge IDs 01 to 88
-for i in range(1, 89):
-    badge_id = f"{i:02d}"  # zero-padded: 01, 02, ..., 88
-    img = qrcode.make(badge_id)
-    img_path = os.path.join(output_folder, f"qr_{badge_id}.png")
-    img.save(img_path)
 
-print(f"✅ Done! Saved 88 QR codes in the '{output_folder}' folder.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# reports.py
+
+import datetime
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from scan_columns import UNTAGGED, AttendeeDim, ScanColumns, parse_timestamps
+
+NO_SCAN = np.iinfo(np.int64).min    # matrix cell for "never scanned in session"
+
+
+# ─── Session compilation ─────────────────────────────────────────────────────
+def to_datetime64(values) -> np.ndarray:
+    """ISO strings / datetimes → naive UTC datetime64[us] array, vectorized."""
+    ts = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601")
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_convert("UTC").dt.tz_localize(None)
+    return ts.to_numpy(dtype="datetime64[us]")
+
+
+def _unique_labels(sessions):
+    labels = [s["title"] for s in sessions]
+    for key in (lambda s: s["start"], lambda s: f"#{s.get('id', '?')}"):
+        counts = Counter(labels)
+        labels = [f"{label} ({key(s)})" if counts[label] > 1 else label
+                  for label, s in zip(labels, sessions)]
+    return labels
+
+
+class CompiledSessions:
+    """
+    Schedule sessions ({id, title, start, end} dicts) parsed once into
+    int64 (epoch µs) boundaries.
+
+    For a non-overlapping schedule the starts are sorted so scans can be
+    assigned with a single `searchsorted`; overlapping (or touching)
+    sessions fall back to one vectorized mask per session. Bounds are
+    inclusive on both ends, like the original report. `early_us` opens
+    every session that many microseconds before its scheduled start.
+    `labels` are the titles made unique for use as column names: a title
+    shared by several sessions gets its start time (and, if that clashes
+    too, its id) appended.
+    """
+
+    def __init__(self, sessions, early_us: int = 0):
+        self.titles = [s["title"] for s in sessions]
+        self.labels = _unique_labels(sessions)
+        self.ids = np.array([s.get("id", -1) for s in sessions], dtype=np.int64)
+        self._by_id = np.argsort(self.ids, kind="stable")
+        self.starts = np.array(
+            [datetime.datetime.strptime(s["start"], "%Y-%m-%d %H:%M") for s in sessions],
+            dtype="datetime64[us]").astype(np.int64) - int(early_us)
+        self.ends = np.array(
+            [datetime.datetime.strptime(s["end"], "%Y-%m-%d %H:%M") for s in sessions],
+            dtype="datetime64[us]").astype(np.int64)
+
+        self._order = np.argsort(self.starts, kind="stable")
+        self._sorted_starts = self.starts[self._order]
+        self._sorted_ends = self.ends[self._order]
+        self.overlapping = bool(
+            np.any(self._sorted_starts[1:] <= self._sorted_ends[:-1])
+        )
+
+    def __len__(self):
+        return len(self.titles)
+
+    def assign(self, ts: np.ndarray):
+        """
+        Map int64 timestamps to session indices.
+
+        Returns (scan_idx, session_idx): parallel arrays of every
+        (scan, session) pair where the scan falls inside the session.
+        """
+        if not self.overlapping:
+            pos = np.searchsorted(self._sorted_starts, ts, side="right") - 1
+            ok = pos >= 0
+            ok[ok] &= ts[ok] <= self._sorted_ends[pos[ok]]
+            scan_idx = np.flatnonzero(ok)
+            return scan_idx, self._order[pos[scan_idx]]
+
+        scan_parts, sess_parts = [], []
+        for i in range(len(self.titles)):
+            hit = np.flatnonzero((ts >= self.starts[i]) & (ts <= self.ends[i]))
+            scan_parts.append(hit)
+            sess_parts.append(np.full(len(hit), i, dtype=np.intp))
+        if not scan_parts:
+            return np.empty(0, np.intp), np.empty(0, np.intp)
+        return np.concatenate(scan_parts), np.concatenate(sess_parts)
+
+    def assign_columns(self, cols):
+        """
+        assign() for a ScanColumns batch. Scans tagged with a session_id at
+        ingest are grouped by that id directly, and device scans the trigger
+        found no session for stay unassigned. Only UNTAGGED scans (older
+        rows without a device) are matched by time – and, like the trigger
+        for devices without a room, only when exactly one session contains
+        them.
+        """
+        tagged = cols.sessions >= 0
+        untagged = np.flatnonzero(cols.sessions == UNTAGGED)
+        if not tagged.any():
+            more_scans, more_sess = self._unique(self.assign(cols.ts[untagged]), len(untagged))
+            return untagged[more_scans], more_sess
+        sorted_ids = self.ids[self._by_id]
+        pos = np.minimum(np.searchsorted(sorted_ids, cols.sessions), len(sorted_ids) - 1)
+        known = tagged & (sorted_ids[pos] == cols.sessions) if len(sorted_ids) else tagged & False
+        scan_idx = np.flatnonzero(known)
+        sess_idx = self._by_id[pos[scan_idx]]
+
+        if len(untagged) == 0:
+            return scan_idx, sess_idx
+        more_scans, more_sess = self._unique(self.assign(cols.ts[untagged]), len(untagged))
+        return (np.concatenate([scan_idx, untagged[more_scans]]),
+                np.concatenate([sess_idx, more_sess]))
+
+    @staticmethod
+    def _unique(pairs, n: int):
+        """Keep the (scan, session) pairs of scans that fall in exactly one session."""
+        scan_idx, sess_idx = pairs
+        once = np.bincount(scan_idx, minlength=n)[scan_idx] == 1
+        return scan_idx[once], sess_idx[once]
+
+
+# ─── CE credit report engine ────────────────────────────────────────────────
+class CEReportEngine:
+    """
+    Materialized badge × session matrix for the CE credit report.
+
+    Each cell holds the latest scan time (epoch µs) of that badge inside
+    that session, or NO_SCAN. Scans are folded in with `np.maximum.at`, so
+    ingestion is incremental, order-independent and idempotent: feeding
+    the same scan twice, or out of order, leaves the matrix unchanged.
+    """
+
+    def __init__(self, sessions):
+        self.sessions = CompiledSessions(sessions)
+        self._lock = threading.Lock()
+        self._row_of = {}                     # badge_id -> matrix row
+        self._badges = np.empty(0, np.int64)  # matrix row -> badge_id
+        self._latest = np.full((0, len(self.sessions)), NO_SCAN, np.int64)
+        self.last_id = None                   # highest scanlog.id ingested
+        self.scan_count = 0
+
+    def _rows_for(self, badge_ids: np.ndarray) -> np.ndarray:
+        uniq, inverse = np.unique(badge_ids, return_inverse=True)
+        new = [int(b) for b in uniq if int(b) not in self._row_of]
+        if new:
+            start = len(self._badges)
+            for i, b in enumerate(new):
+                self._row_of[b] = start + i
+            self._badges = np.concatenate([self._badges, np.array(new, np.int64)])
+            grow = np.full((len(new), len(self.sessions)), NO_SCAN, np.int64)
+            self._latest = np.vstack([self._latest, grow])
+        rows = np.array([self._row_of[int(b)] for b in uniq], dtype=np.intp)
+        return rows[inverse]
+
+    def add_scans(self, badge_ids, timestamps):
+        """Fold a batch of scans (badge ids + datetime64/ISO timestamps) in."""
+        badge_ids = np.asarray(badge_ids, dtype=np.int64)
+        if len(badge_ids) == 0:
+            return
+        if not np.issubdtype(np.asarray(timestamps).dtype, np.datetime64):
+            timestamps = parse_timestamps(timestamps).view("datetime64[us]")
+        ts = np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64)
+        self._fold(badge_ids, ts, *self.sessions.assign(ts))
+
+    def _fold(self, badge_ids, ts, scan_idx, sess_idx):
+        with self._lock:
+            self.scan_count += len(badge_ids)
+            if len(scan_idx) == 0:
+                return
+            rows = self._rows_for(badge_ids[scan_idx])
+            np.maximum.at(self._latest, (rows, sess_idx), ts[scan_idx])
+
+    def add_columns(self, cols):
+        """Fold in a ScanColumns batch and advance `last_id` past it."""
+        if not len(cols):
+            return
+        self._fold(cols.badges.astype(np.int64), cols.ts, *self.sessions.assign_columns(cols))
+        batch_max = int(cols.ids.max())
+        with self._lock:
+            if self.last_id is None or batch_max > self.last_id:
+                self.last_id = batch_max
+
+    def ingest_pages(self, pages):
+        """
+        Fold in raw scanlog pages ({id, badge_id, timestamp} dicts) and
+        advance `last_id`, the high-water mark for the next incremental read.
+        """
+        for page in pages:
+            if page:
+                self.add_columns(ScanColumns.from_rows(page))
+
+    def report(self, attendee_map) -> pd.DataFrame:
+        """
+        Render the CE report for registered badges.
+
+        `attendee_map` maps badge_id → {name, email} (e.g. Roster.by_badge).
+        Rows and columns come out in the same order as the original
+        session-by-session pass over the newest-first scan log; one column
+        per session, headed by its label (see CompiledSessions).
+        """
+        with self._lock:
+            latest = self._latest.copy()
+            badges = self._badges.copy()
+
+        labels = self.sessions.labels
+        registered = np.array([int(b) in attendee_map for b in badges], dtype=bool)
+        hit = latest != NO_SCAN
+        keep = np.flatnonzero(registered & hit.any(axis=1)) if len(badges) else []
+        if len(keep) == 0:
+            return pd.DataFrame([])
+
+        hit, latest, badges = hit[keep], latest[keep], badges[keep]
+        first = hit.argmax(axis=1)
+        first_ts = latest[np.arange(len(keep)), first]
+        order = np.lexsort((-first_ts, first))
+        hit, badges = hit[order], badges[order]
+
+        people = [attendee_map[int(b)] for b in badges]
+        marks = np.where(hit, "✅", "")
+        data = {"Name": [p["name"] for p in people],
+                "Email": [p["email"] for p in people]}
+        # column order follows the first row: its sessions, then the rest
+        cols = [i for i in range(len(labels)) if hit[0, i]] + \
+               [i for i in range(len(labels)) if not hit[0, i]]
+        for i in cols:
+            data[labels[i]] = marks[:, i].tolist()
+        return pd.DataFrame(data)
+
+
+# ─── Scan log views ──────────────────────────────────────────────────────────
+def build_flattened_log(cols: ScanColumns, dim: AttendeeDim) -> pd.DataFrame:
+    """One row per scanned badge: Badge ID, Name, Email, Scan 1…Scan 10."""
+    if len(cols) == 0:
+        return pd.DataFrame([])
+
+    # earliest → latest within each badge, keep the first 10
+    order = np.lexsort((cols.ts, cols.badges))
+    badges = cols.badges[order]
+    ts = cols.timestamps[order]
+    starts = np.r_[0, np.flatnonzero(badges[1:] != badges[:-1]) + 1]
+    counts = np.diff(np.r_[starts, len(badges)])
+    rank = np.arange(len(badges)) - np.repeat(starts, counts)
+    keep = rank < 10
+
+    uniq = badges[starts]
+    grid = np.full((len(uniq), 10), "", dtype=object)
+    row_of = np.repeat(np.arange(len(uniq)), counts)
+    text = np.datetime_as_string(ts[keep], unit="s")
+    grid[row_of[keep], rank[keep]] = np.char.replace(text, "T", " ").astype(object)
+
+    idx = dim.index_of(uniq)
+    names, emails = dim.lookup(idx)
+    for i in np.flatnonzero(idx < 0):
+        names[i] = f"<unregistered {int(uniq[i])}>"
+    data = {"Badge ID": uniq.astype(np.int64), "Name": names.tolist(),
+            "Email": emails.tolist()}
+    for i in range(10):
+        data[f"Scan {i + 1}"] = grid[:, i].tolist()
+    return pd.DataFrame(data)
+
+
+def update_flattened_log(flat: pd.DataFrame, cols: ScanColumns, dim: AttendeeDim,
+                         badges) -> pd.DataFrame:
+    """
+    `flat` (a build_flattened_log() frame) with the rows of `badges` rebuilt
+    from their scans in `cols` – the rest of the log is not re-sorted.
+    """
+    badges = np.unique(np.asarray(badges, dtype=np.int32))
+    fresh = build_flattened_log(cols.take(np.isin(cols.badges, badges)), dim)
+    if len(flat) == 0:
+        return fresh
+    kept = flat[~flat["Badge ID"].isin(badges)]
+    merged = pd.concat([kept, fresh], ignore_index=True)
+    return merged.sort_values("Badge ID", kind="stable", ignore_index=True)
+
+
+def build_raw_log(cols: ScanColumns, dim: AttendeeDim, limit: int = None) -> pd.DataFrame:
+    """Scans newest first with name/email: badge_id, name, email, timestamp."""
+    return cols.newest_first(limit).to_pandas(dim)
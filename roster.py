@@ -0,0 +1,136 @@
+# roster.py
+
+import os
+import threading
+import time
+
+from attendee_search import SearchIndex
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+ROSTER_TTL = float(os.getenv("ROSTER_TTL", "60"))   # seconds
+# longest a live view keeps a roster whose attendee count still matches
+ROSTER_MAX_AGE = float(os.getenv("ROSTER_MAX_AGE", str(10 * ROSTER_TTL)))
+
+
+# ─── Roster snapshot ────────────────────────────────────────────────────────
+class Roster:
+    """
+    Immutable view of the attendee table with O(1) lookups.
+
+    `attendees` keeps badge order; `by_badge` / `by_email` index the same
+    dicts. Emails are matched case-insensitively.
+    """
+
+    def __init__(self, attendees, version: int):
+        self.attendees = sorted(attendees, key=lambda a: int(a["badge_id"]))
+        self.by_badge = {int(a["badge_id"]): a for a in self.attendees}
+        self.by_email = {
+            a["email"].strip().lower(): a for a in self.attendees if a.get("email")
+        }
+        self.version = version
+        self.fetched_at = time.time()
+        self._search = None
+
+    @property
+    def search(self) -> SearchIndex:
+        """Name/email type-ahead index, built on first use."""
+        if self._search is None:
+            self._search = SearchIndex(self.attendees)
+        return self._search
+
+    def __len__(self):
+        return len(self.attendees)
+
+    def get(self, badge_id):
+        try:
+            return self.by_badge.get(int(badge_id))
+        except (TypeError, ValueError):
+            return None
+
+    def find_email(self, email: str):
+        return self.by_email.get((email or "").strip().lower())
+
+    def name_for(self, badge_id, default=None):
+        a = self.get(badge_id)
+        return a["name"] if a else default
+
+
+# ─── Process-wide cache ─────────────────────────────────────────────────────
+class RosterCache:
+    """
+    Shares one Roster across every Streamlit session in the process.
+
+    The roster is refetched with `fetch()` when it is older than `ttl` or
+    after `invalidate()`. Local writes go through `apply()`, which patches
+    the current snapshot and bumps the version without a refetch.
+    """
+
+    def __init__(self, fetch, ttl: float = ROSTER_TTL):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._roster = None
+        self._version = 0
+        self._stale = True
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def current(self):
+        """The cached Roster as is (None before the first fetch) – never refetches."""
+        return self._roster
+
+    @property
+    def expired(self) -> bool:
+        """True when the next get() would refetch."""
+        roster = self._roster
+        return (roster is None or self._stale
+                or time.time() - roster.fetched_at > self.ttl)
+
+    def outdated(self, max_age: float = ROSTER_MAX_AGE) -> bool:
+        """`expired` with a longer age limit: after invalidate() or past max_age."""
+        roster = self._roster
+        return (roster is None or self._stale
+                or time.time() - roster.fetched_at > max_age)
+
+    def get(self) -> Roster:
+        with self._lock:
+            if self.expired:
+                self._replace(self._fetch())
+            return self._roster
+
+    def put(self, rows) -> Roster:
+        """Replace the roster with rows fetched by the caller (e.g. concurrently with other reads)."""
+        with self._lock:
+            return self._replace(rows)
+
+    def _replace(self, rows) -> Roster:
+        self._version += 1
+        self._roster = Roster(rows, self._version)
+        self._stale = False
+        return self._roster
+
+    def invalidate(self):
+        """Force the next get() to refetch."""
+        with self._lock:
+            self._stale = True
+
+    def apply(self, *rows):
+        """Insert or replace attendee rows in the cached roster."""
+        with self._lock:
+            if self._roster is None:
+                self._stale = True
+                return
+            old = self._roster
+            merged = dict(old.by_badge)
+            for row in rows:
+                merged[int(row["badge_id"])] = row
+            self._version += 1
+            self._roster = Roster(merged.values(), self._version)
+            self._roster.fetched_at = old.fetched_at
+            if old._search is not None:
+                # patch the search index instead of rebuilding it
+                old._search.add(*rows)
+                self._roster._search = old._search
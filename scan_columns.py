@@ -0,0 +1,181 @@
+# scan_columns.py
+
+import warnings
+
+import numpy as np
+
+EPOCH_US = "datetime64[us]"
+UNTAGGED = -1      # session column: scan predates ingest tagging (no device)
+NO_SESSION = -2    # session column: tagged at ingest, nothing ran in its room
+
+
+# ─── Timestamp parsing ──────────────────────────────────────────────────────
+def parse_timestamps(values) -> np.ndarray:
+    """
+    ISO strings → int64 epoch µs (naive UTC), vectorized.
+
+    NumPy parses the offset-free strings PostgREST returns for `timestamp`
+    columns in C; anything else (offsets, odd formats) goes through pandas.
+    """
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+        return values.astype(EPOCH_US).view(np.int64)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return np.array(values, dtype=EPOCH_US).view(np.int64)
+    except (ValueError, TypeError, UserWarning, DeprecationWarning):
+        from reports import to_datetime64
+        return to_datetime64(list(values)).view(np.int64)
+
+
+# ─── Attendee dimension ─────────────────────────────────────────────────────
+class AttendeeDim:
+    """
+    Attendee attributes stored once, joined to scans by position.
+
+    `badge_ids` is sorted, so `index_of()` is a single searchsorted; names
+    and emails are object arrays in the same order.
+    """
+
+    def __init__(self, attendees=()):
+        people = sorted(attendees, key=lambda a: int(a["badge_id"]))
+        self.badge_ids = np.fromiter((a["badge_id"] for a in people), np.int32, len(people))
+        self.names = np.array([a["name"] for a in people], dtype=object)
+        self.emails = np.array([a["email"] for a in people], dtype=object)
+
+    @classmethod
+    def from_roster(cls, roster) -> "AttendeeDim":
+        return cls(roster.attendees)
+
+    def __len__(self):
+        return len(self.badge_ids)
+
+    def index_of(self, badges: np.ndarray) -> np.ndarray:
+        """Row of each badge in this dimension, -1 for unregistered badges."""
+        badges = np.asarray(badges, dtype=np.int32)
+        if len(self.badge_ids) == 0:
+            return np.full(len(badges), -1, np.int32)
+        pos = np.searchsorted(self.badge_ids, badges)
+        pos = np.minimum(pos, len(self.badge_ids) - 1)
+        return np.where(self.badge_ids[pos] == badges, pos, -1).astype(np.int32)
+
+    def lookup(self, idx: np.ndarray):
+        """(names, emails) object arrays for dimension rows `idx`; -1 gives ""."""
+        known = idx >= 0
+        names = np.full(len(idx), "", dtype=object)
+        emails = np.full(len(idx), "", dtype=object)
+        names[known] = self.names[idx[known]]
+        emails[known] = self.emails[idx[known]]
+        return names, emails
+
+
+# ─── Scan log columns ───────────────────────────────────────────────────────
+def session_code(session_id, device_id) -> int:
+    """
+    scanlog (session_id, device_id) → the session column value. The ingest
+    trigger tags every device scan, so a NULL session there means "no
+    session in its room", not "unknown".
+    """
+    if session_id is not None:
+        return session_id
+    return UNTAGGED if device_id is None else NO_SESSION
+
+
+class ScanColumns:
+    """
+    The scan log as parallel arrays: scanlog id (int64), badge (int32),
+    timestamp (int64 epoch µs) and session id (int32; UNTAGGED for scans
+    without a device that ingest never tagged, NO_SESSION for device scans
+    the trigger found no session for) – 24 bytes per scan, with no per-row Python
+    objects. Names and emails live in an AttendeeDim and are only joined
+    (by index) when a view needs them.
+    """
+
+    __slots__ = ("ids", "badges", "ts", "sessions")
+
+    def __init__(self, ids=None, badges=None, ts=None, sessions=None):
+        self.ids = np.empty(0, np.int64) if ids is None else np.asarray(ids, np.int64)
+        self.badges = np.empty(0, np.int32) if badges is None else np.asarray(badges, np.int32)
+        self.ts = np.empty(0, np.int64) if ts is None else np.asarray(ts, np.int64)
+        self.sessions = np.full(len(self.ids), UNTAGGED, np.int32) if sessions is None \
+            else np.asarray(sessions, np.int32)
+
+    @classmethod
+    def from_rows(cls, rows) -> "ScanColumns":
+        """From raw scanlog rows ({id, badge_id, timestamp[, session_id, device_id]} dicts)."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        n = len(rows)
+        sessions = (session_code(r.get("session_id"), r.get("device_id")) for r in rows)
+        return cls(np.fromiter((r["id"] for r in rows), np.int64, n),
+                   np.fromiter((r["badge_id"] for r in rows), np.int32, n),
+                   parse_timestamps([r["timestamp"] for r in rows]),
+                   np.fromiter(sessions, np.int32, n))
+
+    @classmethod
+    def from_pages(cls, pages) -> "ScanColumns":
+        return cls.concat([cls.from_rows(page) for page in pages if page])
+
+    @classmethod
+    def concat(cls, parts) -> "ScanColumns":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(np.concatenate([p.ids for p in parts]),
+                   np.concatenate([p.badges for p in parts]),
+                   np.concatenate([p.ts for p in parts]),
+                   np.concatenate([p.sessions for p in parts]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.badges.nbytes + self.ts.nbytes + self.sessions.nbytes
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamps as datetime64[us] – a view, not a copy."""
+        return self.ts.view(EPOCH_US)
+
+    def take(self, order) -> "ScanColumns":
+        return ScanColumns(self.ids[order], self.badges[order], self.ts[order],
+                           self.sessions[order])
+
+    def newest_first(self, limit: int = None) -> "ScanColumns":
+        """Sorted by (timestamp, id) descending, optionally the first `limit`."""
+        order = np.lexsort((self.ids, self.ts))[::-1]
+        return self.take(order[:limit] if limit is not None else order)
+
+    # ── pandas / CSV ───────────────────────────────────────────────────────
+    def to_pandas(self, dim: AttendeeDim = None):
+        """
+        DataFrame badge_id, [name, email,] timestamp.
+
+        badge_id and timestamp wrap the arrays without copying; name and
+        email are categoricals whose codes are the dimension index, so the
+        strings are not repeated per scan.
+        """
+        import pandas as pd
+
+        data = {"badge_id": pd.Series(self.badges, copy=False)}
+        if dim is not None:
+            idx = dim.index_of(self.badges)
+            for col, values in (("name", dim.names), ("email", dim.emails)):
+                # trailing "" is what idx == -1 (unregistered) picks up
+                categories, codes = np.unique(np.append(values, ""), return_inverse=True)
+                data[col] = pd.Categorical.from_codes(codes[idx], categories=categories)
+        data["timestamp"] = pd.Series(self.timestamps, copy=False)
+        return pd.DataFrame(data, copy=False)
+
+    def iter_frames(self, dim: AttendeeDim = None, chunk_size: int = 100_000):
+        """to_pandas() in slices of `chunk_size` scans, for streaming writers."""
+        for start in range(0, max(len(self), 1), chunk_size):
+            yield self.take(slice(start, start + chunk_size)).to_pandas(dim)
+
+    def to_csv(self, buf, dim: AttendeeDim = None, chunk_size: int = 100_000):
+        """Write the columns as CSV to `buf` in chunks (bounded memory)."""
+        for i, frame in enumerate(self.iter_frames(dim, chunk_size)):
+            frame.to_csv(buf, index=False, header=i == 0)
+        return buf
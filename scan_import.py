@@ -0,0 +1,145 @@
+# scan_import.py
+
+import argparse
+import io
+import os
+import time
+import uuid
+from collections import namedtuple
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+SCAN_CHUNK = int(os.getenv("SCAN_CHUNK", "2000"))   # scans per write request
+
+# fixed namespace so a scan without a uuid always hashes to the same one
+SCAN_NAMESPACE = uuid.UUID("6f1f4f52-3b0e-4c36-9a39-5e0c1e0b7c1d")
+
+ScanRecord = namedtuple("ScanRecord", "badge_id scanned_at device_id scan_uuid",
+                        defaults=(None, None))
+
+# header spellings seen in scanner exports → our column names
+COLUMN_ALIASES = {
+    "badge_id": "badge_id", "badge": "badge_id", "badge id": "badge_id",
+    "code": "badge_id", "barcode": "badge_id", "data": "badge_id",
+    "scanned_at": "scanned_at", "timestamp": "scanned_at", "time": "scanned_at",
+    "scan time": "scanned_at", "date/time": "scanned_at", "datetime": "scanned_at",
+    "device_id": "device_id", "device": "device_id", "scanner": "device_id",
+    "scan_uuid": "scan_uuid", "uuid": "scan_uuid",
+}
+
+
+# ─── Records ─────────────────────────────────────────────────────────────────
+def derived_uuid(badge_id, scanned_at: str, device_id=None) -> str:
+    """
+    Deterministic scan_uuid for scans that arrive without one, so uploading
+    the same dump twice still dedupes.
+    """
+    return str(uuid.uuid5(SCAN_NAMESPACE, f"{device_id or ''}|{int(badge_id)}|{scanned_at}"))
+
+
+def normalize(batch, device_id: str = None):
+    """
+    Turn ScanRecords / tuples / dicts into write-ready dicts
+    {badge_id, scanned_at, device_id, scan_uuid}, dropping repeated
+    scan_uuids (first one wins). `device_id` fills records without one.
+    """
+    out = {}
+    for rec in batch:
+        if isinstance(rec, dict):
+            rec = ScanRecord(rec["badge_id"],
+                             rec.get("scanned_at") or rec.get("timestamp"),
+                             rec.get("device_id"), rec.get("scan_uuid"))
+        elif not isinstance(rec, ScanRecord):
+            rec = ScanRecord(*rec)
+        if rec.scanned_at is None:
+            raise ValueError(f"scan of badge {rec.badge_id} has no scanned_at")
+        scanned_at = rec.scanned_at if isinstance(rec.scanned_at, str) \
+            else rec.scanned_at.isoformat()
+        device = rec.device_id or device_id
+        scan_uuid = str(rec.scan_uuid) if rec.scan_uuid \
+            else derived_uuid(rec.badge_id, scanned_at, device)
+        if scan_uuid not in out:
+            out[scan_uuid] = {"badge_id": int(rec.badge_id), "scanned_at": scanned_at,
+                              "device_id": device, "scan_uuid": scan_uuid}
+    return list(out.values())
+
+
+# ─── Scanner dumps ───────────────────────────────────────────────────────────
+def read_scan_dump(source, device_id: str = None, filename: str = None):
+    """
+    Parse a handheld scanner export (CSV with a header, or bare
+    `badge,timestamp` lines) from a path, bytes or file object.
+
+    Returns (records, rejected): records are normalized dicts ready for
+    log_scans; rejected is a DataFrame of unparseable lines with an `error`
+    column. Timestamps with an offset are converted to naive UTC.
+    """
+    import pandas as pd     # only needed here; keeps database.py imports light
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif isinstance(source, str) and device_id is None:
+        device_id = os.path.splitext(os.path.basename(filename or source))[0]
+
+    df = pd.read_csv(source, dtype=str, header=None, skipinitialspace=True,
+                     skip_blank_lines=True)
+    first = [str(v).strip().lower() for v in df.iloc[0]] if len(df) else []
+    if any(v in COLUMN_ALIASES for v in first):
+        df = df.iloc[1:].set_axis([COLUMN_ALIASES.get(v, v) for v in first], axis=1)
+    else:
+        df = df.set_axis(["badge_id", "scanned_at", "device_id", "scan_uuid"][:df.shape[1]],
+                         axis=1)
+    df = df.reset_index(drop=True)
+    for col in ("device_id", "scan_uuid"):
+        if col not in df.columns:
+            df[col] = None
+    if "scanned_at" not in df.columns:
+        raise ValueError("scanner dump has no timestamp column")
+
+    badge = pd.to_numeric(df["badge_id"].str.strip(), errors="coerce")
+    ts = pd.to_datetime(df["scanned_at"].str.strip(), errors="coerce",
+                        format="mixed", utc=True).dt.tz_localize(None)
+
+    errors = pd.Series("", index=df.index, dtype=object)
+    errors[ts.isna()] = "invalid timestamp"
+    errors[badge.isna() | (badge % 1 != 0) | (badge < 1)] = "invalid badge_id"
+    ok = (errors == "").to_numpy()
+
+    device = df["device_id"].where(df["device_id"].notna(), device_id)
+    stamps = ts[ok].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    records = normalize(
+        ScanRecord(b, t, d if isinstance(d, str) else None, u if isinstance(u, str) else None)
+        for b, t, d, u in zip(badge[ok].astype("int64"), stamps,
+                              device[ok], df["scan_uuid"][ok])
+    )
+    rejected = df[~ok].copy()
+    rejected.insert(0, "line", df.index[~ok] + 1)
+    rejected["error"] = errors[~ok]
+    return records, rejected.reset_index(drop=True)
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Upload handheld scanner dumps to the scan log.")
+    parser.add_argument("files", nargs="+", help="scanner export files (CSV / text)")
+    parser.add_argument("--device", help="device id (default: each file's name)")
+    parser.add_argument("--chunk", type=int, default=SCAN_CHUNK, help="scans per request")
+    parser.add_argument("--dry-run", action="store_true", help="parse only, write nothing")
+    args = parser.parse_args()
+
+    from database import log_scans
+
+    for path in args.files:
+        t0 = time.perf_counter()
+        records, rejected = read_scan_dump(path, args.device)
+        print(f"{path}: {len(records)} scans, {len(rejected)} unreadable lines")
+        for row in rejected.head(10).itertuples(index=False):
+            print(f"  line {row.line}: {row.error}")
+        if args.dry_run or not records:
+            continue
+        stats = log_scans(records, chunk_size=args.chunk)
+        print(f"✅ {stats['inserted']} new, {stats['duplicates']} already logged, "
+              f"{stats['requests']} requests ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# scan_journal.py
+
+import os
+import random
+import sqlite3
+import threading
+import uuid
+import datetime
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+JOURNAL_PATH = os.getenv("SCAN_JOURNAL_PATH", "scan_journal.db")
+FLUSH_BATCH_SIZE = 100
+FLUSH_INTERVAL = 1.0     # seconds between polls when the journal is empty
+MAX_BACKOFF = 60.0       # ceiling for retry delay after a failed flush
+MAX_ATTEMPTS = int(os.getenv("SCAN_JOURNAL_MAX_ATTEMPTS", "5"))  # rejections before a scan is dead-lettered
+
+
+# ─── Local journal ───────────────────────────────────────────────────────────
+class ScanJournal:
+    """
+    Durable on-disk queue of scan events (SQLite in WAL mode).
+
+    Every scan gets a `scan_uuid` when it is appended; the backend dedupes
+    on that key, so replaying rows after a crash never creates duplicates.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_uuid  TEXT    NOT NULL UNIQUE,
+                badge_id   INTEGER NOT NULL,
+                scanned_at TEXT    NOT NULL,
+                device_id  TEXT,
+                status     TEXT    NOT NULL DEFAULT 'pending',
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                flushed_at TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS journal_status ON journal (status, id)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(journal)")}
+        if "device_id" not in columns:     # journals written before device ids
+            self._conn.execute("ALTER TABLE journal ADD COLUMN device_id TEXT")
+
+    def append(self, badge_id: int, scanned_at: str = None,
+               scan_uuid: str = None, device_id: str = None) -> str:
+        """Record one scan locally and return its scan_uuid."""
+        scan_uuid = scan_uuid or str(uuid.uuid4())
+        scanned_at = scanned_at or datetime.datetime.utcnow().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO journal (scan_uuid, badge_id, scanned_at, device_id) "
+                "VALUES (?, ?, ?, ?)",
+                (scan_uuid, int(badge_id), scanned_at, device_id),
+            )
+        return scan_uuid
+
+    def pending(self, limit: int = FLUSH_BATCH_SIZE):
+        """Oldest unflushed scans as a list of dicts."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT scan_uuid, badge_id, scanned_at, device_id FROM journal "
+                "WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
+        return [
+            {"scan_uuid": u, "badge_id": b, "timestamp": ts, "device_id": d}
+            for u, b, ts, d in rows
+        ]
+
+    def mark_flushed(self, scan_uuids):
+        now_iso = datetime.datetime.utcnow().isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE journal SET status = 'flushed', flushed_at = ?, "
+                "attempts = attempts + 1, last_error = NULL WHERE scan_uuid = ?",
+                [(now_iso, u) for u in scan_uuids],
+            )
+            self._conn.execute("COMMIT")
+
+    def mark_failed(self, scan_uuids, error: str, max_attempts: int = None):
+        """
+        Count a failed push. With `max_attempts`, scans that have now been
+        tried that many times move to the 'failed' (dead-letter) status and
+        stop being offered by pending().
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE journal SET attempts = attempts + 1, last_error = ? "
+                "WHERE scan_uuid = ?",
+                [(error, u) for u in scan_uuids],
+            )
+            if max_attempts is not None:
+                self._conn.executemany(
+                    "UPDATE journal SET status = 'failed' "
+                    "WHERE scan_uuid = ? AND status = 'pending' AND attempts >= ?",
+                    [(u, max_attempts) for u in scan_uuids],
+                )
+            self._conn.execute("COMMIT")
+
+    def failed(self, limit: int = 100):
+        """Dead-lettered scans, newest first, with the error that sank them."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT scan_uuid, badge_id, scanned_at, device_id, attempts, last_error "
+                "FROM journal WHERE status = 'failed' ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
+        return [
+            {"scan_uuid": u, "badge_id": b, "timestamp": ts, "device_id": d,
+             "attempts": n, "last_error": err}
+            for u, b, ts, d, n, err in rows
+        ]
+
+    def requeue_failed(self) -> int:
+        """Put every dead-lettered scan back in the queue; return how many."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE journal SET status = 'pending', attempts = 0 "
+                "WHERE status = 'failed'"
+            )
+        return cur.rowcount
+
+    def counts(self) -> dict:
+        """Return {"pending": n, "flushed": n, "failed": n}."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT status, COUNT(*) FROM journal GROUP BY status"
+            )
+            counts = dict(cur.fetchall())
+        return {"pending": counts.get("pending", 0),
+                "flushed": counts.get("flushed", 0),
+                "failed": counts.get("failed", 0)}
+
+    def last_error(self):
+        """Most recent flush error still attached to a pending scan, if any."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT last_error FROM journal WHERE status = 'pending' "
+                "AND last_error IS NOT NULL ORDER BY id DESC LIMIT 1"
+            )
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ─── Background flusher ──────────────────────────────────────────────────────
+# PostgREST error codes that mean "try again": PostgREST could not reach or
+# wait for Postgres, or Postgres gave up for reasons of its own (connection
+# lost, serialization failure / deadlock, out of resources, cancelled or
+# shutting down) – not a verdict on the rows sent.
+_RETRY_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01"}
+_RETRY_SQLSTATE_CLASSES = ("08", "53", "57")
+
+
+def _retry_status(status: int) -> bool:
+    return status >= 500 or status in (408, 429)
+
+
+def _transient_api_error(exc) -> bool:
+    """
+    postgrest's APIError, raised for every non-2xx response. `code` is the
+    PostgREST / SQLSTATE code from a JSON error body, or the HTTP status
+    when the body wasn't JSON (a gateway's 502/503/504 page).
+    """
+    code = exc.code
+    if code is None or code == "":
+        return True         # no PostgREST code: a proxy answered, not the database
+    if isinstance(code, int) or (str(code).isdigit() and len(str(code)) == 3):
+        return _retry_status(int(code))
+    code = str(code)
+    return code in _RETRY_CODES or code[:2] in _RETRY_SQLSTATE_CLASSES
+
+
+def is_transient(exc: Exception) -> bool:
+    """
+    True for failures that say nothing about the scans themselves – the
+    network is down, the request timed out, the server is overloaded.
+    Anything else (a 4xx, a constraint violation) is taken as a rejection.
+    """
+    if isinstance(exc, (OSError, TimeoutError)):    # ConnectionError is an OSError
+        return True
+    try:
+        from postgrest.exceptions import APIError
+    except ImportError:
+        pass
+    else:
+        if isinstance(exc, APIError):
+            return _transient_api_error(exc)
+    try:
+        import httpx
+    except ImportError:
+        return False
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return _retry_status(exc.response.status_code)
+    return False
+
+
+class ScanFlusher(threading.Thread):
+    """
+    Drains the journal to the backend in batches.
+
+    `sink(batch)` receives a list of journal dicts and must either push all of
+    them or raise. On a transient failure (see `is_transient`) the batch
+    stays pending and the flusher backs off exponentially (with jitter) up
+    to MAX_BACKOFF seconds. When the backend rejects a batch, its scans are
+    pushed one at a time so a single bad scan cannot hold back the rest;
+    a scan rejected `max_attempts` times is dead-lettered ('failed').
+    """
+
+    def __init__(self, journal: ScanJournal, sink,
+                 batch_size: int = FLUSH_BATCH_SIZE,
+                 interval: float = FLUSH_INTERVAL,
+                 max_backoff: float = MAX_BACKOFF,
+                 max_attempts: int = MAX_ATTEMPTS,
+                 transient=is_transient):
+        super().__init__(name="scan-flusher", daemon=True)
+        self.journal = journal
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.transient = transient
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        """Ask the flusher to try right away instead of waiting out a sleep."""
+        self._wake.set()
+
+    def stop(self, timeout: float = None):
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+
+    def flush_once(self) -> int:
+        """Push one batch; return how many scans were flushed."""
+        batch = self.journal.pending(self.batch_size)
+        if not batch:
+            return 0
+        uuids = [b["scan_uuid"] for b in batch]
+        try:
+            self.sink(batch)
+        except Exception as e:
+            if self.transient(e) or len(batch) == 1:
+                self._reject(uuids, e)
+                raise
+            return self._flush_singly(batch)
+        self.journal.mark_flushed(uuids)
+        return len(batch)
+
+    def _flush_singly(self, batch) -> int:
+        """Push a rejected batch scan by scan; re-raise if none got through."""
+        flushed, error = 0, None
+        for scan in batch:
+            try:
+                self.sink([scan])
+            except Exception as e:
+                self._reject([scan["scan_uuid"]], e)
+                if self.transient(e):
+                    raise               # the backend went away mid-batch
+                error = e
+                continue
+            self.journal.mark_flushed([scan["scan_uuid"]])
+            flushed += 1
+        if not flushed:
+            raise error
+        return flushed
+
+    def _reject(self, uuids, exc: Exception):
+        limit = None if self.transient(exc) else self.max_attempts
+        self.journal.mark_failed(uuids, repr(exc), max_attempts=limit)
+
+    def run(self):
+        backoff = self.interval
+        while not self._stopping.is_set():
+            try:
+                flushed = self.flush_once()
+            except Exception:
+                delay = min(backoff, self.max_backoff)
+                delay *= random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.max_backoff)
+                self._sleep(delay)
+                continue
+
+            backoff = self.interval
+            if flushed < self.batch_size:
+                # journal drained – wait for the next scan or poll tick
+                self._sleep(self.interval)
+
+    def _sleep(self, seconds: float):
+        self._wake.wait(seconds)
+        self._wake.clear()
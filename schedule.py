@@ -0,0 +1,176 @@
+# schedule.py
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+SCHEDULE_PATH = os.getenv("SCHEDULE_PATH",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule.yaml"))
+DEFAULT_ROOM = "Main Hall"          # for session lists that predate rooms
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+EARLY_ARRIVAL_MIN = int(os.getenv("EARLY_ARRIVAL_MIN", "20"))  # scans this early still count
+NO_SESSION = -1
+MINUTE_US = 60_000_000
+
+
+def _epoch_us(text: str) -> int:
+    return int(np.datetime64(datetime.datetime.strptime(text, TIME_FORMAT), "us")
+               .astype(np.int64))
+
+
+# ─── Compiled schedule ──────────────────────────────────────────────────────
+class Schedule:
+    """
+    The programme, parsed once, with an interval index per room.
+
+    `sessions` keeps the file order as dicts {id, title, room, track, start,
+    end} (start/end as "YYYY-MM-DD HH:MM", so the dicts still work wherever
+    `conference_sessions` did). Within a room sessions may not overlap, so
+    each room's index is a pair of sorted start/end arrays and tagging a
+    batch of scans is one `searchsorted` per room. Bounds are inclusive,
+    like the CE report. A kiosk scan up to `early_min` minutes before a
+    session starts, while nothing is running in its room, is tagged with
+    that session (session_for in sql/006_early_arrival.sql does the same).
+    """
+
+    def __init__(self, sessions, devices=None, early_min: int = EARLY_ARRIVAL_MIN):
+        self.sessions = [{
+            "id":    int(s.get("id", i + 1)),
+            "title": s["title"],
+            "room":  s.get("room") or DEFAULT_ROOM,
+            "track": s.get("track"),
+            "start": s["start"],
+            "end":   s["end"],
+        } for i, s in enumerate(sessions)]
+        self.devices = dict(devices or {})
+        self.early_us = early_min * MINUTE_US
+        self.rooms = sorted({s["room"] for s in self.sessions} | set(self.devices.values()))
+
+        self.ids = np.array([s["id"] for s in self.sessions], dtype=np.int64)
+        self.starts = np.array([_epoch_us(s["start"]) for s in self.sessions], dtype=np.int64)
+        self.ends = np.array([_epoch_us(s["end"]) for s in self.sessions], dtype=np.int64)
+        if len(set(self.ids.tolist())) != len(self.ids):
+            raise ValueError("session ids must be unique")
+        bad = np.flatnonzero(self.ends <= self.starts)
+        if len(bad):
+            raise ValueError(f"session {self.sessions[bad[0]]['id']} ends before it starts")
+
+        # room → (sorted starts, ends, ids)
+        self._index = {}
+        room_of = np.array([self.rooms.index(s["room"]) for s in self.sessions], dtype=np.intp)
+        for code, room in enumerate(self.rooms):
+            members = np.flatnonzero(room_of == code)
+            members = members[np.argsort(self.starts[members], kind="stable")]
+            starts, ends = self.starts[members], self.ends[members]
+            clash = np.flatnonzero(starts[1:] <= ends[:-1])
+            if len(clash):
+                a, b = self.ids[members[clash[0]]], self.ids[members[clash[0] + 1]]
+                raise ValueError(f"sessions {a} and {b} overlap in room {room!r}")
+            self._index[room] = (starts, ends, self.ids[members])
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Schedule":
+        return cls(data.get("sessions", []), data.get("devices"))
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def room_of(self, device_id):
+        return self.devices.get(device_id)
+
+    # ── tagging ────────────────────────────────────────────────────────────
+    def _in_room(self, room: str, ts: np.ndarray) -> np.ndarray:
+        starts, ends, ids = self._index[room]
+        if len(starts) == 0:
+            return np.full(len(ts), NO_SESSION, np.int64)
+        pos = np.searchsorted(starts, ts, side="right") - 1
+        ok = pos >= 0
+        ok[ok] &= ts[ok] <= ends[pos[ok]]
+        out = np.where(ok, ids[np.maximum(pos, 0)], NO_SESSION)
+        # between sessions: early arrivals for the next one in the room
+        nxt = pos + 1
+        early = ~ok & (nxt < len(starts))
+        early[early] &= ts[early] >= starts[nxt[early]] - self.early_us
+        out[early] = ids[nxt[early]]
+        return out
+
+    def _anywhere(self, ts: np.ndarray) -> np.ndarray:
+        """Session id where exactly one session (in any room) contains the scan."""
+        hits = np.zeros(len(ts), np.int32)
+        found = np.full(len(ts), NO_SESSION, np.int64)
+        for sid, start, end in zip(self.ids, self.starts, self.ends):
+            inside = (ts >= start) & (ts <= end)
+            hits += inside
+            found[inside] = sid
+        return np.where(hits == 1, found, NO_SESSION)
+
+    def tag(self, timestamps, device_ids=None) -> np.ndarray:
+        """
+        session_id (int64, NO_SESSION if none) for each scan: the session
+        running in the scan's device room (or about to start there, within
+        the early window), or – for devices without a room – the only
+        session running anywhere at that time.
+        """
+        from scan_columns import parse_timestamps
+
+        ts = parse_timestamps(timestamps)
+        if device_ids is None:
+            device_ids = [None] * len(ts)
+        rooms = np.array([self.devices.get(d, "") for d in device_ids], dtype=object)
+        out = np.full(len(ts), NO_SESSION, np.int64)
+        for room in set(rooms.tolist()):
+            mask = rooms == room
+            out[mask] = self._in_room(room, ts[mask]) if room else self._anywhere(ts[mask])
+        return out
+
+    def tag_one(self, timestamp, device_id=None):
+        """tag() for a single scan; returns None when no session matches."""
+        sid = int(self.tag([timestamp], [device_id])[0])
+        return None if sid == NO_SESSION else sid
+
+    # ── database rows ──────────────────────────────────────────────────────
+    def session_rows(self):
+        """Rows for the `sessions` table."""
+        return [{"id": s["id"], "title": s["title"], "room": s["room"], "track": s["track"],
+                 "starts_at": datetime.datetime.strptime(s["start"], TIME_FORMAT).isoformat(),
+                 "ends_at": datetime.datetime.strptime(s["end"], TIME_FORMAT).isoformat()}
+                for s in self.sessions]
+
+    def device_rows(self):
+        """Rows for the `devices` table."""
+        return [{"device_id": d, "room": r} for d, r in sorted(self.devices.items())]
+
+
+def load_schedule(path: str = SCHEDULE_PATH) -> Schedule:
+    """Read and compile a schedule YAML file (see schedule.yaml)."""
+    import yaml
+
+    with open(path, encoding="utf-8") as f:
+        return Schedule.from_dict(yaml.safe_load(f) or {})
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Validate a schedule file and optionally "
+                                                 "sync it to the sessions/devices tables.")
+    parser.add_argument("path", nargs="?", default=SCHEDULE_PATH)
+    parser.add_argument("--sync", action="store_true", help="upsert sessions and devices")
+    args = parser.parse_args()
+
+    schedule = load_schedule(args.path)
+    for room in schedule.rooms:
+        ids = schedule._index[room][2]
+        print(f"{room}: {len(ids)} sessions")
+    kiosks = ", ".join(f"{d} → {r}" for d, r in sorted(schedule.devices.items()))
+    print(f"devices: {kiosks or '-'}")
+
+    if args.sync:
+        from database import sync_schedule
+        print(f"synced {sync_schedule(schedule)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# schema.py
+
+from sqlalchemy import (
+    MetaData, Table, Column, ForeignKey, Integer, BigInteger, Text, DateTime, Uuid,
+)
+
+# ─── Tables (mirrors the Supabase schema) ───────────────────────────────────
+metadata = MetaData()
+
+attendees = Table(
+    "attendees", metadata,
+    Column("badge_id", Integer, primary_key=True, autoincrement=False),
+    Column("name", Text, nullable=False),
+    Column("email", Text, nullable=False),
+    *[Column(f"scan{i}", DateTime) for i in range(1, 11)],
+)
+
+scanlog = Table(
+    "scanlog", metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True),
+    Column("badge_id", Integer, nullable=False, index=True),
+    Column("timestamp", DateTime, nullable=False, index=True),
+    Column("scan_uuid", Uuid(as_uuid=False), unique=True),
+    Column("device_id", Text),
+    Column("session_id", Integer, ForeignKey("sessions.id"), index=True),
+)
+
+sessions = Table(
+    "sessions", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("title", Text, nullable=False),
+    Column("room", Text, nullable=False),
+    Column("track", Text),
+    Column("starts_at", DateTime, nullable=False),
+    Column("ends_at", DateTime, nullable=False),
+)
+
+devices = Table(
+    "devices", metadata,
+    Column("device_id", Text, primary_key=True),
+    Column("room", Text, nullable=False),
+)
+
+SCAN_SLOTS = [f"scan{i}" for i in range(1, 11)]
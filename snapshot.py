@@ -0,0 +1,203 @@
+# snapshot.py
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from exports import EXPORT_CHUNK, ExportCache
+from occupancy import OccupancyEngine
+from reports import (CEReportEngine, build_flattened_log, build_raw_log,
+                     update_flattened_log)
+from scan_columns import AttendeeDim, ScanColumns
+
+SNAPSHOT_MAX_AGE = 5.0    # seconds a snapshot is reused before polling again
+ID_GAP_GRACE = 30.0       # seconds a skipped scanlog id is re-polled for (a late commit)
+ID_GAP_LIMIT = 10_000     # larger id jumps are not tracked as gaps
+ARCHIVE_REPORTS = ("attendees", "ce", "raw")   # contents of the "zip" export
+
+
+# ─── Attendance snapshot ────────────────────────────────────────────────────
+class AttendanceSnapshot:
+    """
+    One in-memory copy of the scan log + roster behind every admin view.
+
+    `refresh()` pulls only scanlog rows newer than the last seen id and
+    appends them to a columnar ScanColumns log (id, badge, epoch-µs
+    timestamp); names and emails sit once in an AttendeeDim joined by
+    index. The flattened log, CE report, raw log and occupancy views are
+    derived from those and memoized per `version`, which bumps only when
+    new scans or a new roster arrive – so reruns with no new data reuse everything.
+
+    New scans alone do not throw the memos away: the flattened log is
+    patched for the badges they touch and the raw-log preview merges them
+    into its previous top rows; only the views built from the incremental
+    CE/occupancy engines are re-rendered. scanlog ids are handed out
+    before commit, so an id below the high-water mark can still appear;
+    skipped ids are re-polled for ID_GAP_GRACE seconds and re-read rows
+    are dropped, so polling by id loses nothing and double counts nothing.
+    """
+
+    def __init__(self, sessions, max_age: float = SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self.ce = CEReportEngine(sessions)
+        self.occupancy = OccupancyEngine(sessions)
+        self.log = ScanColumns()
+        self.dim = AttendeeDim()
+        self.roster = None
+        self.last_id = None
+        self.version = 0
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._derived = {}
+        self._exports = None
+        self._gaps = {}           # skipped scanlog id -> when it was first missed
+
+    def __len__(self):
+        return len(self.log)
+
+    # ── loading ────────────────────────────────────────────────────────────
+    def refresh(self, roster, fetch_since, force: bool = False) -> bool:
+        """
+        Bring the snapshot up to date.
+
+        `fetch_since(after_id)` must yield pages of raw scanlog rows with
+        id > after_id (e.g. database.iter_scanlog_since); after_id is
+        `last_id`, or lower while recent id gaps are open. Returns True when
+        the version changed.
+        """
+        if not force and roster is not self.roster:
+            force = True
+        return self.sync(lambda last_id: (roster, fetch_since(last_id)), force)
+
+    def sync(self, load, force: bool = False) -> bool:
+        """
+        refresh() with one loader for both inputs: `load(after_id)` returns
+        (roster, pages of scanlog rows with id > after_id – or those scans as
+        a ScanColumns), so it can fetch them concurrently
+        (database.load_admin_data, or poll_admin_data for a live view).
+        Called at most once per `max_age` unless forced.
+        """
+        with self._lock:
+            if not force and time.time() - self.refreshed_at < self.max_age:
+                return False
+
+            roster, pages = load(self.poll_from())
+            batch = pages if isinstance(pages, ScanColumns) else ScanColumns.from_pages(pages)
+            batch = self._unseen(batch)
+            changed = self._append(batch)
+
+            if roster is not self.roster:
+                self.roster = roster
+                self.dim = AttendeeDim.from_roster(roster)
+                self._derived = {}
+                changed = True
+            elif changed:
+                self._patch(batch)
+            if changed:
+                self.version += 1
+            self.refreshed_at = time.time()
+            return changed
+
+    def poll_from(self) -> int:
+        """The id to read after: last_id, or just below the oldest open gap."""
+        now = time.time()
+        self._gaps = {i: t for i, t in self._gaps.items() if now - t < ID_GAP_GRACE}
+        return min(self._gaps) - 1 if self._gaps else self.last_id
+
+    def _unseen(self, batch: ScanColumns) -> ScanColumns:
+        """`batch` without rows already in the log; records ids it skipped over."""
+        if self.last_id is None or not len(batch):
+            return batch
+        below = batch.ids <= self.last_id
+        if below.any():
+            floor = batch.ids[below].min()
+            known = np.isin(batch.ids, self.log.ids[self.log.ids >= floor])
+            for i in batch.ids[below & ~known].tolist():
+                self._gaps.pop(i, None)
+            batch = batch.take(~known)
+        top = int(batch.ids.max()) if len(batch) else self.last_id
+        if 1 < top - self.last_id <= ID_GAP_LIMIT:
+            now = time.time()
+            missing = np.setdiff1d(np.arange(self.last_id + 1, top, dtype=np.int64), batch.ids)
+            self._gaps.update((i, now) for i in missing.tolist())
+        return batch
+
+    def _append(self, batch: ScanColumns) -> bool:
+        if not len(batch):
+            return False
+        self.ce.add_columns(batch)
+        self.occupancy.add_columns(batch)
+        self.log = ScanColumns.concat([self.log, batch])
+        batch_max = int(batch.ids.max())
+        self.last_id = batch_max if self.last_id is None else max(self.last_id, batch_max)
+        return True
+
+    def _patch(self, batch: ScanColumns):
+        """Carry the memos over a batch of new scans (same roster)."""
+        old, self._derived = self._derived, {}
+        if "flat" in old:
+            self._derived["flat"] = update_flattened_log(old["flat"], self.log, self.dim,
+                                                         batch.badges)
+        for key, top in old.items():
+            if key[0] == "raw_top":
+                # the newest `limit` of old + new are among the old top and the batch
+                self._derived[key] = ScanColumns.concat([top, batch]).newest_first(key[1])
+
+    def _memo(self, key, build):
+        if key not in self._derived:
+            self._derived[key] = build()
+        return self._derived[key]
+
+    # ── derived views ──────────────────────────────────────────────────────
+    def ce_report(self) -> pd.DataFrame:
+        return self._memo("ce", lambda: self.ce.report(self.roster.by_badge))
+
+    def flattened_log(self) -> pd.DataFrame:
+        """One row per scanned badge: Badge ID, Name, Email, Scan 1…Scan 10."""
+        return self._memo("flat", lambda: build_flattened_log(self.log, self.dim))
+
+    def raw_log(self, limit: int = None) -> pd.DataFrame:
+        """Scans newest first with name/email: badge_id, name, email, timestamp."""
+        if limit is None:
+            return self._memo(("raw", None), lambda: build_raw_log(self.log, self.dim))
+        # the top rows are kept as columns, so new scans can be merged in (see _patch)
+        top = self._memo(("raw_top", limit), lambda: self.log.newest_first(limit))
+        return self._memo(("raw", limit), lambda: build_raw_log(top, self.dim))
+
+    def headcounts(self) -> pd.DataFrame:
+        return self._memo("headcounts", self.occupancy.headcounts)
+
+    def arrivals(self) -> pd.DataFrame:
+        return self._memo("arrivals", self.occupancy.arrivals)
+
+    def peak_windows(self) -> pd.DataFrame:
+        return self._memo("peaks", self.occupancy.peak_windows)
+
+    def dwell(self) -> pd.DataFrame:
+        return self._memo("dwell", lambda: self.occupancy.dwell(self.roster.by_badge))
+
+    # ── exports ────────────────────────────────────────────────────────────
+    def export_frames(self, name: str):
+        """The report `name` as an iterable of DataFrames (the raw log in slices)."""
+        if name == "raw":
+            return self.log.newest_first().iter_frames(self.dim, EXPORT_CHUNK)
+        views = {"attendees": self.flattened_log, "ce": self.ce_report, "dwell": self.dwell}
+        return [views[name]()]
+
+    def export(self, name: str, fmt: str) -> bytes:
+        """
+        Report `name` ("attendees", "ce", "raw", "dwell") as csv/parquet/xlsx,
+        or fmt "zip" for attendees + CE + raw log as CSVs in one archive.
+        Built on first request per data version, then served from disk.
+        """
+        if self._exports is None:
+            self._exports = ExportCache()
+        if fmt == "zip":
+            def frames():
+                return {n: self.export_frames(n) for n in ARCHIVE_REPORTS}
+        else:
+            def frames():
+                return self.export_frames(name)
+        return self._exports.read(name, fmt, self.version, frames)
@@ -0,0 +1,6 @@
+-- 001_scanlog_scan_uuid.sql
+-- Each scan carries a client-generated UUID so journal replays are idempotent.
+
+alter table scanlog add column if not exists scan_uuid uuid;
+
+create unique index if not exists scanlog_scan_uuid_key on scanlog (scan_uuid);
@@ -0,0 +1,71 @@
+-- 002_check_in.sql
+-- Atomic check-in: log the scan and claim the next empty scanN slot in one
+-- statement. The UPDATE row lock serialises concurrent kiosks scanning the
+-- same badge, so two scans can never claim the same slot.
+
+create or replace function check_in(
+    p_badge_id  integer,
+    p_timestamp timestamp default (now() at time zone 'utc'),
+    p_scan_uuid uuid      default gen_random_uuid()
+)
+returns table (badge_id integer, name text, scan_count integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    return query
+    with ins as (
+        insert into scanlog (badge_id, "timestamp", scan_uuid)
+        values (p_badge_id, p_timestamp, p_scan_uuid)
+        on conflict (scan_uuid) do nothing
+        returning scanlog.badge_id
+    )
+    update attendees a set
+        scan1  = case when a.scan1  is null then p_timestamp else a.scan1 end,
+        scan2  = case when a.scan2  is null and a.scan1 is not null then p_timestamp else a.scan2 end,
+        scan3  = case when a.scan3  is null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan3 end,
+        scan4  = case when a.scan4  is null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan4 end,
+        scan5  = case when a.scan5  is null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan5 end,
+        scan6  = case when a.scan6  is null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan6 end,
+        scan7  = case when a.scan7  is null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan7 end,
+        scan8  = case when a.scan8  is null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan8 end,
+        scan9  = case when a.scan9  is null and a.scan8 is not null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan9 end,
+        scan10 = case when a.scan10 is null and a.scan9 is not null and a.scan8 is not null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan10 end
+    where a.badge_id = (select ins.badge_id from ins)
+    returning a.badge_id, a.name,
+              num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5,
+                           a.scan6, a.scan7, a.scan8, a.scan9, a.scan10);
+
+    if not found then
+        -- duplicate scan_uuid or unregistered badge: report current state
+        return query
+        select p_badge_id, a.name,
+               num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5,
+                            a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)
+        from attendees a
+        where a.badge_id = p_badge_id;
+
+        if not found then
+            return query select p_badge_id, null::text, 0;
+        end if;
+    end if;
+end;
+$$;
+
+-- Batch form used by the scan journal flusher: one round trip per batch.
+-- p_scans is a JSON array of {badge_id, timestamp, scan_uuid}; scans are
+-- applied in timestamp order so slots fill chronologically.
+create or replace function check_in_batch(p_scans jsonb)
+returns table (badge_id integer, name text, scan_count integer)
+language sql
+as $$
+    select r.badge_id, r.name, r.scan_count
+    from (
+        select (s->>'badge_id')::integer     as badge_id,
+               (s->>'timestamp')::timestamp  as ts,
+               (s->>'scan_uuid')::uuid       as scan_uuid
+        from jsonb_array_elements(p_scans) s
+        order by 2
+    ) s
+    cross join lateral check_in(s.badge_id, s.ts, s.scan_uuid) r;
+$$;
@@ -0,0 +1,55 @@
+-- 003_log_scans.sql
+-- Batch ingestion for handheld scanners and kiosks: scans keep the time they
+-- were taken (not the upload time) and the device that took them.
+
+alter table scanlog add column if not exists device_id text;
+
+-- p_scans is a JSON array of {badge_id, scanned_at, device_id, scan_uuid}.
+-- One statement for the whole batch:
+--   * duplicates (by scan_uuid, within the batch or already stored) are dropped
+--   * each badge's new scans are collected in time order and written into its
+--     empty scanN slots in a single UPDATE: slot i takes new scan
+--     i - (slots already filled), so scans fill chronologically after the
+--     existing ones. SET expressions all read the pre-update row, and the row
+--     lock serialises concurrent batches touching the same badge.
+-- Returns how many scans were received and how many were new.
+create or replace function log_scans(p_scans jsonb)
+returns table (received integer, inserted integer)
+language sql
+as $$
+    with input as (
+        select distinct on (s.scan_uuid) s.badge_id, s.scanned_at, s.device_id, s.scan_uuid
+        from jsonb_to_recordset(p_scans)
+             as s(badge_id integer, scanned_at timestamp, device_id text, scan_uuid uuid)
+        order by s.scan_uuid
+    ),
+    ins as (
+        insert into scanlog (badge_id, "timestamp", device_id, scan_uuid)
+        select badge_id, scanned_at, device_id, scan_uuid from input
+        on conflict (scan_uuid) do nothing
+        returning scanlog.badge_id, scanlog."timestamp"
+    ),
+    new_scans as (
+        select ins.badge_id, array_agg(ins."timestamp" order by ins."timestamp") as ts
+        from ins
+        group by ins.badge_id
+    ),
+    upd as (
+        update attendees a set
+            scan1  = coalesce(a.scan1,  n.ts[1  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan2  = coalesce(a.scan2,  n.ts[2  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan3  = coalesce(a.scan3,  n.ts[3  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan4  = coalesce(a.scan4,  n.ts[4  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan5  = coalesce(a.scan5,  n.ts[5  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan6  = coalesce(a.scan6,  n.ts[6  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan7  = coalesce(a.scan7,  n.ts[7  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan8  = coalesce(a.scan8,  n.ts[8  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan9  = coalesce(a.scan9,  n.ts[9  - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)]),
+            scan10 = coalesce(a.scan10, n.ts[10 - num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5, a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)])
+        from new_scans n
+        where a.badge_id = n.badge_id
+        returning a.badge_id
+    )
+    -- data-modifying CTEs always run to completion, even when unreferenced
+    select jsonb_array_length(p_scans), (select count(*)::integer from ins);
+$$;
@@ -0,0 +1,175 @@
+-- 004_schedule.sql
+-- The programme as data (rooms, tracks, sessions) and the room each kiosk
+-- stands in. Every scan is tagged with the session running in its device's
+-- room as it is inserted, so reports group by scanlog.session_id instead of
+-- matching time ranges. Rows come from schedule.yaml: python schedule.py --sync
+-- (run it after this migration – it also tags the scans already logged).
+
+create table if not exists sessions (
+    id        integer primary key,
+    title     text      not null,
+    room      text      not null,
+    track     text,
+    starts_at timestamp not null,
+    ends_at   timestamp not null,
+    check (ends_at > starts_at)
+);
+create index if not exists sessions_room_starts_at on sessions (room, starts_at);
+
+create table if not exists devices (
+    device_id text primary key,
+    room      text not null
+);
+
+alter table scanlog add column if not exists session_id integer references sessions (id);
+create index if not exists scanlog_session_id on scanlog (session_id);
+
+-- Session for a scan: the one running in the device's room, or – for devices
+-- without a room – the only session running anywhere at that time.
+-- Bounds are inclusive, like the CE report.
+create or replace function session_for(p_device_id text, p_timestamp timestamp)
+returns integer
+language sql stable
+as $$
+    select coalesce(
+        (select s.id
+           from devices d
+           join sessions s on s.room = d.room
+          where d.device_id = p_device_id
+            and p_timestamp between s.starts_at and s.ends_at
+          order by s.starts_at desc
+          limit 1),
+        (select min(s.id)
+           from sessions s
+          where not exists (select 1 from devices d where d.device_id = p_device_id)
+            and p_timestamp between s.starts_at and s.ends_at
+         having count(*) = 1)
+    );
+$$;
+
+create or replace function tag_scan_session()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.session_id is null then
+        new.session_id := session_for(new.device_id, new."timestamp");
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists scanlog_tag_session on scanlog;
+create trigger scanlog_tag_session
+    before insert on scanlog
+    for each row execute function tag_scan_session();
+
+-- sessions is still empty here, so scans logged before this migration are
+-- tagged by schedule.py --sync, once the schedule is loaded: it upserts the
+-- rows, then calls these two.
+
+-- Drop devices and sessions no longer in the schedule. Sessions that scans
+-- already point at are kept (scanlog.session_id references them).
+create or replace function prune_schedule(p_session_ids integer[], p_device_ids text[])
+returns integer
+language plpgsql
+as $$
+declare
+    pruned integer;
+begin
+    delete from devices d where d.device_id <> all (p_device_ids);
+    delete from sessions s
+     where s.id <> all (p_session_ids)
+       and not exists (select 1 from scanlog l where l.session_id = s.id);
+    get diagnostics pruned = row_count;
+    return pruned;
+end;
+$$;
+
+-- Tag scans that have no session yet: rows from before this migration, or
+-- scans taken before their session or device was in the schedule.
+create or replace function tag_untagged_scans()
+returns integer
+language plpgsql
+as $$
+declare
+    tagged integer;
+begin
+    update scanlog set session_id = session_for(device_id, "timestamp")
+     where session_id is null
+       and session_for(device_id, "timestamp") is not null;
+    get diagnostics tagged = row_count;
+    return tagged;
+end;
+$$;
+
+-- Kiosk check-ins now say which device took the scan.
+drop function if exists check_in_batch(jsonb);
+drop function if exists check_in(integer, timestamp, uuid);
+
+create or replace function check_in(
+    p_badge_id  integer,
+    p_timestamp timestamp default (now() at time zone 'utc'),
+    p_scan_uuid uuid      default gen_random_uuid(),
+    p_device_id text      default null
+)
+returns table (badge_id integer, name text, scan_count integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    return query
+    with ins as (
+        insert into scanlog (badge_id, "timestamp", scan_uuid, device_id)
+        values (p_badge_id, p_timestamp, p_scan_uuid, p_device_id)
+        on conflict (scan_uuid) do nothing
+        returning scanlog.badge_id
+    )
+    update attendees a set
+        scan1  = case when a.scan1  is null then p_timestamp else a.scan1 end,
+        scan2  = case when a.scan2  is null and a.scan1 is not null then p_timestamp else a.scan2 end,
+        scan3  = case when a.scan3  is null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan3 end,
+        scan4  = case when a.scan4  is null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan4 end,
+        scan5  = case when a.scan5  is null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan5 end,
+        scan6  = case when a.scan6  is null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan6 end,
+        scan7  = case when a.scan7  is null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan7 end,
+        scan8  = case when a.scan8  is null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan8 end,
+        scan9  = case when a.scan9  is null and a.scan8 is not null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan9 end,
+        scan10 = case when a.scan10 is null and a.scan9 is not null and a.scan8 is not null and a.scan7 is not null and a.scan6 is not null and a.scan5 is not null and a.scan4 is not null and a.scan3 is not null and a.scan2 is not null and a.scan1 is not null then p_timestamp else a.scan10 end
+    where a.badge_id = (select ins.badge_id from ins)
+    returning a.badge_id, a.name,
+              num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5,
+                           a.scan6, a.scan7, a.scan8, a.scan9, a.scan10);
+
+    if not found then
+        -- duplicate scan_uuid or unregistered badge: report current state
+        return query
+        select p_badge_id, a.name,
+               num_nonnulls(a.scan1, a.scan2, a.scan3, a.scan4, a.scan5,
+                            a.scan6, a.scan7, a.scan8, a.scan9, a.scan10)
+        from attendees a
+        where a.badge_id = p_badge_id;
+
+        if not found then
+            return query select p_badge_id, null::text, 0;
+        end if;
+    end if;
+end;
+$$;
+
+-- p_scans is a JSON array of {badge_id, timestamp, scan_uuid, device_id}.
+create or replace function check_in_batch(p_scans jsonb)
+returns table (badge_id integer, name text, scan_count integer)
+language sql
+as $$
+    select r.badge_id, r.name, r.scan_count
+    from (
+        select (s->>'badge_id')::integer     as badge_id,
+               (s->>'timestamp')::timestamp  as ts,
+               (s->>'scan_uuid')::uuid       as scan_uuid,
+               s->>'device_id'               as device_id
+        from jsonb_array_elements(p_scans) s
+        order by 2
+    ) s
+    cross join lateral check_in(s.badge_id, s.ts, s.scan_uuid, s.device_id) r;
+$$;
@@ -0,0 +1,35 @@
+-- 005_check_in_scans.sql
+-- check_in_batch() answers per badge in timestamp order, so a caller cannot
+-- tell which row belongs to which scan, nor whether a scan_uuid was already
+-- logged. check_in_scans() does the same work and answers once per scan,
+-- keyed by scan_uuid (used by checkin_service.py in front of Supabase).
+
+-- p_scans is a JSON array of {badge_id, timestamp, scan_uuid, device_id}.
+create or replace function check_in_scans(p_scans jsonb)
+returns table (scan_uuid uuid, badge_id integer, name text, scan_count integer,
+               session_id integer, duplicate boolean)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    s record;
+begin
+    for s in
+        select (e->>'badge_id')::integer     as badge_id,
+               (e->>'timestamp')::timestamp  as ts,
+               (e->>'scan_uuid')::uuid       as scan_uuid,
+               e->>'device_id'               as device_id
+        from jsonb_array_elements(p_scans) e
+        order by 2
+    loop
+        scan_uuid := s.scan_uuid;
+        -- a replayed scan_uuid, or one repeated within this batch
+        duplicate := exists (select 1 from scanlog l where l.scan_uuid = s.scan_uuid);
+        select r.badge_id, r.name, r.scan_count
+          into badge_id, name, scan_count
+          from check_in(s.badge_id, s.ts, s.scan_uuid, s.device_id) r;
+        select l.session_id into session_id from scanlog l where l.scan_uuid = s.scan_uuid;
+        return next;
+    end loop;
+end;
+$$;
@@ -0,0 +1,36 @@
+-- 006_early_arrival.sql
+-- Kiosk scans always carry a device id, so session_for() tags them at
+-- insert – but only with a session already running. Someone scanning in
+-- at the door 20 minutes before a talk got no session at all, and the
+-- occupancy view's early-arrival window never saw the scan. A scan taken
+-- while nothing runs in the device's room now goes to the next session
+-- there if it starts within the early window (EARLY_ARRIVAL_MIN in
+-- schedule.py; keep the two in step). Run python schedule.py --sync
+-- afterwards to tag the early scans already logged.
+
+create or replace function session_for(p_device_id text, p_timestamp timestamp)
+returns integer
+language sql stable
+as $$
+    select coalesce(
+        (select s.id
+           from devices d
+           join sessions s on s.room = d.room
+          where d.device_id = p_device_id
+            and p_timestamp between s.starts_at and s.ends_at
+          order by s.starts_at desc
+          limit 1),
+        (select s.id
+           from devices d
+           join sessions s on s.room = d.room
+          where d.device_id = p_device_id
+            and p_timestamp between s.starts_at - interval '20 minutes' and s.starts_at
+          order by s.starts_at
+          limit 1),
+        (select min(s.id)
+           from sessions s
+          where not exists (select 1 from devices d where d.device_id = p_device_id)
+            and p_timestamp between s.starts_at and s.ends_at
+         having count(*) = 1)
+    );
+$$;
@@ -0,0 +1,440 @@
+# sql_backend.py
+#
+# Direct SQL access through a SQLAlchemy engine – the Postgres engine built in
+# main.py, or any local stand-in such as create_engine("sqlite:///local.db").
+
+import csv
+import io
+import os
+import uuid
+import datetime
+
+from sqlalchemy import (
+    select, update, insert, case, and_, literal, bindparam, cast, func, create_engine,
+    BigInteger, Text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+
+from schema import attendees, devices, scanlog, sessions, SCAN_SLOTS
+from scan_import import SCAN_CHUNK, normalize
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))          # connections kept open
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT = 10        # seconds to wait for a free connection
+POOL_RECYCLE = 1800      # seconds; below the Supabase pooler's idle cut-off
+STREAM_CHUNK = int(os.getenv("STREAM_CHUNK", "50000"))   # rows per server-side cursor fetch
+
+
+# ─── Engine ──────────────────────────────────────────────────────────────────
+def make_engine(url: str, **overrides):
+    """
+    Engine with a bounded, health-checked connection pool: connections are
+    pinged on checkout and recycled before idle poolers drop them. SQLite
+    URLs, and an explicit `poolclass` (e.g. NullPool behind a transaction
+    pooler), keep SQLAlchemy's defaults.
+    """
+    if url.startswith("sqlite") or "poolclass" in overrides:
+        return create_engine(url, **overrides)
+    options = {"pool_size": POOL_SIZE, "max_overflow": POOL_MAX_OVERFLOW,
+               "pool_timeout": POOL_TIMEOUT, "pool_recycle": POOL_RECYCLE,
+               "pool_pre_ping": True}
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+# ─── Atomic check-in ────────────────────────────────────────────────────────
+def _slot_assignments(ts):
+    """
+    SET clause that writes `ts` into the first empty scanN column.
+
+    Every CASE reads the pre-update row, so exactly one slot changes and the
+    whole assignment happens inside a single UPDATE (row-locked by the DB).
+    """
+    cols = [attendees.c[name] for name in SCAN_SLOTS]
+    values = {}
+    for i, col in enumerate(cols):
+        earlier_full = [c.isnot(None) for c in cols[:i]]
+        values[col.name] = case(
+            (and_(col.is_(None), *earlier_full), literal(ts, attendees.c.scan1.type)),
+            else_=col,
+        )
+    return values
+
+
+def _scan_count():
+    """SQL expression counting the non-empty scanN columns."""
+    return sum(
+        case((attendees.c[name].isnot(None), 1), else_=0) for name in SCAN_SLOTS
+    )
+
+
+def _as_result(badge_id, row):
+    if row is None:
+        return {"badge_id": badge_id, "name": None, "scan_count": 0}
+    return {"badge_id": badge_id, "name": row.name, "scan_count": int(row.scan_count)}
+
+
+def check_in(engine, badge_id: int, timestamp: datetime.datetime = None,
+             scan_uuid: str = None, device_id: str = None, schedule=None) -> dict:
+    """
+    Log a scan and claim the attendee's next scanN slot atomically.
+
+    Returns {badge_id, name, scan_count}; name is None for unregistered
+    badges. Re-sending the same scan_uuid is a no-op that still returns the
+    current name and count. With a `schedule` the scan is tagged with its
+    session here (engines without the sql/004 trigger, e.g. SQLite).
+    """
+    badge = int(badge_id)
+    ts = timestamp or datetime.datetime.utcnow()
+    scan_uuid = scan_uuid or str(uuid.uuid4())
+    values = {"badge_id": badge, "timestamp": ts, "scan_uuid": scan_uuid, "device_id": device_id}
+    if schedule is not None:
+        values["session_id"] = schedule.tag_one(ts, device_id)
+    returning = (attendees.c.name, _scan_count().label("scan_count"))
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # one statement: the insert CTE gates the slot update
+            ins = postgresql.insert(scanlog) \
+                            .values(**values) \
+                            .on_conflict_do_nothing(index_elements=["scan_uuid"]) \
+                            .returning(scanlog.c.badge_id) \
+                            .cte("ins")
+            stmt = update(attendees) \
+                .where(attendees.c.badge_id == select(ins.c.badge_id).scalar_subquery()) \
+                .values(**_slot_assignments(ts)) \
+                .returning(*returning)
+            row = conn.execute(stmt).first()
+        else:
+            ins = sqlite.insert(scanlog).prefix_with("OR IGNORE") \
+                if conn.dialect.name == "sqlite" else insert(scanlog)
+            inserted = conn.execute(
+                ins.values(**values)
+            ).rowcount
+            if inserted:
+                conn.execute(
+                    update(attendees)
+                    .where(attendees.c.badge_id == badge)
+                    .values(**_slot_assignments(ts))
+                )
+            # the insert already holds the write lock, so this read is
+            # consistent (SQLite's RETURNING mis-evaluates the CASE count)
+            row = None
+
+        if row is None:
+            # duplicate scan_uuid, unregistered badge or non-Postgres engine
+            row = conn.execute(
+                select(*returning).where(attendees.c.badge_id == badge)
+            ).first()
+
+    return _as_result(badge, row)
+
+
+# ─── Batch ingestion ────────────────────────────────────────────────────────
+def _insert_new(conn, rows):
+    """
+    Insert scanlog rows, skipping known scan_uuids; return
+    (badge_id, timestamp, scan_uuid) of the new ones.
+    """
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(scanlog) \
+                  .values(rows) \
+                  .on_conflict_do_nothing(index_elements=["scan_uuid"]) \
+                  .returning(scanlog.c.badge_id, scanlog.c.timestamp, scanlog.c.scan_uuid)
+    return conn.execute(stmt).all()
+
+
+def _fill_slots(conn, new_scans):
+    """
+    Write every badge's new scans into its empty scanN slots in one pass:
+    read the touched rows once (locked on Postgres), merge in Python and
+    send a single executemany UPDATE.
+    """
+    by_badge = {}
+    for badge, ts, *_ in sorted(new_scans, key=lambda r: r[1]):
+        by_badge.setdefault(int(badge), []).append(ts)
+    if not by_badge:
+        return
+
+    cols = [attendees.c[name] for name in SCAN_SLOTS]
+    params = []
+    badges = list(by_badge)
+    for start in range(0, len(badges), SCAN_CHUNK):
+        rows = conn.execute(
+            select(attendees.c.badge_id, *cols)
+            .where(attendees.c.badge_id.in_(badges[start:start + SCAN_CHUNK]))
+            .with_for_update()
+        ).all()
+        for row in rows:
+            slots = [v for v in row[1:] if v is not None]
+            filled = (slots + by_badge[row.badge_id])[:len(SCAN_SLOTS)]
+            if len(filled) == len(slots):
+                continue
+            filled += [None] * (len(SCAN_SLOTS) - len(filled))
+            params.append({"b_badge": row.badge_id,
+                           **{f"b_{name}": v for name, v in zip(SCAN_SLOTS, filled)}})
+    if params:
+        conn.execute(
+            update(attendees)
+            .where(attendees.c.badge_id == bindparam("b_badge"))
+            .values(**{name: bindparam(f"b_{name}") for name in SCAN_SLOTS}),
+            params,
+        )
+
+
+def log_scans(engine, batch, chunk_size: int = SCAN_CHUNK, device_id: str = None,
+              schedule=None) -> dict:
+    """
+    SQLAlchemy counterpart of database.log_scans: insert many timestamped
+    scans with multi-row INSERTs (duplicate scan_uuids are skipped) and fill
+    the scanN slots for the whole batch in one pass, all in one transaction.
+    With a `schedule`, each chunk is tagged with its sessions in one
+    vectorized pass.
+    """
+    scans = normalize(batch, device_id)
+    new_scans = []
+    with engine.begin() as conn:
+        for start in range(0, len(scans), chunk_size):
+            chunk = scans[start:start + chunk_size]
+            rows = [{"badge_id": sc["badge_id"],
+                     "timestamp": datetime.datetime.fromisoformat(sc["scanned_at"]),
+                     "device_id": sc["device_id"],
+                     "scan_uuid": sc["scan_uuid"]} for sc in chunk]
+            if schedule is not None:
+                tags = schedule.tag([sc["scanned_at"] for sc in chunk],
+                                    [sc["device_id"] for sc in chunk])
+                for row, sid in zip(rows, tags.tolist()):
+                    row["session_id"] = sid if sid >= 0 else None
+            new_scans.extend(_insert_new(conn, rows))
+        _fill_slots(conn, new_scans)
+    return {"received": len(scans), "inserted": len(new_scans),
+            "duplicates": len(scans) - len(new_scans)}
+
+
+def check_in_batch(engine, batch, schedule=None, chunk_size: int = SCAN_CHUNK) -> list:
+    """
+    check_in() for many kiosk scans in one transaction: multi-row INSERTs,
+    one slot-filling pass and one read of the touched attendees.
+
+    `batch` holds {badge_id, timestamp, scan_uuid, device_id} dicts (the
+    scan journal's shape). Returns one {badge_id, name, scan_count,
+    session_id, duplicate} per scan, in batch order; `duplicate` marks a
+    scan_uuid that was already logged.
+    """
+    rows = [{"badge_id": int(sc["badge_id"]),
+             "timestamp": datetime.datetime.fromisoformat(str(sc["timestamp"]))
+             if sc.get("timestamp") else datetime.datetime.utcnow(),
+             "scan_uuid": sc.get("scan_uuid") or str(uuid.uuid4()),
+             "device_id": sc.get("device_id")} for sc in batch]
+    if schedule is not None and rows:
+        tags = schedule.tag([r["timestamp"] for r in rows], [r["device_id"] for r in rows])
+        for row, sid in zip(rows, tags.tolist()):
+            row["session_id"] = sid if sid >= 0 else None
+
+    new_scans = []
+    with engine.begin() as conn:
+        for start in range(0, len(rows), chunk_size):
+            new_scans.extend(_insert_new(conn, rows[start:start + chunk_size]))
+        _fill_slots(conn, new_scans)
+        badges = sorted({r["badge_id"] for r in rows})
+        state = {}
+        for start in range(0, len(badges), chunk_size):
+            state.update((r.badge_id, r) for r in conn.execute(
+                select(attendees.c.badge_id, attendees.c.name, _scan_count().label("scan_count"))
+                .where(attendees.c.badge_id.in_(badges[start:start + chunk_size]))))
+
+    fresh = {str(u) for _, _, u in new_scans}
+    out = []
+    for row in rows:
+        result = _as_result(row["badge_id"], state.get(row["badge_id"]))
+        result["session_id"] = row.get("session_id")
+        result["duplicate"] = row["scan_uuid"] not in fresh
+        fresh.discard(row["scan_uuid"])      # a repeat within the batch is a duplicate too
+        out.append(result)
+    return out
+
+
+def scan_presence(engine):
+    """(total scans, distinct (badge_id, session_id) pairs) – the seed for live counts."""
+    with engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(scanlog)).scalar()
+        pairs = conn.execute(select(scanlog.c.badge_id, scanlog.c.session_id).distinct()).all()
+    return total, [tuple(p) for p in pairs]
+
+
+# ─── Schedule ───────────────────────────────────────────────────────────────
+def sync_schedule(engine, schedule) -> dict:
+    """
+    database.sync_schedule for a direct engine: upsert a Schedule's sessions
+    and devices, drop the ones it no longer has – except sessions scans
+    point at – and tag scans still without a session against it, in one
+    transaction.
+    """
+    rows = [{**r, "starts_at": datetime.datetime.fromisoformat(r["starts_at"]),
+             "ends_at": datetime.datetime.fromisoformat(r["ends_at"])}
+            for r in schedule.session_rows()]
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(sessions.c.id)).scalars())
+        for r in rows:
+            if r["id"] in existing:
+                conn.execute(update(sessions).where(sessions.c.id == r["id"]).values(**r))
+            else:
+                conn.execute(insert(sessions).values(**r))
+        conn.execute(devices.delete())
+        if schedule.devices:
+            conn.execute(insert(devices), schedule.device_rows())
+        referenced = select(scanlog.c.session_id).where(scanlog.c.session_id == sessions.c.id)
+        pruned = conn.execute(sessions.delete().where(
+            sessions.c.id.notin_([r["id"] for r in rows]), ~referenced.exists())).rowcount
+        tagged = _tag_untagged(conn, schedule)
+    return {"sessions": len(rows), "devices": len(schedule.devices),
+            "pruned": pruned, "tagged": tagged}
+
+
+def _tag_untagged(conn, schedule, chunk: int = STREAM_CHUNK) -> int:
+    """tag_untagged_scans() (sql/004_schedule.sql) with the Schedule's own rule."""
+    untagged = conn.execute(select(scanlog.c.id, scanlog.c.timestamp, scanlog.c.device_id)
+                            .where(scanlog.c.session_id.is_(None))).all()
+    stmt = update(scanlog).where(scanlog.c.id == bindparam("_id")) \
+                          .values(session_id=bindparam("_session_id"))
+    tagged = 0
+    for start in range(0, len(untagged), chunk):
+        part = untagged[start:start + chunk]
+        tags = schedule.tag([r.timestamp for r in part], [r.device_id for r in part])
+        params = [{"_id": r.id, "_session_id": sid}
+                  for r, sid in zip(part, tags.tolist()) if sid >= 0]
+        if params:
+            conn.execute(stmt, params)
+            tagged += len(params)
+    return tagged
+
+
+# ─── Streaming reads ────────────────────────────────────────────────────────
+def fetch_attendees(engine):
+    """Roster rows {badge_id, name, email} in badge order."""
+    with engine.connect() as conn:
+        rows = conn.execute(select(attendees.c.badge_id, attendees.c.name, attendees.c.email)
+                            .order_by(attendees.c.badge_id))
+        return [dict(r._mapping) for r in rows]
+
+
+def attendee_count(engine) -> int:
+    """Number of attendee rows – a cheap check for registrations made elsewhere."""
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(attendees)).scalar()
+
+
+def _epoch_us(col, dialect: str):
+    """Timestamp column as epoch µs – computed by Postgres, parsed in Python elsewhere."""
+    if dialect == "postgresql":
+        return cast(func.extract("epoch", col) * 1_000_000, BigInteger)
+    return col
+
+
+def iter_scan_columns(engine, after_id: int = None, chunk: int = STREAM_CHUNK):
+    """
+    Yield scanlog rows with id > after_id as ScanColumns chunks, in id order.
+
+    The rows come through a server-side cursor (`stream_results`), so only
+    one chunk is ever held by the driver, and each chunk goes straight into
+    NumPy arrays – no per-row dicts, no row cap.
+    """
+    import numpy as np
+    from scan_columns import ScanColumns, parse_timestamps, session_code
+
+    stmt = select(scanlog.c.id, scanlog.c.badge_id,
+                  _epoch_us(scanlog.c.timestamp, engine.dialect.name),
+                  scanlog.c.session_id, scanlog.c.device_id).order_by(scanlog.c.id)
+    if after_id is not None:
+        stmt = stmt.where(scanlog.c.id > after_id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk).execute(stmt)
+        for rows in result.partitions():
+            ids, badges, ts, sess, devices = zip(*rows)
+            ts = np.asarray(ts, np.int64) if engine.dialect.name == "postgresql" \
+                else parse_timestamps(ts)
+            yield ScanColumns(ids, badges, ts, list(map(session_code, sess, devices)))
+
+
+def scan_columns(engine, after_id: int = None):
+    """Every scanlog row with id > after_id as one ScanColumns."""
+    from scan_columns import ScanColumns
+
+    return ScanColumns.concat(list(iter_scan_columns(engine, after_id)))
+
+
+# ─── CSV exports ────────────────────────────────────────────────────────────
+def _ts_text(col, dialect: str):
+    """Timestamp as 'YYYY-MM-DD HH:MM:SS' text (seconds, like the pandas exports)."""
+    if dialect == "postgresql":
+        return func.to_char(col, "YYYY-MM-DD HH24:MI:SS")
+    return func.strftime("%Y-%m-%d %H:%M:%S", col)
+
+
+def raw_log_query(dialect: str = "postgresql"):
+    """The raw attendance log: badge_id, name, email, timestamp, newest first."""
+    return select(scanlog.c.badge_id,
+                  func.coalesce(attendees.c.name, "").label("name"),
+                  func.coalesce(attendees.c.email, "").label("email"),
+                  scanlog.c.timestamp) \
+        .select_from(scanlog.outerjoin(attendees, attendees.c.badge_id == scanlog.c.badge_id)) \
+        .order_by(scanlog.c.timestamp.desc(), scanlog.c.id.desc())
+
+
+def attendee_report_query(dialect: str = "postgresql"):
+    """
+    The attendee report (reports.build_flattened_log) in SQL: one row per
+    scanned badge with its first ten scans as Scan 1…Scan 10.
+    """
+    n = func.row_number().over(partition_by=scanlog.c.badge_id,
+                               order_by=(scanlog.c.timestamp, scanlog.c.id))
+    ranked = select(scanlog.c.badge_id, scanlog.c.timestamp, n.label("n")).subquery("ranked")
+    slots = [func.max(case((ranked.c.n == i, _ts_text(ranked.c.timestamp, dialect)),
+                           else_=None)).label(f"Scan {i}")
+             for i in range(1, len(SCAN_SLOTS) + 1)]
+    unregistered = literal("<unregistered ") + cast(ranked.c.badge_id, Text) + literal(">")
+    return select(ranked.c.badge_id.label("Badge ID"),
+                  func.coalesce(attendees.c.name, unregistered).label("Name"),
+                  func.coalesce(attendees.c.email, "").label("Email"),
+                  *slots) \
+        .select_from(ranked.outerjoin(attendees, attendees.c.badge_id == ranked.c.badge_id)) \
+        .where(ranked.c.n <= len(SCAN_SLOTS)) \
+        .group_by(ranked.c.badge_id, attendees.c.name, attendees.c.email) \
+        .order_by(ranked.c.badge_id)
+
+
+CSV_REPORTS = {"raw": raw_log_query, "attendees": attendee_report_query}
+
+
+def export_csv(engine, report: str, out):
+    """
+    Write report `report` ("raw" or "attendees") as CSV with a header row to
+    the binary file `out`.
+
+    On Postgres this is one `COPY (query) TO STDOUT`: the server formats the
+    CSV and the driver copies bytes to `out`, whatever the row count. Other
+    engines stream the same query through a server-side cursor.
+    """
+    dialect = engine.dialect.name
+    stmt = CSV_REPORTS[report](dialect)
+    if dialect == "postgresql":
+        sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cur:
+                cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+            raw.commit()
+        finally:
+            raw.close()
+        return
+
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\n")
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_CHUNK).execute(stmt)
+        writer.writerow(result.keys())
+        for rows in result.partitions():
+            writer.writerows(rows)
+    text.flush()
+    text.detach()
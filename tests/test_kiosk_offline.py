@@ -0,0 +1,34 @@
+# tests/test_kiosk_offline.py
+
+import pytest
+
+import database
+from benchmarks.fake_supabase import FakeSupabase
+from scan_journal import ScanFlusher, ScanJournal
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """A private journal whose flusher never runs, so queued scans stay pending."""
+    journal = ScanJournal(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(database, "_journal", journal)
+    monkeypatch.setattr(database, "_flusher", ScanFlusher(journal, lambda batch: None))
+    yield journal
+    journal.close()
+
+
+def test_supabase_503_on_check_in_is_journaled(journal):
+    # every response fails the way a Supabase gateway 503 does (postgrest APIError)
+    database.set_client(FakeSupabase(fail_rate=1.0))
+    result, queued = database.check_in_or_queue(7, "2025-05-01T09:00:00",
+                                                "00000000-0000-4000-8000-000000000007")
+    assert (result, queued) == (None, True)
+    assert [(s["scan_uuid"], s["badge_id"]) for s in journal.pending()] == \
+        [("00000000-0000-4000-8000-000000000007", 7)]
+
+
+def test_check_in_answer_is_not_journaled(journal):
+    database.set_client(FakeSupabase())
+    result, queued = database.check_in_or_queue(7, "2025-05-01T09:00:00")
+    assert not queued and result["badge_id"] == 7
+    assert journal.pending() == []
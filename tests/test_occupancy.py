@@ -0,0 +1,35 @@
+# tests/test_occupancy.py
+
+from occupancy import OccupancyEngine
+from scan_columns import ScanColumns
+from schedule import NO_SESSION, Schedule
+
+SESSIONS = [
+    {"id": 1, "title": "Breakfast briefing", "room": "Hall A",
+     "start": "2025-05-01 07:30", "end": "2025-05-01 08:05"},
+    {"id": 2, "title": "Keynote", "room": "Hall A",
+     "start": "2025-05-01 08:30", "end": "2025-05-01 09:30"},
+]
+SCHEDULE = Schedule(SESSIONS, {"kiosk-a": "Hall A"})
+
+
+def _scans(scans):
+    """scanlog rows for (badge_id, timestamp) kiosk scans, tagged like the trigger does."""
+    tags = SCHEDULE.tag([ts for _, ts in scans], ["kiosk-a"] * len(scans))
+    return ScanColumns.from_rows([
+        {"id": i + 1, "badge_id": badge, "timestamp": ts, "device_id": "kiosk-a",
+         "session_id": None if tag == NO_SESSION else int(tag)}
+        for i, ((badge, ts), tag) in enumerate(zip(scans, tags))])
+
+
+def test_early_kiosk_scan_counts_as_arrival():
+    engine = OccupancyEngine(SCHEDULE.sessions)
+    engine.add_columns(_scans([(7, "2025-05-01T08:20:00")]))
+    arrived = dict(zip(engine.headcounts()["Session"], engine.headcounts()["Arrived"]))
+    assert arrived == {"Breakfast briefing": 0, "Keynote": 1}
+
+
+def test_kiosk_scan_goes_to_the_session_still_running():
+    assert SCHEDULE.tag_one("2025-05-01T08:04:00", "kiosk-a") == 1
+    assert SCHEDULE.tag_one("2025-05-01T08:09:00", "kiosk-a") is None   # too early for 08:30
+    assert SCHEDULE.tag_one("2025-05-01T08:10:00", "kiosk-a") == 2
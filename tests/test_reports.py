@@ -0,0 +1,25 @@
+# tests/test_reports.py
+
+from reports import CEReportEngine
+from scan_columns import ScanColumns
+
+SESSIONS = [
+    {"id": 1, "title": "Office hours", "start": "2025-05-01 09:00", "end": "2025-05-01 10:00"},
+    {"id": 2, "title": "Office hours", "start": "2025-05-02 09:00", "end": "2025-05-02 10:00"},
+    {"id": 3, "title": "Keynote", "start": "2025-05-01 11:00", "end": "2025-05-01 12:00"},
+]
+PEOPLE = {7: {"name": "Ada", "email": "ada@example.org"},
+          8: {"name": "Bo", "email": "bo@example.org"}}
+
+
+def test_sessions_sharing_a_title_keep_their_own_columns():
+    engine = CEReportEngine(SESSIONS)
+    engine.add_columns(ScanColumns.from_rows([
+        {"id": 1, "badge_id": 7, "timestamp": "2025-05-01T09:30:00", "session_id": 1},
+        {"id": 2, "badge_id": 8, "timestamp": "2025-05-02T09:30:00", "session_id": 2},
+    ]))
+    report = engine.report(PEOPLE).set_index("Name")
+    assert report.loc["Ada", "Office hours (2025-05-01 09:00)"] == "✅"
+    assert report.loc["Ada", "Office hours (2025-05-02 09:00)"] == ""
+    assert report.loc["Bo", "Office hours (2025-05-02 09:00)"] == "✅"
+    assert report.loc["Bo", "Keynote"] == ""
@@ -0,0 +1,52 @@
+# tests/test_video_scanner.py
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import video_scanner
+from video_scanner import ContinuousScanner, Frame
+
+
+class _Texts:
+    """A source whose frames 'decode' to the given QR texts."""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+
+    def read(self):
+        return Frame(self.texts.pop(0), time.monotonic()) if self.texts else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def decode_as_text(monkeypatch):
+    monkeypatch.setattr(video_scanner, "decode_gray",
+                        lambda gray, thorough=False: SimpleNamespace(text=gray))
+
+
+def _scan(texts, on_badge):
+    scanner = ContinuousScanner(_Texts(texts), on_badge).start()
+    scanner.join()
+    return scanner
+
+
+def test_non_badge_qr_is_skipped_without_calling_on_badge():
+    calls = []
+    scanner = _scan(["https://example.org/poster"] * 30, calls.append)
+    assert calls == [] and scanner.events() == []
+    assert scanner.stats()["ignored"] == 30
+
+
+def test_only_transient_failures_are_retried_on_the_next_frame():
+    calls = []
+
+    def on_badge(badge):
+        calls.append(badge)
+        raise (ConnectionError if badge == "7" else ValueError)("no")
+
+    _scan(["7", "7", "8", "8", "8"], on_badge)
+    assert calls == ["7", "7", "8"]
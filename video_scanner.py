@@ -0,0 +1,234 @@
+# video_scanner.py
+
+import glob
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from qr_decoder import decode_gray, load_gray
+from scan_journal import is_transient
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+DEBOUNCE_SECONDS = 10.0   # same badge within this window counts once
+
+Frame = namedtuple("Frame", "gray captured_at")
+ScanEvent = namedtuple("ScanEvent", "badge_id captured_at confirmed_at result error")
+
+
+# ─── Frame sources ───────────────────────────────────────────────────────────
+class CameraSource:
+    """Live frames from an OpenCV capture device (index) or video file (path)."""
+
+    def __init__(self, device=0):
+        self.device = device
+        self._cap = None
+
+    def read(self):
+        if self._cap is None:
+            self._cap = cv2.VideoCapture(self.device)
+        ok, bgr = self._cap.read()
+        if not ok:
+            return None
+        return Frame(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), time.monotonic())
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class SequenceSource:
+    """
+    Replays a recorded frame sequence (grayscale arrays or encoded image
+    bytes), optionally paced at `fps`; `None` fps means as fast as possible.
+    """
+
+    def __init__(self, frames, fps: float = None, loop: bool = False):
+        self.frames = list(frames)
+        self.fps = fps
+        self.loop = loop
+        self._i = 0
+        self._next_at = None
+
+    def read(self):
+        if self._i >= len(self.frames):
+            if not self.loop or not self.frames:
+                return None
+            self._i = 0
+        if self.fps:
+            now = time.monotonic()
+            if self._next_at is not None and now < self._next_at:
+                time.sleep(self._next_at - now)
+            self._next_at = max(now, self._next_at or now) + 1.0 / self.fps
+        item = self.frames[self._i]
+        self._i += 1
+        gray = item if isinstance(item, np.ndarray) else load_gray(item)[0]
+        return Frame(gray, time.monotonic())
+
+    def close(self):
+        pass
+
+
+class DirectorySource(SequenceSource):
+    """Frames from the image files in a directory, in name order."""
+
+    def __init__(self, path: str, pattern: str = "*.png", repeat: int = 1,
+                 fps: float = None, loop: bool = False):
+        frames = []
+        for name in sorted(glob.glob(os.path.join(path, pattern))):
+            with open(name, "rb") as f:
+                data = f.read()
+            frames.extend([data] * repeat)
+        super().__init__(frames, fps=fps, loop=loop)
+
+
+# ─── Debounce ────────────────────────────────────────────────────────────────
+class Debouncer:
+    """Time-window cache: a badge is accepted once per `window` seconds."""
+
+    def __init__(self, window: float = DEBOUNCE_SECONDS):
+        self.window = window
+        self._seen = {}
+
+    def accept(self, badge: str, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        last = self._seen.get(badge)
+        if last is not None and now - last < self.window:
+            self._seen[badge] = now       # still in front of the camera
+            return False
+        self._seen[badge] = now
+        if len(self._seen) > 4096:
+            self._seen = {b: t for b, t in self._seen.items()
+                          if now - t < self.window}
+        return True
+
+    def forget(self, badge: str):
+        """Drop `badge` from the window, so its next frame is accepted again."""
+        self._seen.pop(badge, None)
+
+
+# ─── Continuous scanner ─────────────────────────────────────────────────────
+class ContinuousScanner:
+    """
+    Reads frames from `source` and decodes them on a worker thread.
+
+    Each newly seen badge is passed to `on_badge(badge_id)` (normally
+    database.log_scan) once per debounce window – a badge whose on_badge
+    failed transiently is retried on its next frame; QR codes that are not
+    badge numbers (a poster URL, a vCard) are counted and skipped before
+    debouncing. The outcome is queued as a
+    ScanEvent for the UI to pick up with `events()` without ever blocking
+    on the decoder. With `idle_timeout`, the scanner stops itself (and
+    releases the camera) once nobody has called events() for that long,
+    e.g. after the browser tab that started it went away.
+    """
+
+    def __init__(self, source, on_badge, window: float = DEBOUNCE_SECONDS,
+                 idle_timeout: float = None):
+        self.source = source
+        self.on_badge = on_badge
+        self.debouncer = Debouncer(window)
+        self.idle_timeout = idle_timeout
+        self._polled_at = time.monotonic()
+        self._events = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.frames = 0
+        self.decoded = 0
+        self.ignored = 0          # decoded, but not a badge number
+        self.confirmed = 0
+        self.latencies = []       # seconds, capture → on_badge returned
+        self.started_at = None
+        self.stopped_at = None
+
+    # ── lifecycle ──────────────────────────────────────────────────────────
+    def start(self):
+        self.started_at = self._polled_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="video-scanner",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def join(self, timeout: float = None):
+        """Wait for a finite source to run out."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                if self.idle_timeout is not None \
+                        and time.monotonic() - self._polled_at > self.idle_timeout:
+                    break
+                frame = self.source.read()
+                if frame is None:
+                    break
+                self._process(frame)
+        finally:
+            self.stopped_at = time.monotonic()
+            self.source.close()
+
+    def _process(self, frame: Frame):
+        self.frames += 1
+        text = decode_gray(frame.gray, thorough=False).text
+        if not text:
+            return
+        self.decoded += 1
+        if not text.isdigit():
+            self.ignored += 1
+            return
+        if not self.debouncer.accept(text):
+            return
+
+        result, error = None, None
+        try:
+            result = self.on_badge(text)
+        except Exception as e:
+            error = e
+            if is_transient(e):
+                self.debouncer.forget(text)    # a rejection would only fail again
+        confirmed_at = time.monotonic()
+        if error is None:
+            self.confirmed += 1
+            self.latencies.append(confirmed_at - frame.captured_at)
+        self._events.put(ScanEvent(text, frame.captured_at, confirmed_at,
+                                   result, error))
+
+    # ── UI side ────────────────────────────────────────────────────────────
+    def events(self):
+        """All scan events since the last call (never blocks)."""
+        self._polled_at = time.monotonic()
+        out = []
+        while True:
+            try:
+                out.append(self._events.get_nowait())
+            except queue.Empty:
+                return out
+
+    def stats(self) -> dict:
+        end = self.stopped_at or time.monotonic()
+        elapsed = max(end - (self.started_at or end), 1e-9)
+        lat = np.array(self.latencies) * 1000 if self.latencies else None
+        return {
+            "frames":      self.frames,
+            "decoded":     self.decoded,
+            "ignored":     self.ignored,
+            "confirmed":   self.confirmed,
+            "fps":         self.frames / elapsed,
+            "latency_p50_ms": float(np.percentile(lat, 50)) if lat is not None else None,
+            "latency_p95_ms": float(np.percentile(lat, 95)) if lat is not None else None,
+        }